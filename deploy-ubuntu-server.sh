@@ -522,9 +522,9 @@ else:
     print('ℹ️ Admin user already exists')
 "
 
-# Fix WSGI configuration to use production settings
-log "Configuring WSGI for production..."
-sed -i "s/it_ticketing_system.settings/it_ticketing_system.settings_production/" it_ticketing_system/wsgi.py
+# Fix WSGI/ASGI configuration to use production settings
+log "Configuring WSGI/ASGI for production..."
+sed -i "s/it_ticketing_system.settings'/it_ticketing_system.settings_production'/" it_ticketing_system/wsgi.py it_ticketing_system/asgi.py
 
 # Create Gunicorn systemd service optimized for NPM
 log "Creating Gunicorn systemd service for NPM..."
@@ -543,7 +543,7 @@ WorkingDirectory=$APP_DIR
 Environment="PATH=$APP_DIR/venv/bin"
 Environment="DJANGO_SETTINGS_MODULE=it_ticketing_system.settings_production"
 Environment="SECRET_KEY=$GENERATED_SECRET_KEY"
-ExecStart=$APP_DIR/venv/bin/gunicorn --workers 3 --bind 0.0.0.0:8001 --timeout 60 --keep-alive 2 --max-requests 1000 --access-logfile - --error-logfile - it_ticketing_system.wsgi:application
+ExecStart=$APP_DIR/venv/bin/gunicorn --worker-class uvicorn.workers.UvicornWorker --workers 3 --bind 0.0.0.0:8001 --timeout 60 --keep-alive 2 --max-requests 1000 --access-logfile - --error-logfile - it_ticketing_system.asgi:application
 ExecReload=/bin/kill -s HUP \$MAINPID
 Restart=always
 RestartSec=3
@@ -552,6 +552,31 @@ RestartSec=3
 WantedBy=multi-user.target
 EOF
 
+# SLA sweeper: moves tickets to AT_RISK / BREACHED as their deadlines pass
+log "Creating SLA sweeper systemd service..."
+cat > /etc/systemd/system/solvit-ticketing-sla.service << EOF
+[Unit]
+Description=SolvIT Ticketing SLA sweeper (marks tickets at risk or breached)
+After=network.target postgresql.service
+Requires=postgresql.service
+PartOf=solvit-ticketing.service
+
+[Service]
+Type=simple
+User=solvit
+Group=solvit
+WorkingDirectory=$APP_DIR
+Environment="PATH=$APP_DIR/venv/bin"
+Environment="DJANGO_SETTINGS_MODULE=it_ticketing_system.settings_production"
+Environment="SECRET_KEY=$GENERATED_SECRET_KEY"
+ExecStart=$APP_DIR/venv/bin/python manage.py sweep_sla --loop --interval 60
+Restart=always
+RestartSec=10
+
+[Install]
+WantedBy=multi-user.target
+EOF
+
 # Note: Skip local Nginx setup since you're using NPM (external)
 log "Skipping local Nginx setup - using NPM (Nginx Proxy Manager)"
 warning "Remember to configure NPM to proxy to http://127.0.0.1:8001"
@@ -567,8 +592,8 @@ chown solvit:solvit /var/log/solvit-ticketing.log
 # Start and enable services
 log "Starting and enabling services..."
 systemctl daemon-reload
-systemctl enable solvit-ticketing
-systemctl start solvit-ticketing
+systemctl enable solvit-ticketing solvit-ticketing-sla
+systemctl start solvit-ticketing solvit-ticketing-sla
 
 # Setup firewall (allowing port 8000 for your proxy server access)
 log "Configuring firewall..."
@@ -587,6 +612,7 @@ sleep 5
 # Check service status
 log "Checking service status..."
 systemctl status solvit-ticketing --no-pager || warning "SolvIT service may have issues"
+systemctl status solvit-ticketing-sla --no-pager || warning "SLA sweeper service may have issues"
 
 # Test the application directly (no local Nginx)
 log "Testing Django application..."
@@ -675,11 +701,13 @@ Management Commands:
 - Check service status: systemctl status solvit-ticketing
 - Restart application: systemctl restart solvit-ticketing
 - View logs: journalctl -u solvit-ticketing -f
+- SLA sweeper: systemctl status solvit-ticketing-sla
 - Test Django app: curl http://127.0.0.1:8000/
 
 File Locations:
 - Application: $APP_DIR
 - Service config: /etc/systemd/system/solvit-ticketing.service
+- SLA sweeper config: /etc/systemd/system/solvit-ticketing-sla.service
 - Logs: /var/log/solvit-ticketing.log
 
 Database Connection:
@@ -13,4 +13,16 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'it_ticketing_system.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up: it loads models
+from tickets.websocket import ticket_updates  # noqa: E402
+
+
+async def application(scope, receive, send):
+    # WebSocket connections (live ticket conversations) are handled
+    # outside of Django's HTTP request handling
+    if scope['type'] == 'websocket':
+        await ticket_updates(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
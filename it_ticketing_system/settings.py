@@ -48,6 +48,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'tickets.middleware.TicketEventActorMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -102,6 +103,10 @@ else:
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            # Take the write lock when a transaction starts, so concurrent
+            # writers (e.g. two agents claiming a ticket) wait for each
+            # other instead of failing with "database is locked"
+            'OPTIONS': {'transaction_mode': 'IMMEDIATE'},
         }
     }
 
@@ -153,9 +158,61 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Attachments are downloaded through permission-checked views. Set to
+# 'x-accel-redirect' (nginx) or 'x-sendfile' (Apache) to let the web
+# server send the file; empty streams it from Django (tickets/downloads.py).
+PROTECTED_MEDIA_SERVER = ''
+PROTECTED_MEDIA_URL = '/protected-media/'
+
 # File Upload Settings
 MAX_UPLOAD_SIZE = 5242880  # 5MB in bytes
 
+# Attachments are validated and hashed while they are received
+FILE_UPLOAD_HANDLERS = [
+    'tickets.uploads.ValidatingUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+# Dashboard pagination (tickets per keyset page)
+TICKETS_PER_PAGE = 25
+
+# Conversation entries rendered per page on the ticket page
+TICKET_MESSAGES_PER_PAGE = 50
+
+# Background threads processing uploaded attachments (tickets/attachments.py);
+# 0 leaves them to `manage.py process_attachments`
+ATTACHMENT_WORKER_THREADS = 2
+
+# Automatic assignment of new tickets (tickets/routing.py): 'round_robin',
+# 'least_open', 'priority_aware', a dotted path to a RoutingStrategy, or
+# empty to leave new tickets unassigned. Agents with TICKET_ROUTING_MAX_OPEN
+# unresolved tickets get no more (None: no limit).
+TICKET_ROUTING_STRATEGY = 'least_open'
+TICKET_ROUTING_MAX_OPEN = None
+
+# Service level targets per priority in hours, (first response, resolution)
+# (tickets/sla.py). Tickets are flagged at risk this many minutes before a
+# deadline by `manage.py sweep_sla`; run `manage.py rebuild_sla` after
+# changing the targets.
+TICKET_SLA_POLICIES = {
+    'URGENT': (1, 4),
+    'HIGH': (4, 24),
+    'MEDIUM': (8, 72),
+    'LOW': (24, 120),
+}
+TICKET_SLA_WARNING_MINUTES = 60
+
+# Image thumbnails/previews cache (tickets/thumbnails.py); least recently
+# used files are evicted beyond the size limit. Keep it under MEDIA_ROOT
+# when PROTECTED_MEDIA_SERVER is 'x-accel-redirect'.
+THUMBNAIL_CACHE_DIR = os.path.join(MEDIA_ROOT, 'derived')
+THUMBNAIL_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Real-time conversation updates: a redis:// URL to share events between
+# processes, empty for the single-process in-memory broker
+TICKET_REALTIME_BROKER_URL = ''
+
 # Login and Authentication Settings
 LOGIN_URL = 'tickets:login'
 LOGIN_REDIRECT_URL = 'tickets:customer_dashboard'  # For customers
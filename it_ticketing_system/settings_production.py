@@ -65,6 +65,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'tickets.middleware.TicketEventActorMiddleware',  # Actor of ticket events
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'tickets.middleware.IPWhitelistMiddleware',     # Admin IP whitelist
@@ -158,11 +159,62 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Attachments are downloaded through permission-checked views. Set to
+# 'x-accel-redirect' (nginx) or 'x-sendfile' (Apache) to let the web
+# server send the file; empty streams it from Django (tickets/downloads.py).
+PROTECTED_MEDIA_SERVER = env('PROTECTED_MEDIA_SERVER', default='')
+PROTECTED_MEDIA_URL = env('PROTECTED_MEDIA_URL', default='/protected-media/')
+
 # File Upload Settings
 MAX_UPLOAD_SIZE = env('MAX_UPLOAD_SIZE', default=5242880)  # 5MB
+
+# Attachments are validated and hashed while they are received
+FILE_UPLOAD_HANDLERS = [
+    'tickets.uploads.ValidatingUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
 FILE_UPLOAD_MAX_MEMORY_SIZE = 2621440  # 2.5MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB
 
+# Dashboard pagination (tickets per keyset page)
+TICKETS_PER_PAGE = 25
+
+# Conversation entries rendered per page on the ticket page
+TICKET_MESSAGES_PER_PAGE = 50
+
+# Background threads processing uploaded attachments (tickets/attachments.py);
+# 0 leaves them to `manage.py process_attachments`
+ATTACHMENT_WORKER_THREADS = 2
+
+# Automatic assignment of new tickets (tickets/routing.py): 'round_robin',
+# 'least_open', 'priority_aware', a dotted path to a RoutingStrategy, or
+# empty to leave new tickets unassigned. Agents with TICKET_ROUTING_MAX_OPEN
+# unresolved tickets get no more (None: no limit).
+TICKET_ROUTING_STRATEGY = env('TICKET_ROUTING_STRATEGY', default='least_open')
+TICKET_ROUTING_MAX_OPEN = env.int('TICKET_ROUTING_MAX_OPEN', default=None)
+
+# Service level targets per priority in hours, (first response, resolution)
+# (tickets/sla.py). Tickets are flagged at risk this many minutes before a
+# deadline by `manage.py sweep_sla`; run `manage.py rebuild_sla` after
+# changing the targets.
+TICKET_SLA_POLICIES = {
+    'URGENT': (1, 4),
+    'HIGH': (4, 24),
+    'MEDIUM': (8, 72),
+    'LOW': (24, 120),
+}
+TICKET_SLA_WARNING_MINUTES = env.int('TICKET_SLA_WARNING_MINUTES', default=60)
+
+# Image thumbnails/previews cache (tickets/thumbnails.py); least recently
+# used files are evicted beyond the size limit. Keep it under MEDIA_ROOT
+# when PROTECTED_MEDIA_SERVER is 'x-accel-redirect'.
+THUMBNAIL_CACHE_DIR = env('THUMBNAIL_CACHE_DIR', default=os.path.join(MEDIA_ROOT, 'derived'))
+THUMBNAIL_CACHE_MAX_BYTES = env.int('THUMBNAIL_CACHE_MAX_BYTES', default=1024 * 1024 * 1024)
+
+# Real-time conversation updates (overridden with Redis below when not DEBUG)
+TICKET_REALTIME_BROKER_URL = ''
+
 # Login and Authentication Settings
 LOGIN_URL = 'tickets:login'
 LOGIN_REDIRECT_URL = 'tickets:customer_dashboard'
@@ -294,6 +346,9 @@ if not DEBUG:
             'LOCATION': env('REDIS_URL', default='redis://127.0.0.1:6379/1'),
         }
     }
+    # Real-time conversation updates are published through Redis so every
+    # ASGI worker process receives them
+    TICKET_REALTIME_BROKER_URL = env('TICKET_REALTIME_BROKER_URL', default=env('REDIS_URL', default='redis://127.0.0.1:6379/1'))
 else:
     CACHES = {
         'default': {
@@ -0,0 +1,85 @@
+# tickets/activity.py
+"""
+Denormalized ticket activity: message_count, attachment_count,
+last_message_at and last_message_by on Ticket.
+
+The counters are maintained with single UPDATE ... SET x = x + 1
+statements as messages, internal comments and attachments are created
+(wired up in tickets/signals.py), so the dashboards can show activity
+without touching the message tables and posting a message no longer
+rewrites the whole ticket row. Rows inserted with bulk_create bypass
+the signals; rebuild_ticket_activity() recomputes everything from the
+source tables.
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Message, Ticket, TicketAttachment
+
+
+def message_created(message):
+    changes = {
+        'message_count': F('message_count') + 1,
+        'last_message_at': message.created_at,
+        'last_message_by': message.sender_id,
+        'updated_at': message.created_at,
+    }
+    if message.attachment:
+        changes['attachment_count'] = F('attachment_count') + 1
+    Ticket.objects.filter(pk=message.ticket_id).update(**changes)
+
+
+def message_deleted(message):
+    changes = {'message_count': Greatest(F('message_count') - 1, Value(0))}
+    if message.attachment:
+        changes['attachment_count'] = Greatest(F('attachment_count') - 1, Value(0))
+    Ticket.objects.filter(pk=message.ticket_id).update(**changes)
+
+
+def internal_comment_created(comment):
+    # Internal notes are not part of the customer-visible conversation,
+    # they only count as activity on the ticket.
+    Ticket.objects.filter(pk=comment.ticket_id).update(updated_at=comment.created_at)
+
+
+def attachment_created(attachment):
+    Ticket.objects.filter(pk=attachment.ticket_id).update(
+        attachment_count=F('attachment_count') + 1,
+        updated_at=attachment.uploaded_at,
+    )
+
+
+def attachment_deleted(attachment):
+    Ticket.objects.filter(pk=attachment.ticket_id).update(
+        attachment_count=Greatest(F('attachment_count') - 1, Value(0)),
+    )
+
+
+def _count(queryset):
+    return Coalesce(
+        Subquery(queryset.order_by().values('ticket').annotate(total=Count('pk')).values('total')),
+        Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def rebuild_ticket_activity(tickets=None):
+    """
+    Recompute the activity fields of ``tickets`` (a Ticket queryset, all
+    tickets by default) with one set-based UPDATE. Returns the number of
+    rows updated.
+    """
+    if tickets is None:
+        tickets = Ticket.objects.all()
+
+    ticket_messages = Message.objects.filter(ticket=OuterRef('pk'))
+    latest_message = ticket_messages.order_by('-created_at', '-id')
+    return tickets.update(
+        message_count=_count(ticket_messages),
+        attachment_count=(
+            _count(TicketAttachment.objects.filter(ticket=OuterRef('pk')))
+            + _count(ticket_messages.filter(~Q(attachment='') & Q(attachment__isnull=False)))
+        ),
+        last_message_at=Subquery(latest_message.values('created_at')[:1]),
+        last_message_by=Subquery(latest_message.values('sender')[:1]),
+    )
@@ -7,7 +7,8 @@ from django.forms import ModelForm
 from django import forms
 
 # Import your other app models
-from .models import Ticket, Message
+from .bulk import update_tickets
+from .models import Ticket, Message, TicketEvent
 
 # Customize admin site headers
 admin.site.site_header = "SolvIT Ticketing System"
@@ -38,6 +39,29 @@ class MessageInline(admin.TabularInline): # Or StackedInline
     def has_add_permission(self, request, obj=None): # Prevent adding new messages via inline
         return False
 
+# --- Bulk actions for the Ticket changelist ---
+def _set_field_action(field, value, label):
+    @admin.action(description=f'Set {field} to {label}', permissions=['change'])
+    def action(modeladmin, request, queryset):
+        # A single UPDATE for the whole selection (see tickets/bulk.py)
+        updated = update_tickets(queryset.exclude(**{field: value}), {field: value})
+        modeladmin.message_user(request, f'{updated} ticket(s) set to {label}.')
+    action.__name__ = f'set_{field}_{value.lower()}'
+    return action
+
+
+@admin.action(description='Assign unassigned tickets to me', permissions=['change'])
+def assign_to_me(modeladmin, request, queryset):
+    updated = update_tickets(queryset.filter(agent__isnull=True), {'agent': request.user, 'status': 'IN_PROGRESS'})
+    modeladmin.message_user(request, f'{updated} ticket(s) assigned to you.')
+
+
+@admin.action(description='Unassign selected tickets', permissions=['change'])
+def unassign(modeladmin, request, queryset):
+    updated = update_tickets(queryset.filter(agent__isnull=False), {'agent': None})
+    modeladmin.message_user(request, f'{updated} ticket(s) unassigned.')
+
+
 # --- Ticket Admin ---
 @admin.register(Ticket)
 class TicketAdmin(admin.ModelAdmin):
@@ -47,6 +71,11 @@ class TicketAdmin(admin.ModelAdmin):
     search_fields = ('title', 'customer__username', 'customer__email', 'agent__username')
     readonly_fields = ('created_at', 'updated_at')
     inlines = [MessageInline]
+    actions = [assign_to_me, unassign] + [
+        _set_field_action('status', value, label) for value, label in Ticket.STATUS_CHOICES
+    ] + [
+        _set_field_action('priority', value, label) for value, label in Ticket.PRIORITY_CHOICES
+    ]
 
     def get_readonly_fields(self, request, obj=None):
         # Make customer field readonly if ticket already exists
@@ -77,6 +106,25 @@ class MessageAdmin(admin.ModelAdmin):
         return None
     ticket_link.short_description = 'Ticket'
 
+# --- Ticket Event Admin ---
+@admin.register(TicketEvent)
+class TicketEventAdmin(admin.ModelAdmin):
+    # Append-only log: browse it, never edit it
+    list_display = ('id', 'ticket_id', 'field', 'old_value', 'new_value', 'actor_id', 'created_at')
+    list_filter = ('field',)
+    search_fields = ('=ticket_id',)
+    date_hierarchy = 'created_at'
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
 # --- Custom User Admin ---
 # This registers CustomUser with the CustomUserAdmin options
 @admin.register(CustomUser)
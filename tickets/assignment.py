@@ -0,0 +1,18 @@
+# tickets/assignment.py
+"""
+Ticket assignment.
+
+Claiming a ticket is a single conditional UPDATE (``WHERE agent_id IS
+NULL``): the database decides which of several concurrent claims wins,
+so exactly one agent gets the ticket and nobody's assignment is
+silently overwritten. ``manage.py stress_ticket_assignment`` checks this
+against the configured database.
+"""
+from .bulk import update_tickets
+from .models import Ticket
+
+
+def claim_ticket(ticket_id, agent):
+    """Assign the ticket to ``agent`` if it is unassigned. True if this call won it."""
+    claimed = Ticket.objects.filter(pk=ticket_id, agent__isnull=True)
+    return update_tickets(claimed, {'agent': agent, 'status': 'IN_PROGRESS'}) == 1
@@ -0,0 +1,189 @@
+# tickets/attachments.py
+"""
+Attachment processing pipeline.
+
+Ticket attachments are stored as soon as they are uploaded, with status
+PENDING, and processed outside of the request: the content is scanned
+for script/markup patterns, hashed (SHA-256), its type and metadata are
+extracted and images get a cached thumbnail. Clean files become READY,
+suspicious ones REJECTED (and their file is removed).
+
+The TicketAttachment table itself is the queue, so no broker is needed.
+New uploads are handed to a small in-process thread pool once their
+transaction commits (ATTACHMENT_WORKER_THREADS, 0 to disable), and
+``manage.py process_attachments`` drains whatever is left in the table,
+e.g. after a restart or when the pool is disabled. Rows are claimed with
+a conditional UPDATE, so several workers never process the same file.
+"""
+import hashlib
+import logging
+import mimetypes
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import F
+from django.utils import timezone
+
+from .models import TicketAttachment
+from .storage import is_content_addressed
+from .thumbnails import THUMBNAIL_SIZES, THUMBNAIL_TYPES, ThumbnailError, cache_path, render_thumbnail, store
+
+logger = logging.getLogger(__name__)
+
+# Bytes inspected for suspicious content
+SCAN_BYTES = 1024
+SUSPICIOUS_PATTERNS = [
+    '<script', 'javascript:', 'eval(', 'exec(', 'system(',
+    'shell_exec', 'passthru', 'base64_decode', '<?php',
+    '<% ', 'response.write', 'createobject'
+]
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+# Attempts before a failing attachment is given up on
+MAX_ATTEMPTS = 3
+# PROCESSING rows older than this are assumed abandoned by a dead worker
+STALE_AFTER = timedelta(minutes=10)
+
+
+class AttachmentRejected(Exception):
+    pass
+
+
+def is_suspicious_content(head):
+    """True if the first bytes of a file contain script or markup patterns."""
+    content = head[:SCAN_BYTES].decode('utf-8', errors='ignore').lower()
+    return any(pattern in content for pattern in SUSPICIOUS_PATTERNS)
+
+
+# --- Processing steps ---
+def _scan_and_hash(attachment):
+    digest = hashlib.sha256()
+    size = 0
+    with attachment.file.open('rb') as f:
+        head = f.read(SCAN_BYTES)
+        if is_suspicious_content(head):
+            raise AttachmentRejected('Suspicious file content detected.')
+        if is_content_addressed(attachment.file.name):
+            # Hashed on upload; the name carries the digest
+            return attachment.file.name.split('/')[1], attachment.file.size
+        digest.update(head)
+        size += len(head)
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def _make_thumbnail(attachment):
+    """Image metadata; the small thumbnail is rendered into the cache (tickets/thumbnails.py)."""
+    with attachment.file.open('rb') as f:
+        try:
+            data, metadata = render_thumbnail(f, THUMBNAIL_SIZES['thumb'])
+        except ThumbnailError:
+            raise AttachmentRejected('The file is not a valid image.')
+    store(cache_path(attachment.sha256, 'thumb'), data)
+    return metadata
+
+
+def process_attachment(attachment):
+    """Run every processing step on ``attachment`` and mark it READY."""
+    attachment.sha256, attachment.size = _scan_and_hash(attachment)
+    attachment.content_type = mimetypes.guess_type(attachment.file.name)[0] or 'application/octet-stream'
+    if attachment.content_type in THUMBNAIL_TYPES:
+        attachment.metadata = _make_thumbnail(attachment)
+
+    attachment.status = TicketAttachment.STATUS_READY
+    attachment.processing_error = ''
+    attachment.processed_at = timezone.now()
+    attachment.save(update_fields=[
+        'sha256', 'size', 'content_type', 'metadata',
+        'status', 'processing_error', 'processed_at',
+    ])
+
+
+def _reject(attachment, reason):
+    logger.warning('Rejected attachment %s (%s): %s', attachment.pk, attachment.file.name, reason)
+    # Release the stored file (removed unless other attachments share its
+    # content) but keep its name for display
+    attachment.file.storage.delete(attachment.file.name)
+    attachment.status = TicketAttachment.STATUS_REJECTED
+    attachment.processing_error = reason
+    attachment.processed_at = timezone.now()
+    attachment.save(update_fields=['status', 'processing_error', 'processed_at'])
+
+
+# --- Queue ---
+def claim_attachment(pk):
+    """Atomically move a PENDING attachment to PROCESSING; False if taken."""
+    return TicketAttachment.objects.filter(pk=pk, status=TicketAttachment.STATUS_PENDING).update(
+        status=TicketAttachment.STATUS_PROCESSING,
+        claimed_at=timezone.now(),
+        processing_attempts=F('processing_attempts') + 1,
+    ) == 1
+
+
+def run_attachment_job(pk):
+    """Claim and process one attachment. Returns True if it was processed here."""
+    if not claim_attachment(pk):
+        return False
+    attachment = TicketAttachment.objects.get(pk=pk)
+    try:
+        process_attachment(attachment)
+    except AttachmentRejected as e:
+        _reject(attachment, str(e))
+    except Exception:
+        logger.exception('Processing attachment %s failed', pk)
+        if attachment.processing_attempts >= MAX_ATTEMPTS:
+            _reject(attachment, 'The file could not be processed.')
+        else:
+            TicketAttachment.objects.filter(pk=pk).update(status=TicketAttachment.STATUS_PENDING)
+    return True
+
+
+def requeue_stale_attachments():
+    """Put attachments stuck in PROCESSING (dead worker) back in the queue."""
+    return TicketAttachment.objects.filter(
+        status=TicketAttachment.STATUS_PROCESSING,
+        claimed_at__lt=timezone.now() - STALE_AFTER,
+    ).update(status=TicketAttachment.STATUS_PENDING)
+
+
+def pending_attachment_ids(limit):
+    return list(
+        TicketAttachment.objects.filter(status=TicketAttachment.STATUS_PENDING)
+        .order_by('uploaded_at').values_list('pk', flat=True)[:limit]
+    )
+
+
+# --- In-process worker pool ---
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor(workers):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='attachments')
+        return _executor
+
+
+def _run_in_worker(pk):
+    try:
+        run_attachment_job(pk)
+    except Exception:
+        logger.exception('Attachment worker failed on %s', pk)
+    finally:
+        # Worker threads get their own connections; don't leak them
+        connections.close_all()
+
+
+def enqueue_attachment(pk):
+    """Hand a new attachment to the worker pool (if enabled)."""
+    workers = getattr(settings, 'ATTACHMENT_WORKER_THREADS', 2)
+    if workers:
+        _get_executor(workers).submit(_run_in_worker, pk)
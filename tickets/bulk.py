@@ -0,0 +1,161 @@
+# tickets/bulk.py
+"""
+Bulk ticket operations for agents and admins.
+
+An action is applied to a set of ticket ids with one SELECT, to tell the
+tickets that need the change apart from those that are already in that
+state or may not be touched, and one set-based UPDATE. Permissions are
+part of both queries' WHERE clause, like the single-ticket views: any
+agent may assign unassigned tickets to themselves, while status, priority
+and agent changes are limited to the agent's own tickets (every ticket
+for admins and superusers).
+
+update_tickets() is the set-based UPDATE shared with the TicketAdmin
+actions. QuerySet.update() does not send the save signals, so it logs
+the changes as TicketEvent rows (one batched insert, in the same
+transaction), recomputes the SLA fields of the tickets whose status or
+priority it changed and invalidates the cached statistics and routing
+workload itself once the transaction commits.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import BooleanField, Case, Q, Value, When
+from django.utils import timezone
+
+from .events import acting_as, record_bulk_update, update_fields
+from .models import Ticket
+from .permissions import is_staff_member
+from .roles import is_in_group
+from .routing import invalidate_workload
+from .sla import SLA_INPUT_FIELDS, refresh_tickets
+from .stats import invalidate_ticket_stats
+
+ASSIGN_TO_SELF = 'assign_to_self'
+SET_STATUS = 'set_status'
+SET_PRIORITY = 'set_priority'
+REASSIGN = 'reassign'
+BULK_ACTIONS = [
+    (ASSIGN_TO_SELF, 'Assign to me'),
+    (SET_STATUS, 'Change status'),
+    (SET_PRIORITY, 'Change priority'),
+    (REASSIGN, 'Reassign agent'),
+]
+
+# Per-ticket results
+UPDATED = 'updated'
+UNCHANGED = 'unchanged'  # Already in the requested state
+ALREADY_ASSIGNED = 'already_assigned'
+NOT_FOUND = 'not_found'  # Missing, or not editable by the user
+
+# Tickets accepted per request
+MAX_BULK_TICKETS = 500
+
+
+class BulkActionError(Exception):
+    pass
+
+
+def editable_tickets(user, queryset=None):
+    """Tickets whose status, priority and agent ``user`` may change."""
+    if queryset is None:
+        queryset = Ticket.objects.all()
+    if user.is_superuser or is_in_group(user, 'Admins'):
+        return queryset
+    if is_in_group(user, 'Agents'):
+        return queryset.filter(agent=user)
+    return queryset.none()
+
+
+def update_tickets(queryset, changes):
+    """Set-based UPDATE of ``queryset``; returns the number of tickets changed."""
+    sla_changes = set(changes) & set(SLA_INPUT_FIELDS)
+    with transaction.atomic():
+        # The values before the update, for the event log
+        rows = list(queryset.select_for_update().order_by().values_list('pk', 'status', 'priority', 'agent_id'))
+        if not rows:
+            return 0
+        ticket_ids = [row[0] for row in rows]
+        updated = queryset.filter(pk__in=ticket_ids).update(**changes, updated_at=timezone.now())
+        if not updated:
+            return 0
+        if updated != len(rows):
+            # Some rows stopped matching in between (no row locks on SQLite)
+            updated_ids = set(
+                Ticket.objects.filter(pk__in=ticket_ids, **update_fields(changes)).values_list('pk', flat=True)
+            )
+            rows = [row for row in rows if row[0] in updated_ids]
+        record_bulk_update(rows, changes)
+        if sla_changes:
+            refresh_tickets(ticket_ids, recompute_due='priority' in sla_changes)
+    transaction.on_commit(invalidate_ticket_stats)
+    transaction.on_commit(invalidate_workload)
+    return updated
+
+
+def _plan(user, action, value):
+    """(tickets the user may change, field changes, condition for a ticket to need them)."""
+    if not is_staff_member(user):
+        raise BulkActionError('Only agents and administrators can update tickets in bulk.')
+
+    if action == ASSIGN_TO_SELF:
+        return Ticket.objects.all(), {'agent': user, 'status': 'IN_PROGRESS'}, Q(agent__isnull=True)
+    if action == SET_STATUS:
+        if value not in dict(Ticket.STATUS_CHOICES):
+            raise BulkActionError(f'Unknown status: {value}')
+        return editable_tickets(user), {'status': value}, ~Q(status=value)
+    if action == SET_PRIORITY:
+        if value not in dict(Ticket.PRIORITY_CHOICES):
+            raise BulkActionError(f'Unknown priority: {value}')
+        return editable_tickets(user), {'priority': value}, ~Q(priority=value)
+    if action == REASSIGN:
+        if value in (None, ''):
+            return editable_tickets(user), {'agent': None}, Q(agent__isnull=False)
+        # Same choices as TicketUpdateForm: members of the Agents group
+        agent = get_user_model().objects.filter(pk=value, groups__name='Agents').first() if str(value).isdigit() else None
+        if agent is None:
+            raise BulkActionError(f'Unknown agent: {value}')
+        return editable_tickets(user), {'agent': agent}, ~Q(agent=agent)
+    raise BulkActionError(f'Unknown action: {action}')
+
+
+def apply_bulk_action(user, ticket_ids, action, value=None):
+    """
+    Apply ``action`` to the tickets in ``ticket_ids`` on behalf of ``user``.
+    Returns {ticket id: result}, one of UPDATED, UNCHANGED, ALREADY_ASSIGNED
+    or NOT_FOUND. Raises BulkActionError for invalid requests.
+    """
+    ticket_ids = {int(pk) for pk in ticket_ids}
+    if not ticket_ids:
+        raise BulkActionError('No tickets selected.')
+    if len(ticket_ids) > MAX_BULK_TICKETS:
+        raise BulkActionError(f'At most {MAX_BULK_TICKETS} tickets can be updated at once.')
+
+    tickets, changes, needs_change = _plan(user, action, value)
+    skipped = ALREADY_ASSIGNED if action == ASSIGN_TO_SELF else UNCHANGED
+    results = dict.fromkeys(ticket_ids, NOT_FOUND)
+
+    with transaction.atomic(), acting_as(user):
+        rows = (
+            tickets.filter(pk__in=ticket_ids).select_for_update().order_by()
+            .annotate(needs_change=Case(When(needs_change, then=Value(True)), default=Value(False), output_field=BooleanField()))
+            .values_list('pk', 'needs_change')
+        )
+        pending = set()
+        for pk, needs in rows:
+            if needs:
+                pending.add(pk)
+            else:
+                results[pk] = skipped
+        if not pending:
+            return results
+
+        # The condition is repeated so a concurrent change is never overwritten
+        # on databases without row locks (SQLite)
+        updated = update_tickets(tickets.filter(needs_change, pk__in=pending), changes)
+        if updated != len(pending):
+            changed = set(Ticket.objects.filter(pk__in=pending, **changes).values_list('pk', flat=True))
+        else:
+            changed = pending
+        for pk in pending:
+            results[pk] = UPDATED if pk in changed else skipped
+    return results
@@ -1,4 +1,5 @@
 # tickets/context_processors.py
+from .roles import get_user_group_names
 
 def user_groups(request):
     """
@@ -12,8 +13,8 @@ def user_groups(request):
     }
     
     if request.user.is_authenticated:
-        groups = list(request.user.groups.values_list('name', flat=True))
-        context['user_groups'] = groups
+        groups = get_user_group_names(request.user)
+        context['user_groups'] = sorted(groups)
         context['is_admin'] = request.user.is_superuser or 'Admins' in groups
         context['is_agent'] = 'Agents' in groups
         context['is_customer'] = 'Customers' in groups
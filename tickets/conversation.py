@@ -0,0 +1,43 @@
+# tickets/conversation.py
+"""
+Paged access to a ticket's conversation (messages and internal comments).
+
+ticket_detail renders only the most recent page, with the sender joined
+in, and older pages are loaded on demand by keyset (see
+tickets.pagination) on the (ticket, created_at, id) timeline indexes, so
+rendering a ticket costs the same whether its thread holds ten messages
+or ten thousand.
+"""
+from django.conf import settings
+
+from .pagination import keyset_paginate
+
+DEFAULT_CONVERSATION_PAGE_SIZE = 50
+
+# kind -> (related name on Ticket, user relation to join)
+CONVERSATION_KINDS = {
+    'message': ('messages', 'sender'),
+    'internal_comment': ('internal_comments', 'author'),
+}
+
+
+class ConversationPage:
+    def __init__(self, entries, next_cursor):
+        # Oldest first, ready to render
+        self.entries = entries
+        # Cursor of the page before this one, None at the start of the thread
+        self.next_cursor = next_cursor
+
+
+def recent_conversation(ticket, kind, cursor=None, per_page=None):
+    """
+    Return the ConversationPage of ``kind`` entries of ``ticket`` ending
+    just before ``cursor`` (the most recent entries without one).
+    ``per_page`` defaults to the TICKET_MESSAGES_PER_PAGE setting.
+    """
+    related_name, user_field = CONVERSATION_KINDS[kind]
+    if per_page is None:
+        per_page = getattr(settings, 'TICKET_MESSAGES_PER_PAGE', DEFAULT_CONVERSATION_PAGE_SIZE)
+    queryset = getattr(ticket, related_name).select_related(user_field)
+    page = keyset_paginate(queryset, 'created_at', cursor, per_page=per_page)
+    return ConversationPage(list(reversed(page.object_list)), page.next_cursor)
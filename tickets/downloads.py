@@ -0,0 +1,167 @@
+# tickets/downloads.py
+"""
+Serving attachment files after the views have checked permissions.
+
+With PROTECTED_MEDIA_SERVER set, the response only carries a header and
+the front web server sends the file itself:
+
+- 'x-accel-redirect' (nginx): the path under PROTECTED_MEDIA_URL, which
+  nginx maps to MEDIA_ROOT in an internal location::
+
+      location /protected-media/ {
+          internal;
+          alias /opt/solvit-ticketing/media/;
+      }
+
+- 'x-sendfile' (Apache mod_xsendfile, lighttpd): the absolute file path.
+
+Without it the file is streamed from Python in chunks, with ETag /
+Last-Modified conditional GETs and single byte-range requests (resumed
+downloads, media seeking) handled here. Under ASGI the chunks come from
+an async generator that reads them in a worker thread; Django would read
+a sync iterator (or FileResponse) into memory whole before sending it.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+from .storage import is_content_addressed
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _content_disposition(filename, as_attachment):
+    disposition = 'attachment' if as_attachment else 'inline'
+    try:
+        filename.encode('ascii')
+        return f'{disposition}; filename="{filename}"'
+    except UnicodeEncodeError:
+        return f"{disposition}; filename*=utf-8''{quote(filename)}"
+
+
+def _validators(path, etag=None):
+    stat = os.stat(path)
+    if etag is None:
+        etag = f'{stat.st_size:x}-{int(stat.st_mtime):x}'
+    return stat.st_size, quote_etag(etag), int(stat.st_mtime)
+
+
+def _parse_range(header, size):
+    """(start, end) for a single satisfiable byte range, 'invalid', or None to ignore it."""
+    match = _RANGE.match(header.strip())
+    if not match:
+        return None  # Multiple ranges or another unit: send the whole file
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return 'invalid'
+    return start, end
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(STREAM_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+async def _aread_range(path, start, length):
+    """_read_range() as an async iterator; the reads don't block the event loop."""
+    chunks = _read_range(path, start, length)
+    next_chunk = sync_to_async(next, thread_sensitive=False)
+    try:
+        while (chunk := await next_chunk(chunks, None)) is not None:
+            yield chunk
+    finally:
+        chunks.close()
+
+
+def _secure(response, as_attachment):
+    response['X-Content-Type-Options'] = 'nosniff'
+    if not as_attachment:
+        # Never let an uploaded file run as a page on our origin
+        response['Content-Security-Policy'] = "sandbox; default-src 'none'"
+    return response
+
+
+def serve_file(request, field_file, filename, as_attachment=True):
+    """Response sending ``field_file`` (a FieldFile) to the client."""
+    # The content hash is a perfect validator
+    etag = field_file.name.split('/')[1] if is_content_addressed(field_file.name) else None
+    return serve_path(request, field_file.path, filename, as_attachment, etag=etag)
+
+
+def serve_path(request, path, filename, as_attachment=True, etag=None, cache_control='private, no-cache'):
+    """Response sending the file at ``path`` (under MEDIA_ROOT) to the client."""
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    disposition = _content_disposition(filename, as_attachment)
+    server = getattr(settings, 'PROTECTED_MEDIA_SERVER', '')
+
+    if server:
+        response = HttpResponse(content_type=content_type)
+        response['Content-Disposition'] = disposition
+        response['Cache-Control'] = cache_control
+        if server == 'x-accel-redirect':
+            relative = os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, '/')
+            response['X-Accel-Redirect'] = quote(settings.PROTECTED_MEDIA_URL.rstrip('/') + '/' + relative)
+        else:
+            response['X-Sendfile'] = path
+        return _secure(response, as_attachment)
+
+    size, etag, last_modified = _validators(path, etag)
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    byte_range = None
+    range_header = request.headers.get('Range')
+    if range_header and request.method == 'GET':
+        if_range = request.headers.get('If-Range')
+        if not if_range or if_range == etag or parse_http_date_safe(if_range) == last_modified:
+            byte_range = _parse_range(range_header, size)
+
+    if byte_range == 'invalid':
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+    elif byte_range:
+        start, end = byte_range
+        read_range = _aread_range if isinstance(request, ASGIRequest) else _read_range
+        response = StreamingHttpResponse(read_range(path, start, end - start + 1), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Disposition'] = disposition
+    elif isinstance(request, ASGIRequest):
+        response = StreamingHttpResponse(_aread_range(path, 0, size), content_type=content_type)
+        response['Content-Length'] = str(size)
+        response['Content-Disposition'] = disposition
+    else:
+        # wsgi.file_wrapper can send the file with sendfile()
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+        response.block_size = STREAM_CHUNK_SIZE
+        response['Content-Disposition'] = disposition
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = cache_control
+    return _secure(response, as_attachment)
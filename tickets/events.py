@@ -0,0 +1,217 @@
+# tickets/events.py
+"""
+Ticket event log.
+
+Every change of a ticket's status, priority or agent appends a
+TicketEvent row (old and new value, who made the change, when) in the
+same transaction as the change itself, so the log never disagrees with
+the tickets. Ticket saves write them from the post_save handler in
+tickets/signals.py (Ticket.save() runs in a transaction); the set-based
+updates in tickets/bulk.py insert one batch per update, and routing
+records its assignments with no actor. A new ticket gets events for its
+initial values, so a ticket's whole history is in the log, and the first
+answer to the customer is logged too (tickets/sla.py).
+
+Rows are small (a field code, two short values and two ids) and never
+updated. A ticket's history is one range scan of the (ticket, created_at)
+index; reports over a time window use a BRIN index on created_at on
+PostgreSQL, and old events can be dropped by created_at range
+(prune_ticket_events(), ``manage.py prune_ticket_events``). The
+reports below read only this table, never the Ticket table.
+
+The actor is whoever is acting in the current context: the request's
+user (TicketEventActorMiddleware) or the user given to acting_as() in
+commands and background jobs.
+
+Once the transaction commits, the new events are also added to the
+daily reporting rollups (tickets/reports.py).
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from . import reports
+from .models import TicketEvent
+
+# Ticket field -> TicketEvent.field
+EVENT_FIELDS = {
+    'status': TicketEvent.FIELD_STATUS,
+    'priority': TicketEvent.FIELD_PRIORITY,
+    'agent_id': TicketEvent.FIELD_AGENT,
+}
+
+# Keyword arguments of QuerySet.update() that set a ticket field
+_UPDATE_KEYS = {'status': 'status', 'priority': 'priority', 'agent': 'agent_id', 'agent_id': 'agent_id'}
+
+BATCH_SIZE = 1000
+
+# Holds a function returning the actor, not the user itself: asgiref
+# inspects context values when it switches threads, which would evaluate
+# a lazy request.user (a query) on the event loop under ASGI
+_actor = ContextVar('ticket_event_actor', default=None)
+
+
+@contextmanager
+def acting_as(user):
+    """Attribute the ticket changes made inside the block to ``user``."""
+    token = _actor.set(lambda: user)
+    try:
+        yield
+    finally:
+        _actor.reset(token)
+
+
+def current_actor_id():
+    get_actor = _actor.get()
+    user = get_actor() if get_actor is not None else None
+    if user is None or not user.is_authenticated:
+        return None
+    return user.pk
+
+
+def _encode(value):
+    return '' if value is None else str(value)
+
+
+def _event(ticket_id, name, old, new, actor_id, now):
+    return TicketEvent(
+        ticket_id=ticket_id, field=EVENT_FIELDS[name],
+        old_value=_encode(old), new_value=_encode(new),
+        actor_id=actor_id, created_at=now,
+    )
+
+
+def _logged(events):
+    """Count ``events`` in the reporting rollups once they are committed."""
+    if events:
+        # A failed rollup update is logged, not raised into the committed request
+        transaction.on_commit(lambda: reports.record_events(events), robust=True)
+    return events
+
+
+def creation_events(ticket, actor_id=None, now=None):
+    """Unsaved events for the initial values of a new ticket."""
+    now = now or timezone.now()
+    return [
+        _event(ticket.pk, name, None, getattr(ticket, name), actor_id, now)
+        for name in EVENT_FIELDS if getattr(ticket, name) is not None
+    ]
+
+
+def record_ticket_saved(ticket, created):
+    """Log the initial values of a new ticket, or the tracked fields a save changed."""
+    if created:
+        return _logged(TicketEvent.objects.bulk_create(creation_events(ticket, current_actor_id())))
+    changes = ticket.changed_fields()
+    if not changes:
+        return []
+    actor_id, now = current_actor_id(), timezone.now()
+    events = [_event(ticket.pk, name, old, new, actor_id, now) for name, (old, new) in changes.items()]
+    return _logged(TicketEvent.objects.bulk_create(events))
+
+
+def record_change(ticket_id, name, old, new, actor_id=None):
+    """Log one field change made outside Ticket.save(), with an explicit actor (None for the system)."""
+    event = TicketEvent.objects.create(
+        ticket_id=ticket_id, field=EVENT_FIELDS[name],
+        old_value=_encode(old), new_value=_encode(new), actor_id=actor_id,
+    )
+    _logged([event])
+    return event
+
+
+def record_first_response(message):
+    event = TicketEvent.objects.create(
+        ticket_id=message.ticket_id, field=TicketEvent.FIELD_FIRST_RESPONSE,
+        actor_id=message.sender_id, created_at=message.created_at,
+    )
+    _logged([event])
+    return event
+
+
+def update_fields(changes):
+    """The logged ticket fields set by QuerySet.update(**changes), as {field: value}."""
+    return {
+        _UPDATE_KEYS[key]: getattr(value, 'pk', value)
+        for key, value in changes.items() if key in _UPDATE_KEYS
+    }
+
+
+def record_bulk_update(rows, changes):
+    """
+    Log a set-based update: ``rows`` are the (pk, status, priority, agent_id)
+    tuples read before it, ``changes`` the QuerySet.update() arguments.
+    """
+    new_values = update_fields(changes)
+    actor_id, now = current_actor_id(), timezone.now()
+    events = []
+    for pk, *values in rows:
+        old_values = dict(zip(EVENT_FIELDS, values))
+        for name, new in new_values.items():
+            if old_values[name] != new:
+                events.append(_event(pk, name, old_values[name], new, actor_id, now))
+    return _logged(TicketEvent.objects.bulk_create(events, batch_size=BATCH_SIZE))
+
+
+# --- Pruning ---
+def prune_ticket_events(before):
+    """
+    Delete the events logged before ``before`` (a datetime) with one DELETE
+    on the created_at range; returns the number of rows deleted. This is
+    the only way to drop events: TicketEvent refuses delete().
+
+    The daily rollups of those days stay, but rebuilding them
+    (``manage.py rollup_ticket_stats``) would find no events, so only prune
+    days that are fully rolled up and will not need repairing.
+    """
+    events = TicketEvent.objects.filter(created_at__lt=before)
+    return events._raw_delete(events.db)
+
+
+# --- Queries and reports ---
+def ticket_history(ticket_id):
+    """The ticket's events, oldest first (one scan of ticketevent_ticket_idx)."""
+    return TicketEvent.objects.filter(ticket_id=ticket_id).order_by('created_at', 'id')
+
+
+def time_in_status(ticket_ids=None, until=None):
+    """
+    {ticket id: {status: timedelta}}: how long each ticket spent in each
+    status, up to ``until`` (default now) for its current status.
+    """
+    until = until or timezone.now()
+    events = TicketEvent.objects.filter(field=TicketEvent.FIELD_STATUS, created_at__lte=until)
+    if ticket_ids is not None:
+        events = events.filter(ticket_id__in=ticket_ids)
+    rows = events.order_by('ticket_id', 'created_at', 'id').values_list('ticket_id', 'new_value', 'created_at')
+
+    durations = defaultdict(lambda: defaultdict(timedelta))
+    current = None  # (ticket id, status, since)
+    for ticket_id, status, changed_at in rows.iterator(chunk_size=BATCH_SIZE):
+        if current and current[0] == ticket_id:
+            durations[ticket_id][current[1]] += changed_at - current[2]
+        elif current:
+            durations[current[0]][current[1]] += until - current[2]
+        current = (ticket_id, status, changed_at)
+    if current:
+        durations[current[0]][current[1]] += until - current[2]
+    return {ticket_id: dict(statuses) for ticket_id, statuses in durations.items()}
+
+
+def reassignment_counts(since=None, until=None):
+    """
+    {ticket id: reassignments} for tickets moved away from an agent (to
+    another agent or back to the queue) between ``since`` and ``until``.
+    """
+    events = TicketEvent.objects.filter(field=TicketEvent.FIELD_AGENT).exclude(old_value='')
+    if since is not None:
+        events = events.filter(created_at__gte=since)
+    if until is not None:
+        events = events.filter(created_at__lt=until)
+    rows = events.order_by().values('ticket_id').annotate(count=Count('id')).values_list('ticket_id', 'count')
+    return dict(rows)
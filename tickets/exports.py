@@ -0,0 +1,169 @@
+# tickets/exports.py
+"""
+Streaming ticket exports, as CSV or JSON Lines.
+
+Tickets are read with QuerySet.iterator(), i.e. through a server-side
+cursor on PostgreSQL, in chunks of EXPORT_CHUNK_SIZE; each chunk's
+attachments (and with ``include_messages`` its conversation) are loaded
+with one extra query per chunk. Output is produced as the rows come in,
+so memory stays constant however many tickets are exported. Used by the
+export_tickets view (StreamingHttpResponse) and ``manage.py
+export_tickets``.
+
+Under ASGI a StreamingHttpResponse must be given an async iterator, or
+Django reads the whole sync iterator into a list before sending it.
+astream_tickets() is that iterator: it runs the export in a worker
+thread and hands over one output chunk at a time.
+"""
+import csv
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+
+from .models import Message, TicketAttachment
+
+FORMAT_CSV = 'csv'
+FORMAT_JSONL = 'jsonl'
+EXPORT_FORMATS = {
+    FORMAT_CSV: 'text/csv; charset=utf-8',
+    FORMAT_JSONL: 'application/x-ndjson; charset=utf-8',
+}
+
+# Tickets per database round trip; smaller when conversations are included
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_CHUNK_SIZE_WITH_MESSAGES = 200
+# Rows per chunk of output
+OUTPUT_BATCH_SIZE = 200
+
+EXPORT_COLUMNS = (
+    'id', 'title', 'description', 'status', 'priority', 'sla_state',
+    'customer', 'customer_name', 'agent', 'agent_name',
+    'created_at', 'updated_at', 'resolved_at',
+    'message_count', 'attachment_count', 'attachments',
+)
+USER_FIELDS = ('username', 'first_name', 'last_name')
+
+
+class _Echo:
+    """File-like object handing csv.writer's output straight back."""
+
+    def write(self, value):
+        return value
+
+
+def _file_name(field_file):
+    return field_file.name.rsplit('/', 1)[-1]
+
+
+def export_queryset(queryset, include_messages=False):
+    """``queryset`` limited to the columns an export needs, with attachments (and messages) prefetched."""
+    queryset = (
+        queryset.select_related('customer', 'agent')
+        .only(
+            *(name for name in EXPORT_COLUMNS if name not in ('customer', 'customer_name', 'agent', 'agent_name', 'attachments')),
+            *(f'customer__{name}' for name in USER_FIELDS),
+            *(f'agent__{name}' for name in USER_FIELDS),
+        )
+        .prefetch_related(Prefetch(
+            'attachments',
+            queryset=TicketAttachment.objects.exclude(status=TicketAttachment.STATUS_REJECTED).only('ticket_id', 'file').order_by('pk'),
+        ))
+        .order_by('pk')
+    )
+    if include_messages:
+        queryset = queryset.prefetch_related(Prefetch(
+            'messages',
+            queryset=Message.objects.select_related('sender')
+            .only('ticket_id', 'content', 'attachment', 'created_at', *(f'sender__{name}' for name in USER_FIELDS))
+            .order_by('created_at', 'pk'),
+        ))
+    return queryset
+
+
+def ticket_rows(queryset, include_messages=False):
+    """A dict per ticket with EXPORT_COLUMNS (and 'messages'), read in chunks."""
+    chunk_size = EXPORT_CHUNK_SIZE_WITH_MESSAGES if include_messages else EXPORT_CHUNK_SIZE
+    for ticket in export_queryset(queryset, include_messages).iterator(chunk_size=chunk_size):
+        row = {
+            'id': ticket.pk,
+            'title': ticket.title,
+            'description': ticket.description,
+            'status': ticket.status,
+            'priority': ticket.priority,
+            'sla_state': ticket.sla_state,
+            'customer': ticket.customer.username,
+            'customer_name': ticket.customer.get_full_name(),
+            'agent': ticket.agent.username if ticket.agent else None,
+            'agent_name': ticket.agent.get_full_name() if ticket.agent else None,
+            'created_at': ticket.created_at,
+            'updated_at': ticket.updated_at,
+            'resolved_at': ticket.resolved_at,
+            'message_count': ticket.message_count,
+            'attachment_count': ticket.attachment_count,
+            'attachments': [_file_name(attachment.file) for attachment in ticket.attachments.all()],
+        }
+        if include_messages:
+            row['messages'] = [
+                {
+                    'sender': message.sender.username,
+                    'created_at': message.created_at,
+                    'content': message.content,
+                    'attachment': _file_name(message.attachment) if message.attachment else None,
+                }
+                for message in ticket.messages.all()
+            ]
+        yield row
+
+
+def _csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        row['attachments'] = '; '.join(row['attachments'])
+        for name in ('created_at', 'updated_at', 'resolved_at'):
+            row[name] = row[name].isoformat() if row[name] else ''
+        yield writer.writerow([row[name] for name in EXPORT_COLUMNS])
+
+
+def _jsonl_lines(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+def _batched(lines):
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= OUTPUT_BATCH_SIZE:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+def stream_tickets(queryset, export_format=FORMAT_CSV, include_messages=False):
+    """
+    The export of ``queryset`` as an iterator of text chunks. Conversations
+    (``include_messages``) are only included in JSON Lines.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f'Unknown export format: {export_format}')
+    if export_format == FORMAT_CSV:
+        return _batched(_csv_lines(ticket_rows(queryset)))
+    return _batched(_jsonl_lines(ticket_rows(queryset, include_messages)))
+
+
+async def astream_tickets(queryset, export_format=FORMAT_CSV, include_messages=False):
+    """stream_tickets() as an async iterator, for responses served over ASGI."""
+    chunks = stream_tickets(queryset, export_format, include_messages)
+    # Thread-sensitive: every chunk is read in the same thread, on the same
+    # database connection (and server-side cursor)
+    next_chunk = sync_to_async(next)
+    try:
+        while (chunk := await next_chunk(chunks, None)) is not None:
+            yield chunk
+    finally:
+        # Closes the cursor if the client went away mid-export
+        await sync_to_async(chunks.close)()
@@ -0,0 +1,62 @@
+# tickets/filters.py
+"""
+Ticket list filters (search, status, priority, SLA state and creation
+date range), shared by the dashboards and the ticket exports. They take
+the query parameters as a dict-like, so management commands can apply
+them too.
+"""
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Ticket
+from .search import search_tickets
+
+# Filter parameters, as used in the dashboard query strings
+FILTER_PARAMS = ('search', 'status', 'priority', 'sla', 'date_range')
+
+
+def get_date_range_filter():
+    """Helper function to return date filters based on the date range"""
+    today = timezone.now().date()
+    return {
+        'today': Q(created_at__date=today),
+        'week': Q(created_at__date__gte=today - timedelta(days=7)),
+        'month': Q(created_at__date__gte=today - timedelta(days=30)),
+    }
+
+
+def filter_tickets(queryset, params, include_internal=False):
+    """
+    Apply the filters in ``params`` to a ticket queryset. The search also
+    matches internal comments with ``include_internal`` (agents only).
+    """
+    # Search filter (full-text on PostgreSQL, see tickets/search.py)
+    search_query = (params.get('search') or '').strip()
+    if search_query:
+        queryset = search_tickets(queryset, search_query, include_internal=include_internal)
+
+    # Status filter
+    status = params.get('status') or ''
+    if status:
+        queryset = queryset.filter(status=status)
+
+    # Priority filter
+    priority = params.get('priority') or ''
+    if priority:
+        queryset = queryset.filter(priority=priority)
+
+    # SLA state filter
+    sla_state = params.get('sla') or ''
+    if sla_state in dict(Ticket.SLA_STATE_CHOICES):
+        queryset = queryset.filter(sla_state=sla_state)
+
+    # Date range filter
+    date_range = params.get('date_range') or ''
+    if date_range:
+        date_filters = get_date_range_filter()
+        if date_range in date_filters:
+            queryset = queryset.filter(date_filters[date_range])
+
+    return queryset
@@ -1,11 +1,11 @@
 # tickets/forms.py
 
-import os
 from django import forms
 from django.contrib.auth import get_user_model
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm # Ensure AuthenticationForm is also imported
 from django.core.exceptions import ValidationError # Import ValidationError
 from .models import Ticket, Message, InternalComment, TicketAttachment
+from .uploads import MESSAGE_ATTACHMENT_EXTENSIONS, TICKET_ATTACHMENT_EXTENSIONS, extension_error, max_upload_size
 from django.contrib.auth.models import Group
 
 CustomUser = get_user_model()
@@ -36,15 +36,21 @@ class MultipleFileField(forms.FileField):
 
     def validate_single_file(self, file):
         if file:
+            # Refused by ValidatingUploadHandler while it was uploaded
+            if getattr(file, 'upload_error', None):
+                raise ValidationError(file.upload_error)
+            # Already checked chunk by chunk
+            if getattr(file, 'upload_validated', False):
+                return
+
             # Check file size (5MB limit)
-            if file.size > 5 * 1024 * 1024:
+            if file.size > max_upload_size():
                 raise ValidationError('File size cannot exceed 5MB.')
             
             # Check file extension
-            allowed_extensions = ['.pdf', '.doc', '.docx', '.jpg', '.jpeg', '.png', '.txt', '.zip', '.rar']
-            file_extension = os.path.splitext(file.name)[1].lower()
-            if file_extension not in allowed_extensions:
-                raise ValidationError(f'File type {file_extension} is not allowed. Allowed types: {", ".join(allowed_extensions)}')
+            error = extension_error(file.name, TICKET_ATTACHMENT_EXTENSIONS)
+            if error:
+                raise ValidationError(error)
 
 class CustomLoginForm(AuthenticationForm):
     # When USERNAME_FIELD is 'mobile', the 'username' field in AuthenticationForm
@@ -261,13 +267,16 @@ class MessageCreationForm(forms.ModelForm):
     def clean_attachment(self):
         attachment = self.cleaned_data.get('attachment')
         if attachment:
+            # Refused by ValidatingUploadHandler while it was uploaded
+            if getattr(attachment, 'upload_error', None):
+                raise forms.ValidationError(attachment.upload_error)
+            if getattr(attachment, 'upload_validated', False):
+                return attachment
             # 5 MB limit
-            if attachment.size > 5 * 1024 * 1024:
+            if attachment.size > max_upload_size():
                 raise forms.ValidationError("File size must be under 5MB")
-            # Validate file extension - add or remove extensions as needed
-            valid_extensions = ['.pdf', '.doc', '.docx', '.jpg', '.jpeg', '.png', '.txt']
-            ext = os.path.splitext(attachment.name)[1]
-            if ext.lower() not in valid_extensions:
+            # Validate file extension (allow-list in tickets/uploads.py)
+            if extension_error(attachment.name, MESSAGE_ATTACHMENT_EXTENSIONS):
                 raise forms.ValidationError("Unsupported file type. Allowed types: PDF, DOC, DOCX, JPG, PNG, TXT")
         return attachment
 
@@ -0,0 +1,390 @@
+# tickets/imports.py
+"""
+Bulk import of users, tickets and messages from another helpdesk.
+
+Input files are CSV (with a header row) or JSON Lines, read one record
+at a time and inserted with bulk_create in batches, so memory does not
+grow with the size of the files. Records refer to each other by their
+ids in the old system ("id" columns); those are mapped to the new
+primary keys in memory while the import runs, so users, tickets and
+messages must be imported together. Users may also be referred to by
+the mobile number of an existing account.
+
+Columns:
+
+- users: id, mobile (required), username, email, first_name, last_name,
+  role (customer, agent or admin), password, date_joined
+- tickets: id, customer, agent, title, description, status, priority,
+  created_at, updated_at
+- messages: ticket, sender, content, created_at
+
+Users are never created through CustomUserManager.create_user(): the
+existing usernames, mobile numbers and emails are loaded once and
+collisions resolved in memory (usernames get a numeric suffix like
+create_user() would give them, duplicate emails are dropped, an existing
+mobile number maps to the existing account). Passwords are either
+already hashed by Django (``passwords='hashed'``) or left unusable until
+the user resets them (``'unusable'``); nothing is hashed during the
+import. Original timestamps are kept.
+
+bulk_create sends no signals, so finish() does in set-based UPDATEs what
+the signal handlers would have done: message counters, SLA fields and
+search vectors of the imported tickets, their initial events in the
+event log, and the cached statistics and routing data.
+"""
+import csv
+import json
+import time
+from contextlib import contextmanager
+from itertools import islice
+
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.contrib.auth.models import Group
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import routing
+from .activity import rebuild_ticket_activity
+from .events import creation_events
+from .models import CustomUser, Message, Ticket, TicketEvent
+from .search import rebuild_search_vectors
+from .sla import rebuild_sla
+from .stats import invalidate_ticket_stats
+
+DEFAULT_BATCH_SIZE = 2_000
+# Tickets per UPDATE when finishing
+FINISH_BATCH_SIZE = 2_000
+
+PASSWORDS_HASHED = 'hashed'
+PASSWORDS_UNUSABLE = 'unusable'
+PASSWORD_MODES = (PASSWORDS_HASHED, PASSWORDS_UNUSABLE)
+
+ROLE_GROUPS = {'customer': 'Customers', 'agent': 'Agents', 'admin': 'Admins'}
+
+# Errors kept for the final report; the rest are only counted
+MAX_REPORTED_ERRORS = 50
+
+
+class ImportRowError(Exception):
+    pass
+
+
+def read_records(path, input_format=None):
+    """Dicts from a CSV or JSON Lines file (by extension unless ``input_format`` is given)."""
+    if input_format is None:
+        input_format = 'jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv'
+    with open(path, encoding='utf-8', newline='') as source:
+        if input_format == 'csv':
+            yield from csv.DictReader(source)
+        else:
+            for line in source:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def _batches(records, size):
+    records = iter(records)
+    while batch := list(islice(records, size)):
+        yield batch
+
+
+def _text(record, name, default=''):
+    value = record.get(name)
+    return default if value is None else str(value).strip()
+
+
+def _ref(record, name):
+    value = _text(record, name)
+    return value or None
+
+
+def _datetime(record, name, default=None):
+    value = _text(record, name)
+    if not value:
+        return default
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ImportRowError(f'{name}: invalid date/time {value!r}')
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+
+def _choice(record, name, choices, default):
+    value = _text(record, name).upper().replace(' ', '_') or default
+    if value not in dict(choices):
+        raise ImportRowError(f'{name}: unknown value {value!r}')
+    return value
+
+
+@contextmanager
+def original_timestamps(*fields):
+    """
+    Let bulk_create store the given auto_now/auto_now_add fields as set on
+    the objects. Also used to seed data (``manage.py benchmark_dashboard_queries``).
+    """
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class ImportStats:
+    """Counts for one kind of record, with the import rate."""
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.read = self.created = self.existing = self.skipped = 0
+        self.started = time.monotonic()
+
+    @property
+    def rate(self):
+        elapsed = time.monotonic() - self.started
+        return self.read / elapsed if elapsed > 0 else 0.0
+
+    def __str__(self):
+        text = f"{self.kind}: {self.read:,} read, {self.created:,} created"
+        if self.existing:
+            text += f", {self.existing:,} existing"
+        if self.skipped:
+            text += f", {self.skipped:,} skipped"
+        return f"{text} ({self.rate:,.0f} rows/s)"
+
+
+class HelpdeskImporter:
+    """
+    Imports users, then tickets, then messages, then finish(). ``progress``
+    is called with the ImportStats after every batch.
+    """
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, passwords=PASSWORDS_UNUSABLE, progress=None):
+        if not connection.features.can_return_rows_from_bulk_insert:
+            raise ValueError('Importing needs a database that returns primary keys from bulk inserts (PostgreSQL, SQLite 3.35+).')
+        if passwords not in PASSWORD_MODES:
+            raise ValueError(f'Unknown password mode: {passwords}')
+        self.batch_size = batch_size
+        self.passwords = passwords
+        self.progress = progress or (lambda stats: None)
+        self.errors = []
+        self.error_count = 0
+        # Old system id -> primary key
+        self.user_ids = {}
+        self.ticket_ids = {}
+        self._existing_mobiles = None
+
+    def _error(self, kind, record, error):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"{kind} {_text(record, 'id') or '?'}: {error}")
+
+    def _user_id(self, ref):
+        """Primary key of the user an old id (or an existing mobile number) refers to."""
+        if ref is None:
+            return None
+        if ref in self.user_ids:
+            return self.user_ids[ref]
+        if self._existing_mobiles is None:
+            self._existing_mobiles = dict(CustomUser.objects.values_list('mobile', 'pk'))
+        return self._existing_mobiles.get(ref)
+
+    # --- Users ---
+    def import_users(self, records):
+        stats = ImportStats('users')
+        usernames = set(CustomUser.objects.values_list('username', flat=True).iterator())
+        emails = set(CustomUser.objects.exclude(email=None).values_list('email', flat=True).iterator())
+        mobiles = dict(CustomUser.objects.values_list('mobile', 'pk').iterator())
+        groups = dict(Group.objects.filter(name__in=ROLE_GROUPS.values()).values_list('name', 'pk'))
+        memberships = CustomUser.groups.through
+
+        for batch in _batches(records, self.batch_size):
+            users, refs, roles = [], [], []
+            for record in batch:
+                stats.read += 1
+                try:
+                    user, role = self._build_user(record, usernames, emails, mobiles, groups)
+                except ImportRowError as e:
+                    stats.skipped += 1
+                    self._error('user', record, e)
+                    continue
+                ref = _ref(record, 'id') or user.mobile
+                if user.pk is not None:
+                    # Already has an account: only map the old id to it
+                    self.user_ids[ref] = user.pk
+                    stats.existing += 1
+                    continue
+                users.append(user)
+                refs.append(ref)
+                roles.append(role)
+
+            with transaction.atomic():
+                CustomUser.objects.bulk_create(users)
+                memberships.objects.bulk_create([
+                    memberships(customuser_id=user.pk, group_id=groups[role])
+                    for user, role in zip(users, roles) if role in groups
+                ])
+            for user, ref in zip(users, refs):
+                self.user_ids[ref] = mobiles[user.mobile] = user.pk
+            stats.created += len(users)
+            self.progress(stats)
+
+        self._existing_mobiles = mobiles
+        routing.invalidate_routing_agents()
+        return stats
+
+    def _build_user(self, record, usernames, emails, mobiles, groups):
+        mobile = _text(record, 'mobile')
+        if not mobile:
+            raise ImportRowError('mobile is required')
+        if mobile in mobiles:
+            if mobiles[mobile] is None:
+                raise ImportRowError('duplicate mobile')
+            return CustomUser(pk=mobiles[mobile], mobile=mobile), None
+
+        role = ROLE_GROUPS.get(_text(record, 'role').lower() or 'customer')
+        if role is None:
+            raise ImportRowError(f"role: unknown value {_text(record, 'role')!r}")
+
+        # Same fallback and suffixes as CustomUserManager.create_user()
+        username = _text(record, 'username') or f"user_{mobile}"
+        if username in usernames:
+            original, counter = username, 1
+            while f"{original}_{counter}" in usernames:
+                counter += 1
+            username = f"{original}_{counter}"
+        usernames.add(username)
+
+        email = CustomUser.objects.normalize_email(_text(record, 'email')) or None
+        if email is not None:
+            if email in emails:
+                email = None  # Unique: keep the first account's
+            else:
+                emails.add(email)
+
+        password = _text(record, 'password')
+        if self.passwords == PASSWORDS_HASHED and password:
+            try:
+                identify_hasher(password)
+            except ValueError:
+                raise ImportRowError('password: not a Django password hash')
+        else:
+            password = make_password(None)
+
+        user = CustomUser(
+            mobile=mobile,
+            username=username,
+            email=email,
+            first_name=_text(record, 'first_name'),
+            last_name=_text(record, 'last_name'),
+            password=password,
+            date_joined=_datetime(record, 'date_joined', timezone.now()),
+        )
+        # Reserve the mobile number for this row; the pk is filled in after the insert
+        mobiles[mobile] = None
+        return user, role
+
+    # --- Tickets ---
+    def import_tickets(self, records):
+        stats = ImportStats('tickets')
+        fields = (Ticket._meta.get_field('created_at'), Ticket._meta.get_field('updated_at'))
+        with original_timestamps(*fields):
+            for batch in _batches(records, self.batch_size):
+                tickets, refs = [], []
+                for record in batch:
+                    stats.read += 1
+                    try:
+                        ref = _ref(record, 'id')
+                        if ref is None:
+                            raise ImportRowError('id is required')
+                        if ref in self.ticket_ids or ref in refs:
+                            raise ImportRowError('duplicate id')
+                        tickets.append(self._build_ticket(record))
+                        refs.append(ref)
+                    except ImportRowError as e:
+                        stats.skipped += 1
+                        self._error('ticket', record, e)
+
+                with transaction.atomic():
+                    Ticket.objects.bulk_create(tickets)
+                    # Their history starts with how they arrive
+                    TicketEvent.objects.bulk_create(
+                        [event for ticket in tickets for event in creation_events(ticket, now=ticket.created_at)],
+                        batch_size=self.batch_size,
+                    )
+                for ticket, ref in zip(tickets, refs):
+                    self.ticket_ids[ref] = ticket.pk
+                stats.created += len(tickets)
+                self.progress(stats)
+        return stats
+
+    def _build_ticket(self, record):
+        customer_id = self._user_id(_ref(record, 'customer'))
+        if customer_id is None:
+            raise ImportRowError(f"customer: unknown user {_text(record, 'customer')!r}")
+        agent_ref = _ref(record, 'agent')
+        agent_id = self._user_id(agent_ref)
+        if agent_ref is not None and agent_id is None:
+            raise ImportRowError(f"agent: unknown user {agent_ref!r}")
+        title = _text(record, 'title')
+        if not title:
+            raise ImportRowError('title is required')
+        created_at = _datetime(record, 'created_at', timezone.now())
+        return Ticket(
+            customer_id=customer_id,
+            agent_id=agent_id,
+            title=title[:Ticket._meta.get_field('title').max_length],
+            description=_text(record, 'description'),
+            status=_choice(record, 'status', Ticket.STATUS_CHOICES, 'OPEN'),
+            priority=_choice(record, 'priority', Ticket.PRIORITY_CHOICES, 'MEDIUM'),
+            created_at=created_at,
+            updated_at=_datetime(record, 'updated_at', created_at),
+        )
+
+    # --- Messages ---
+    def import_messages(self, records):
+        stats = ImportStats('messages')
+        with original_timestamps(Message._meta.get_field('created_at')):
+            for batch in _batches(records, self.batch_size):
+                messages = []
+                for record in batch:
+                    stats.read += 1
+                    try:
+                        messages.append(self._build_message(record))
+                    except ImportRowError as e:
+                        stats.skipped += 1
+                        self._error('message', record, e)
+                Message.objects.bulk_create(messages)
+                stats.created += len(messages)
+                self.progress(stats)
+        return stats
+
+    def _build_message(self, record):
+        ticket_id = self.ticket_ids.get(_ref(record, 'ticket'))
+        if ticket_id is None:
+            raise ImportRowError(f"ticket: unknown ticket {_text(record, 'ticket')!r}")
+        sender_id = self._user_id(_ref(record, 'sender'))
+        if sender_id is None:
+            raise ImportRowError(f"sender: unknown user {_text(record, 'sender')!r}")
+        return Message(
+            ticket_id=ticket_id,
+            sender_id=sender_id,
+            content=_text(record, 'content'),
+            created_at=_datetime(record, 'created_at', timezone.now()),
+        )
+
+    # --- Afterwards ---
+    def finish(self):
+        """Bring the denormalized fields of the imported tickets up to date. Returns the number of tickets."""
+        ticket_ids = sorted(self.ticket_ids.values())
+        for i in range(0, len(ticket_ids), FINISH_BATCH_SIZE):
+            tickets = Ticket.objects.filter(pk__in=ticket_ids[i:i + FINISH_BATCH_SIZE])
+            with transaction.atomic():
+                rebuild_ticket_activity(tickets)
+                rebuild_sla(tickets)
+                rebuild_search_vectors(tickets)
+        if ticket_ids:
+            invalidate_ticket_stats()
+            routing.invalidate_workload()
+        return len(ticket_ids)
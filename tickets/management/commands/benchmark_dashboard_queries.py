@@ -0,0 +1,253 @@
+# tickets/management/commands/benchmark_dashboard_queries.py
+"""
+Seed a large data set and time the dashboard and ticket timeline queries
+with and without the indexes added for them (migrations 0007 and 0010).
+
+Run it against a scratch database, never production:
+
+    python manage.py benchmark_dashboard_queries --tickets 1000000
+    python manage.py benchmark_dashboard_queries --skip-seed -v 2
+
+On PostgreSQL every query is timed with EXPLAIN ANALYZE; on other
+databases the plan comes from EXPLAIN QUERY PLAN and the query is timed
+from Python. The "before" numbers are taken inside a transaction that
+drops the indexes and is rolled back afterwards.
+"""
+import random
+import re
+import time
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.utils import timezone
+
+from tickets.imports import original_timestamps
+from tickets.models import InternalComment, Message, Ticket
+from tickets.pagination import DEFAULT_PAGE_SIZE
+
+CustomUser = get_user_model()
+
+# Indexes under test
+BENCHMARK_INDEXES = [
+    'ticket_customer_created_idx',
+    'ticket_created_idx',
+    'ticket_updated_idx',
+    'ticket_unassigned_open_idx',
+    'ticket_agent_open_idx',
+    'ticket_agent_resolved_idx',
+    'ticket_resolved_idx',
+    'message_ticket_timeline_idx',
+    'comment_ticket_timeline_idx',
+]
+
+STATUS_WEIGHTS = {'OPEN': 25, 'IN_PROGRESS': 20, 'RESOLVED': 45, 'CLOSED': 10}
+
+_EXECUTION_TIME = re.compile(r'Execution Time: ([\d.]+) ms')
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Seed tickets and report EXPLAIN ANALYZE timings of the dashboard queries before/after their indexes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tickets', type=int, default=1_000_000, help='Tickets to seed (default 1,000,000).')
+        parser.add_argument('--customers', type=int, default=50_000, help='Customers to seed.')
+        parser.add_argument('--agents', type=int, default=50, help='Agents to seed.')
+        parser.add_argument('--messages-per-ticket', type=int, default=2, help='Messages seeded per ticket.')
+        parser.add_argument('--comments-per-ticket', type=int, default=1, help='Internal comments seeded per ticket.')
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per query; the fastest is reported.')
+        parser.add_argument('--skip-seed', action='store_true', help='Benchmark the data already in the database.')
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive')
+
+    def handle(self, *args, **options):
+        database = options['database']
+        connection = connections[database]
+
+        if not options['skip_seed']:
+            if options['interactive']:
+                answer = input(
+                    f"This will insert {options['tickets']:,} tickets into the '{database}' database "
+                    f"({connection.settings_dict['NAME']}). Type 'yes' to continue: "
+                )
+                if answer != 'yes':
+                    raise CommandError('Benchmark cancelled.')
+            self.seed(database, options)
+
+        # Refresh planner statistics after the bulk load
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        queries = self.dashboard_queries(database)
+        before = self.measure_without_indexes(connection, queries, options['repeat'])
+        after = self.measure(connection, queries, options['repeat'])
+        self.report(queries, before, after, options['verbosity'])
+
+    # --- Seeding ---
+    def seed(self, database, options):
+        batch_size = options['batch_size']
+        run = uuid.uuid4().hex[:4]
+        password = make_password(None)
+        started = time.monotonic()
+
+        customers = self.seed_users(database, 'Customers', 'c', run, options['customers'], password, batch_size)
+        agents = self.seed_users(database, 'Agents', 'a', run, options['agents'], password, batch_size)
+
+        now = timezone.now()
+        created = 0
+        with original_timestamps(
+            Ticket._meta.get_field('created_at'), Ticket._meta.get_field('updated_at'),
+            Message._meta.get_field('created_at'), InternalComment._meta.get_field('created_at'),
+        ):
+            while created < options['tickets']:
+                size = min(batch_size, options['tickets'] - created)
+                tickets = Ticket.objects.using(database).bulk_create(
+                    [self.make_ticket(customers, agents, now) for _ in range(size)]
+                )
+                self.seed_conversation(database, tickets, options)
+                created += size
+                self.stdout.write(f"  {created:,} tickets seeded", ending='\r')
+                self.stdout.flush()
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"Seeded {created:,} tickets in {elapsed:.0f}s ({created / elapsed:,.0f}/s)"))
+
+    def seed_users(self, database, group_name, kind, run, count, password, batch_size):
+        users = CustomUser.objects.using(database).bulk_create(
+            [
+                CustomUser(
+                    username=f'bench_{run}_{kind}{i}', mobile=f'bench{run}{kind}{i}',
+                    first_name='Bench', last_name=f'{kind}{i}', password=password,
+                )
+                for i in range(count)
+            ],
+            batch_size=batch_size,
+        )
+        group, _ = Group.objects.using(database).get_or_create(name=group_name)
+        through = CustomUser.groups.through
+        through.objects.using(database).bulk_create(
+            [through(customuser_id=user.pk, group_id=group.pk) for user in users],
+            batch_size=batch_size,
+        )
+        return [user.pk for user in users]
+
+    def make_ticket(self, customers, agents, now):
+        status = random.choices(list(STATUS_WEIGHTS), weights=list(STATUS_WEIGHTS.values()))[0]
+        created_at = now - timedelta(seconds=random.randint(0, 365 * 24 * 3600))
+        unassigned = status == 'OPEN' and random.random() < 0.6
+        return Ticket(
+            customer_id=random.choice(customers),
+            agent_id=None if unassigned else random.choice(agents),
+            title=f'Benchmark ticket {random.randint(0, 10 ** 9)}',
+            description='Seeded by benchmark_dashboard_queries.',
+            status=status,
+            priority=random.choice([choice for choice, _ in Ticket.PRIORITY_CHOICES]),
+            created_at=created_at,
+            updated_at=created_at + timedelta(seconds=random.randint(0, 10 * 24 * 3600)),
+        )
+
+    def seed_conversation(self, database, tickets, options):
+        messages, comments = [], []
+        for ticket in tickets:
+            for n in range(options['messages_per_ticket']):
+                messages.append(Message(
+                    ticket_id=ticket.pk,
+                    sender_id=ticket.customer_id if n % 2 == 0 or not ticket.agent_id else ticket.agent_id,
+                    content='Seeded message.',
+                    created_at=ticket.created_at + timedelta(minutes=n + 1),
+                ))
+            if ticket.agent_id:
+                for n in range(options['comments_per_ticket']):
+                    comments.append(InternalComment(
+                        ticket_id=ticket.pk, author_id=ticket.agent_id,
+                        content='Seeded internal note.',
+                        created_at=ticket.created_at + timedelta(minutes=n + 1),
+                    ))
+        Message.objects.using(database).bulk_create(messages, batch_size=options['batch_size'])
+        InternalComment.objects.using(database).bulk_create(comments, batch_size=options['batch_size'])
+
+    # --- Queries ---
+    def dashboard_queries(self, database):
+        """The queries issued by the dashboards and ticket_detail, in (name, queryset) pairs."""
+        tickets = Ticket.objects.using(database)
+        agent_id = tickets.filter(agent__isnull=False).values_list('agent_id', flat=True).first()
+        customer_id = tickets.values_list('customer_id', flat=True).order_by('-id').first()
+        ticket_id = tickets.filter(agent__isnull=False).values_list('pk', flat=True).order_by('-id').first()
+        if agent_id is None or customer_id is None:
+            raise CommandError('No tickets to benchmark; run without --skip-seed first.')
+
+        page = DEFAULT_PAGE_SIZE + 1
+        open_tickets = tickets.exclude(status='RESOLVED')
+        return [
+            ('customer_dashboard', tickets.filter(customer_id=customer_id).order_by('-created_at', '-id')[:page]),
+            ('agent_unassigned', open_tickets.filter(agent__isnull=True).order_by('-created_at', '-id')[:page]),
+            ('agent_assigned', open_tickets.filter(agent_id=agent_id).order_by('-updated_at', '-id')[:page]),
+            ('admin_all_assigned', open_tickets.filter(agent__isnull=False).order_by('-updated_at', '-id')[:page]),
+            ('agent_resolved', tickets.filter(status='RESOLVED', agent_id=agent_id).order_by('-updated_at')[:10]),
+            ('admin_resolved', tickets.filter(status='RESOLVED').order_by('-updated_at')[:10]),
+            ('message_timeline', Message.objects.using(database).filter(ticket_id=ticket_id).order_by('created_at')),
+            ('internal_comment_timeline', InternalComment.objects.using(database).filter(ticket_id=ticket_id).order_by('created_at')),
+        ]
+
+    # --- Measuring ---
+    def measure_without_indexes(self, connection, queries, repeat):
+        results = {}
+        try:
+            with transaction.atomic(using=connection.alias):
+                with connection.cursor() as cursor:
+                    for name in BENCHMARK_INDEXES:
+                        cursor.execute(f'DROP INDEX {connection.ops.quote_name(name)}')
+                results = self.measure(connection, queries, repeat)
+                raise _Rollback
+        except _Rollback:
+            pass
+        return results
+
+    def measure(self, connection, queries, repeat):
+        results = {}
+        for name, queryset in queries:
+            sql, params = queryset.query.get_compiler(connection=connection).as_sql()
+            timings = []
+            for _ in range(repeat):
+                elapsed, plan = self.explain(connection, sql, params)
+                timings.append(elapsed)
+            results[name] = (min(timings), plan)
+        return results
+
+    def explain(self, connection, sql, params):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(f'EXPLAIN (ANALYZE, BUFFERS) {sql}', params)
+                plan = [row[0] for row in cursor.fetchall()]
+                match = _EXECUTION_TIME.search('\n'.join(plan))
+                return float(match.group(1)) if match else 0.0, plan
+
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = [str(row[-1]) for row in cursor.fetchall()]
+            started = time.perf_counter()
+            cursor.execute(sql, params)
+            cursor.fetchall()
+            return (time.perf_counter() - started) * 1000, plan
+
+    def report(self, queries, before, after, verbosity):
+        self.stdout.write('')
+        self.stdout.write(f"{'query':<28}{'before (ms)':>14}{'after (ms)':>14}{'speedup':>10}")
+        for name, _ in queries:
+            before_ms, before_plan = before[name]
+            after_ms, after_plan = after[name]
+            speedup = f'{before_ms / after_ms:.1f}x' if after_ms else '-'
+            self.stdout.write(f'{name:<28}{before_ms:>14.2f}{after_ms:>14.2f}{speedup:>10}')
+            if verbosity >= 2:
+                for label, plan in (('before', before_plan), ('after', after_plan)):
+                    self.stdout.write(f'  {label}:')
+                    for line in plan:
+                        self.stdout.write(f'    {line}')
@@ -0,0 +1,100 @@
+# tickets/management/commands/benchmark_ticket_detail.py
+"""
+Time ticket_detail for threads of growing length.
+
+    python manage.py benchmark_ticket_detail
+    python manage.py benchmark_ticket_detail --sizes 100 1000 10000 50000 --repeat 10
+
+A ticket is seeded with messages and internal comments, the page is
+rendered for its assigned agent at each thread length, and the median
+render time and number of queries are reported. With the paged
+conversation both should stay flat as the thread grows. Everything runs
+in a transaction that is rolled back at the end.
+"""
+import statistics
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from tickets.models import InternalComment, Message, Ticket
+from tickets.views import ticket_detail
+
+CustomUser = get_user_model()
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Report ticket_detail render time and query count as the conversation grows."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000],
+                            help='Thread lengths (messages) to measure, ascending.')
+        parser.add_argument('--comments-ratio', type=float, default=0.2,
+                            help='Internal comments seeded per message.')
+        parser.add_argument('--repeat', type=int, default=5, help='Renders per size; the median is reported.')
+
+    def handle(self, *args, **options):
+        sizes = sorted(options['sizes'])
+        try:
+            with transaction.atomic():
+                self.run(sizes, options)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def run(self, sizes, options):
+        run = uuid.uuid4().hex[:6]
+        customer = CustomUser.objects.create_user(mobile=f'bench{run}c', username=f'bench_{run}_c', password=None)
+        agent = CustomUser.objects.create_user(mobile=f'bench{run}a', username=f'bench_{run}_a', password=None)
+        customer.groups.add(Group.objects.get_or_create(name='Customers')[0])
+        agent.groups.add(Group.objects.get_or_create(name='Agents')[0])
+        ticket = Ticket.objects.create(
+            customer=customer, agent=agent, status='IN_PROGRESS',
+            title='Benchmark thread', description='Seeded by benchmark_ticket_detail.',
+        )
+
+        factory = RequestFactory()
+        path = reverse('tickets:ticket_detail', args=[ticket.pk])
+
+        self.stdout.write(f"{'messages':>10}{'median (ms)':>14}{'queries':>10}")
+        seeded = 0
+        for size in sizes:
+            self.seed(ticket, customer, agent, seeded, size, options['comments_ratio'])
+            seeded = size
+
+            timings = []
+            for _ in range(options['repeat']):
+                request = factory.get(path)
+                request.user = agent
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    response = ticket_detail(request, ticket.pk)
+                    timings.append((time.perf_counter() - started) * 1000)
+                assert response.status_code == 200, response.status_code
+            self.stdout.write(f'{size:>10,}{statistics.median(timings):>14.2f}{len(queries):>10}')
+
+    def seed(self, ticket, customer, agent, start, end, comments_ratio):
+        Message.objects.bulk_create(
+            [
+                Message(ticket=ticket, sender=customer if n % 2 == 0 else agent, content=f'Benchmark message {n}.')
+                for n in range(start, end)
+            ],
+            batch_size=5000,
+        )
+        InternalComment.objects.bulk_create(
+            [
+                InternalComment(ticket=ticket, author=agent, content=f'Benchmark note {n}.')
+                for n in range(int(start * comments_ratio), int(end * comments_ratio))
+            ],
+            batch_size=5000,
+        )
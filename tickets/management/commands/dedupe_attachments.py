@@ -0,0 +1,159 @@
+# tickets/management/commands/dedupe_attachments.py
+"""
+Move attachments into content-addressed storage and garbage-collect blobs.
+
+    python manage.py dedupe_attachments --dry-run
+    python manage.py dedupe_attachments
+    python manage.py dedupe_attachments --skip-migrate     # GC only, e.g. from cron
+
+Migration re-saves every ticket/message attachment still stored under
+its upload path through tickets.storage, so identical files collapse
+into one blob, points the row at the new name and removes the old file
+(unless --keep-originals). Garbage collection recounts the references
+of every blob from the database and deletes the blobs nobody references
+any more, plus stray files under blobs/ without an AttachmentBlob row.
+"""
+import os
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+from django.utils import timezone
+
+from tickets.models import AttachmentBlob, Message, TicketAttachment
+from tickets.storage import BLOB_DIR, blob_name, file_sha256, get_attachment_storage, is_content_addressed
+
+
+def _referencing_rows():
+    """(queryset, field name) pairs of every row that references a stored attachment."""
+    return [
+        (TicketAttachment.objects.exclude(status=TicketAttachment.STATUS_REJECTED), 'file'),
+        (Message.objects.exclude(attachment='').exclude(attachment__isnull=True), 'attachment'),
+    ]
+
+
+class Command(BaseCommand):
+    help = "Move attachments into deduplicated content-addressed storage and delete unreferenced blobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skip-migrate', action='store_true', help='Only garbage-collect.')
+        parser.add_argument('--skip-gc', action='store_true', help='Only migrate existing files.')
+        parser.add_argument('--keep-originals', action='store_true', help='Keep the old files after migrating them.')
+        parser.add_argument('--grace-minutes', type=int, default=60,
+                            help='Leave unreferenced blobs younger than this alone (uploads in flight).')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help='Report what would change without changing anything.')
+
+    def handle(self, *args, **options):
+        self.storage = get_attachment_storage()
+        self.dry_run = options['dry_run']
+        started = time.monotonic()
+        if not options['skip_migrate']:
+            self.migrate_files(options)
+        if not options['skip_gc']:
+            self.collect_garbage(options)
+        self.stdout.write(f"Done in {time.monotonic() - started:.1f}s{' (dry run)' if self.dry_run else ''}")
+
+    # --- Migration ---
+    def migrate_files(self, options):
+        migrated = missing = duplicate_bytes = freed_bytes = 0
+        seen_hashes = set(AttachmentBlob.objects.values_list('sha256', flat=True))
+        moved = {}  # old name -> new name, for files shared by several rows
+
+        for queryset, field in _referencing_rows():
+            rows = queryset.exclude(**{f'{field}__startswith': 'cas/'}).only('pk', field)
+            for row in rows.iterator(chunk_size=options['batch_size']):
+                old_name = getattr(row, field).name
+                if is_content_addressed(old_name):
+                    continue
+                if old_name in moved:
+                    new_name = moved[old_name]
+                elif not self.storage.exists(old_name):
+                    missing += 1
+                    self.stderr.write(f"  missing file: {old_name}")
+                    continue
+                else:
+                    size = self.storage.size(old_name)
+                    with self.storage.open(old_name, 'rb') as f:
+                        content = File(f, old_name)
+                        sha256 = file_sha256(content)
+                        if sha256 in seen_hashes:
+                            duplicate_bytes += size
+                        seen_hashes.add(sha256)
+                        new_name = None if self.dry_run else self.storage.save(
+                            old_name, content, max_length=row._meta.get_field(field).max_length,
+                        )
+                    moved[old_name] = new_name
+                    if not options['keep_originals']:
+                        freed_bytes += size
+                        if not self.dry_run:
+                            self.storage.delete(old_name)
+
+                if not self.dry_run:
+                    type(row).objects.filter(pk=row.pk).update(**{field: new_name})
+                migrated += 1
+                if options['verbosity'] >= 2 and migrated % options['batch_size'] == 0:
+                    self.stdout.write(f"  {migrated:,} attachments migrated")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Migrated {migrated:,} attachments ({missing:,} missing files); "
+            f"{filesizeformat(duplicate_bytes)} were duplicates, "
+            f"{filesizeformat(freed_bytes)} of original files removed"
+        ))
+
+    # --- Garbage collection ---
+    def collect_garbage(self, options):
+        references = Counter()
+        for queryset, field in _referencing_rows():
+            names = queryset.filter(**{f'{field}__startswith': 'cas/'}).values_list(field, flat=True)
+            for name in names.iterator(chunk_size=options['batch_size']):
+                if is_content_addressed(name):
+                    references[blob_name(name)] += 1
+
+        # Repair drifted reference counts
+        recounted = []
+        for blob in AttachmentBlob.objects.only('pk', 'name', 'ref_count').iterator(chunk_size=options['batch_size']):
+            if blob.ref_count != references[blob.name]:
+                blob.ref_count = references[blob.name]
+                recounted.append(blob)
+        if recounted and not self.dry_run:
+            AttachmentBlob.objects.bulk_update(recounted, ['ref_count'], batch_size=options['batch_size'])
+
+        cutoff = timezone.now() - timedelta(minutes=options['grace_minutes'])
+        deleted = freed_bytes = 0
+        unreferenced = AttachmentBlob.objects.filter(ref_count=0, last_referenced_at__lt=cutoff)
+        if self.dry_run:
+            unreferenced = [blob for blob in AttachmentBlob.objects.filter(last_referenced_at__lt=cutoff)
+                            if not references[blob.name]]
+        for blob in unreferenced:
+            # Only delete the file if no upload referenced it meanwhile
+            if self.dry_run or AttachmentBlob.objects.filter(pk=blob.pk, ref_count=0).delete()[0]:
+                if not self.dry_run and self.storage.exists(blob.name):
+                    self.storage.delete(blob.name)
+                deleted += 1
+                freed_bytes += blob.size
+
+        strays = self.delete_stray_files(cutoff)
+        self.stdout.write(self.style.SUCCESS(
+            f"Recounted {len(recounted):,} blobs; deleted {deleted:,} unreferenced blobs "
+            f"({filesizeformat(freed_bytes)}) and {strays:,} stray files"
+        ))
+
+    def delete_stray_files(self, cutoff):
+        """Files under blobs/ without an AttachmentBlob row (e.g. interrupted uploads)."""
+        root = self.storage.path(BLOB_DIR)
+        known = set(AttachmentBlob.objects.values_list('name', flat=True))
+        deleted = 0
+        for directory, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, self.storage.location).replace(os.sep, '/')
+                if name in known or os.path.getmtime(path) >= cutoff.timestamp():
+                    continue
+                if not self.dry_run:
+                    os.remove(path)
+                deleted += 1
+        return deleted
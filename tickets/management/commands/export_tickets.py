@@ -0,0 +1,37 @@
+# tickets/management/commands/export_tickets.py
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tickets.exports import EXPORT_FORMATS, FORMAT_CSV, FORMAT_JSONL, stream_tickets
+from tickets.filters import filter_tickets
+from tickets.models import Ticket
+
+
+class Command(BaseCommand):
+    help = "Stream tickets as CSV or JSON Lines to a file or stdout, with the dashboard's filters."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default=FORMAT_CSV)
+        parser.add_argument('--output', '-o', help='File to write (default: stdout).')
+        parser.add_argument('--include-messages', action='store_true', help='Add each conversation (JSON Lines only).')
+        parser.add_argument('--search', help='Free text search, as on the dashboard (includes internal comments).')
+        parser.add_argument('--status', choices=[value for value, _ in Ticket.STATUS_CHOICES])
+        parser.add_argument('--priority', choices=[value for value, _ in Ticket.PRIORITY_CHOICES])
+        parser.add_argument('--sla', choices=[value for value, _ in Ticket.SLA_STATE_CHOICES])
+        parser.add_argument('--date-range', choices=['today', 'week', 'month'])
+
+    def handle(self, *args, **options):
+        if options['include_messages'] and options['format'] != FORMAT_JSONL:
+            raise CommandError('--include-messages needs --format jsonl.')
+
+        tickets = filter_tickets(Ticket.objects.all(), options, include_internal=True)
+        chunks = stream_tickets(tickets, options['format'], include_messages=options['include_messages'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                for chunk in chunks:
+                    output.write(chunk)
+            self.stderr.write(f"Exported tickets to {options['output']}")
+        else:
+            for chunk in chunks:
+                sys.stdout.write(chunk)
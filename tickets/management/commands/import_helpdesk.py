@@ -0,0 +1,72 @@
+# tickets/management/commands/import_helpdesk.py
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tickets.imports import DEFAULT_BATCH_SIZE, PASSWORD_MODES, PASSWORDS_UNUSABLE, HelpdeskImporter, read_records
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk import users, tickets and messages from another helpdesk (CSV or JSON Lines files; "
+        "see tickets/imports.py for the columns). Files that refer to each other must be imported together."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', help='Users file.')
+        parser.add_argument('--tickets', help='Tickets file.')
+        parser.add_argument('--messages', help='Messages file.')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Input format (default: by file extension).')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Rows per INSERT.')
+        parser.add_argument(
+            '--passwords', choices=PASSWORD_MODES, default=PASSWORDS_UNUSABLE,
+            help="'hashed': the password column holds Django password hashes; "
+                 "'unusable': users set a password through a reset (default).",
+        )
+        parser.add_argument('--progress-interval', type=float, default=5.0, help='Seconds between progress lines.')
+
+    def handle(self, *args, **options):
+        if not (options['users'] or options['tickets'] or options['messages']):
+            raise CommandError('Give at least one of --users, --tickets and --messages.')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+
+        last_report = [time.monotonic()]
+
+        def progress(stats):
+            now = time.monotonic()
+            if now - last_report[0] >= options['progress_interval']:
+                last_report[0] = now
+                self.stdout.write(f"  {stats}")
+
+        try:
+            importer = HelpdeskImporter(options['batch_size'], options['passwords'], progress)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        started = time.monotonic()
+        for kind, run in (
+            ('users', importer.import_users),
+            ('tickets', importer.import_tickets),
+            ('messages', importer.import_messages),
+        ):
+            if options[kind]:
+                try:
+                    stats = run(read_records(options[kind], options['format']))
+                except (OSError, ValueError) as e:
+                    raise CommandError(f"{options[kind]}: {e}")
+                self.stdout.write(self.style.SUCCESS(str(stats)))
+
+        self.stdout.write("Updating counters, SLA state and search index of the imported tickets...")
+        finished = importer.finish()
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported in {time.monotonic() - started:.1f}s; {finished:,} tickets updated. "
+            f"Run `manage.py rollup_ticket_stats --since <first day>` to include them in the reports."
+        ))
+
+        if importer.error_count:
+            self.stderr.write(f"{importer.error_count:,} rows skipped:")
+            for error in importer.errors:
+                self.stderr.write(f"  {error}")
+            if importer.error_count > len(importer.errors):
+                self.stderr.write(f"  ... and {importer.error_count - len(importer.errors):,} more")
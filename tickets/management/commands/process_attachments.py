@@ -0,0 +1,46 @@
+# tickets/management/commands/process_attachments.py
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from tickets.attachments import pending_attachment_ids, requeue_stale_attachments, run_attachment_job
+
+
+def _process(pk):
+    try:
+        return run_attachment_job(pk)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = "Process queued ticket attachments (scan, hash, thumbnails). Use --loop to run as a worker."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Attachments processed in parallel.')
+        parser.add_argument('--batch-size', type=int, default=50, help='Attachments claimed per round.')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new attachments.')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds between polls with --loop.')
+
+    def handle(self, *args, **options):
+        processed = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            while True:
+                requeued = requeue_stale_attachments()
+                if requeued:
+                    self.stdout.write(f"  requeued {requeued} stalled attachment(s)")
+
+                ids = pending_attachment_ids(options['batch_size'])
+                processed += sum(pool.map(_process, ids))
+                if ids and options['verbosity'] >= 2:
+                    self.stdout.write(f"  {processed:,} attachments processed")
+
+                if not options['loop']:
+                    if not ids:
+                        break
+                elif not ids:
+                    time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed:,} attachments"))
@@ -0,0 +1,19 @@
+# tickets/management/commands/prune_thumbnails.py
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+
+from tickets.thumbnails import cache_max_bytes, evict
+
+
+class Command(BaseCommand):
+    help = "Evict least recently used image thumbnails until the cache fits THUMBNAIL_CACHE_MAX_BYTES."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-bytes', type=int, help='Size limit to prune to (default: THUMBNAIL_CACHE_MAX_BYTES).')
+
+    def handle(self, *args, **options):
+        max_bytes = options['max_bytes'] if options['max_bytes'] is not None else cache_max_bytes()
+        removed, removed_bytes = evict(max_bytes)
+        self.stdout.write(self.style.SUCCESS(
+            f"Evicted {removed:,} thumbnails ({filesizeformat(removed_bytes)}); limit {filesizeformat(max_bytes)}"
+        ))
@@ -0,0 +1,39 @@
+# tickets/management/commands/prune_ticket_events.py
+"""
+Drop old rows from the ticket event log.
+
+    python manage.py prune_ticket_events --before 2025-01-01
+    python manage.py prune_ticket_events --days 730      # keep two years
+
+Their reporting rollups stay; see tickets.events.prune_ticket_events().
+"""
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from tickets.events import prune_ticket_events
+
+
+class Command(BaseCommand):
+    help = "Delete ticket events logged before a day; the daily reporting rollups of those days are kept."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', help='First day to keep (YYYY-MM-DD).')
+        parser.add_argument('--days', type=int, help='Keep this many days up to today.')
+
+    def handle(self, *args, **options):
+        if options['before']:
+            first_day = parse_date(options['before'])
+            if first_day is None:
+                raise CommandError(f"Invalid date: {options['before']}")
+        elif options['days'] is not None:
+            if options['days'] < 1:
+                raise CommandError('--days must be at least 1.')
+            first_day = timezone.localdate() - timedelta(days=options['days'] - 1)
+        else:
+            raise CommandError('Give --before or --days.')
+
+        deleted = prune_ticket_events(timezone.make_aware(datetime.combine(first_day, time.min)))
+        self.stdout.write(f"Deleted {deleted} ticket events logged before {first_day}")
@@ -0,0 +1,37 @@
+# tickets/management/commands/rebuild_ticket_activity.py
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+
+from tickets.activity import rebuild_ticket_activity
+from tickets.models import Ticket
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized message/attachment counters and last-message fields of tickets."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10_000, help='Tickets updated per statement.')
+        parser.add_argument('--ticket', type=int, action='append', dest='ticket_ids', help='Only rebuild this ticket (repeatable).')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        if options['ticket_ids']:
+            updated = rebuild_ticket_activity(Ticket.objects.filter(pk__in=options['ticket_ids']))
+        else:
+            # Walk the table in primary key ranges so each UPDATE stays short
+            batch_size = options['batch_size']
+            last_id = Ticket.objects.aggregate(last=Max('pk'))['last'] or 0
+            updated = 0
+            for start in range(0, last_id + 1, batch_size):
+                with transaction.atomic():
+                    updated += rebuild_ticket_activity(
+                        Ticket.objects.filter(pk__gte=start, pk__lt=start + batch_size)
+                    )
+                if options['verbosity'] >= 2:
+                    self.stdout.write(f"  {updated:,} tickets rebuilt")
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt activity for {updated:,} tickets in {elapsed:.1f}s"))
@@ -0,0 +1,40 @@
+# tickets/management/commands/rollup_ticket_stats.py
+"""
+Rebuild the daily reporting rollups from the ticket event log.
+
+    python manage.py rollup_ticket_stats --since 2026-01-01   # backfill
+    python manage.py rollup_ticket_stats --days 7             # repair the last week
+
+The rollups are kept up to date as events are logged (tickets/reports.py),
+so this only needs running to backfill days logged before them, e.g.
+imported tickets (``manage.py import_helpdesk``), or to repair days.
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from tickets.reports import rollup_days
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily reporting rollups from the ticket event log, to backfill or repair them."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='First day to rebuild (YYYY-MM-DD).')
+        parser.add_argument('--days', type=int, default=2, help='Rebuild this many days up to today (default: 2).')
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        if options['since']:
+            first_day = parse_date(options['since'])
+            if first_day is None:
+                raise CommandError(f"Invalid date: {options['since']}")
+        elif options['days'] < 1:
+            raise CommandError('--days must be at least 1.')
+        else:
+            first_day = today - timedelta(days=options['days'] - 1)
+
+        written = rollup_days(first_day, today)
+        self.stdout.write(f"Rebuilt {(today - first_day).days + 1} days ({written} rollup rows)")
@@ -0,0 +1,98 @@
+# tickets/management/commands/stress_ticket_assignment.py
+"""
+Check that concurrent claims of a ticket have exactly one winner.
+
+    python manage.py stress_ticket_assignment
+    python manage.py stress_ticket_assignment --threads 50 --rounds 20
+
+Each round creates an unassigned ticket and releases --threads threads
+at once (a barrier), each claiming it for a different throwaway agent
+through tickets.assignment.claim_ticket. The round passes if exactly one
+claim reports success and the stored agent is that claimant; the command
+fails if any round doesn't or any claim raises an error.
+
+The data is committed, as the threads use their own connections, and
+the tickets and users are deleted at the end. Their events stay, as the
+event log is append-only (tickets/events.py), and are counted in the
+reporting rollups, so run it against a development or staging database
+only, never one whose reports matter.
+"""
+import threading
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from tickets.assignment import claim_ticket
+from tickets.models import Ticket
+
+CustomUser = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Claim the same ticket from many threads at once and verify exactly one agent gets it."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=20, help='Concurrent claims per ticket.')
+        parser.add_argument('--rounds', type=int, default=10, help='Tickets to contend for.')
+
+    def handle(self, *args, **options):
+        run = uuid.uuid4().hex[:6]
+        agents_group = Group.objects.get_or_create(name='Agents')[0]
+        customer = CustomUser.objects.create_user(mobile=f'stress{run}c', username=f'stress_{run}_c', password=None)
+        agents = []
+        for i in range(options['threads']):
+            agent = CustomUser.objects.create_user(mobile=f'stress{run}a{i}', username=f'stress_{run}_a{i}', password=None)
+            agent.groups.add(agents_group)
+            agents.append(agent)
+
+        failures = errors = 0
+        try:
+            for round_number in range(1, options['rounds'] + 1):
+                ticket = Ticket.objects.create(customer=customer, title=f'Assignment stress {run}', description='-')
+                winners, round_errors = self.contend(ticket.pk, agents)
+                ticket.refresh_from_db()
+                errors += len(round_errors)
+                if round_errors or len(winners) != 1 or ticket.agent_id != winners[0].pk:
+                    failures += 1
+                    self.stderr.write(
+                        f"  round {round_number}: {len(winners)} winners, stored agent {ticket.agent_id}"
+                        + (f", errors: {round_errors[0]}" if round_errors else '')
+                    )
+                elif options['verbosity'] >= 2:
+                    self.stdout.write(f"  round {round_number}: won by {winners[0].username}")
+        finally:
+            Ticket.objects.filter(customer=customer).delete()
+            CustomUser.objects.filter(username__startswith=f'stress_{run}_').delete()
+
+        summary = f"{options['rounds']} rounds x {options['threads']} threads: {failures} failed, {errors} claim errors"
+        if failures or errors:
+            raise CommandError(summary)
+        self.stdout.write(self.style.SUCCESS(summary))
+
+    def contend(self, ticket_id, agents):
+        barrier = threading.Barrier(len(agents))
+        winners, errors = [], []
+        lock = threading.Lock()
+
+        def claim(agent):
+            try:
+                barrier.wait()
+                won = claim_ticket(ticket_id, agent)
+                with lock:
+                    if won:
+                        winners.append(agent)
+            except Exception as e:
+                with lock:
+                    errors.append(e)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=claim, args=(agent,)) for agent in agents]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return winners, errors
@@ -0,0 +1,23 @@
+# tickets/management/commands/sweep_sla.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from tickets.sla import sweep_sla
+
+
+class Command(BaseCommand):
+    help = "Mark tickets whose SLA deadline is near (at risk) or past (breached). Use --loop to run as a worker."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep sweeping.')
+        parser.add_argument('--interval', type=float, default=60.0, help='Seconds between sweeps with --loop.')
+
+    def handle(self, *args, **options):
+        while True:
+            at_risk, breached = sweep_sla()
+            if at_risk or breached or not options['loop']:
+                self.stdout.write(f"{len(at_risk)} tickets at risk, {len(breached)} breached")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -93,6 +93,10 @@ class FileUploadSecurityMiddleware:
     
     # Maximum file size (5MB)
     MAX_FILE_SIZE = 5 * 1024 * 1024
+
+    # Upload fields whose content is scanned by the attachment pipeline
+    # (tickets/attachments.py) instead of inline here
+    DEFERRED_SCAN_FIELDS = {'attachments'}
     
     def __init__(self, get_response):
         self.get_response = get_response
@@ -100,19 +104,23 @@ class FileUploadSecurityMiddleware:
     def __call__(self, request):
         if request.method == 'POST' and request.FILES:
             for file_key, uploaded_file in request.FILES.items():
+                # Extension and size were checked (or the file refused) while
+                # it was received, see tickets/uploads.py; the content is not
+                checked_on_upload = getattr(uploaded_file, 'upload_validated', False) or getattr(uploaded_file, 'upload_error', None)
+
                 # Check file extension
                 file_name = uploaded_file.name.lower()
-                if any(file_name.endswith(ext) for ext in self.BLOCKED_EXTENSIONS):
+                if not checked_on_upload and any(file_name.endswith(ext) for ext in self.BLOCKED_EXTENSIONS):
                     logger.warning(f'Blocked dangerous file upload: {uploaded_file.name} from IP: {self.get_client_ip(request)}')
                     return HttpResponseForbidden('File type not allowed')
                 
                 # Check file size
-                if uploaded_file.size > self.MAX_FILE_SIZE:
+                if not checked_on_upload and uploaded_file.size > self.MAX_FILE_SIZE:
                     logger.warning(f'Blocked oversized file upload: {uploaded_file.name} ({uploaded_file.size} bytes) from IP: {self.get_client_ip(request)}')
                     return HttpResponseForbidden('File too large')
                 
                 # Check for suspicious file content (basic)
-                if self.is_suspicious_file_content(uploaded_file):
+                if file_key not in self.DEFERRED_SCAN_FIELDS and self.is_suspicious_file_content(uploaded_file):
                     logger.warning(f'Blocked suspicious file content: {uploaded_file.name} from IP: {self.get_client_ip(request)}')
                     return HttpResponseForbidden('Suspicious file content detected')
         
@@ -130,19 +138,13 @@ class FileUploadSecurityMiddleware:
     def is_suspicious_file_content(self, uploaded_file):
         """Basic check for suspicious file content"""
         try:
-            # Read first 1024 bytes to check for suspicious patterns
+            from .attachments import SCAN_BYTES, is_suspicious_content
+
+            # Read the first bytes to check for suspicious patterns
             uploaded_file.seek(0)
-            content = uploaded_file.read(1024).decode('utf-8', errors='ignore').lower()
+            head = uploaded_file.read(SCAN_BYTES)
             uploaded_file.seek(0)  # Reset file pointer
-            
-            # Common malicious patterns
-            suspicious_patterns = [
-                '<script', 'javascript:', 'eval(', 'exec(', 'system(',
-                'shell_exec', 'passthru', 'base64_decode', '<?php',
-                '<% ', 'response.write', 'createobject'
-            ]
-            
-            return any(pattern in content for pattern in suspicious_patterns)
+            return is_suspicious_content(head)
         except:
             return False  # If we can't read the file, allow it but log
 
@@ -178,3 +180,20 @@ class IPWhitelistMiddleware:
         else:
             ip = request.META.get('REMOTE_ADDR')
         return ip
+
+
+class TicketEventActorMiddleware:
+    """
+    Attribute ticket changes made while handling a request to the
+    request's user in the ticket event log (tickets/events.py)
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        from .events import acting_as
+
+        # request.user stays lazy until an event is actually written
+        with acting_as(request.user):
+            return self.get_response(request)
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:02
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+# The GIN indexes, the pg_trgm extension and the backfill only apply to
+# PostgreSQL; on other databases the search vector stays empty and
+# tickets.search falls back to icontains lookups.
+POSTGRES_FORWARD_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    UPDATE tickets_ticket AS t
+    SET search_vector =
+        setweight(to_tsvector('english', coalesce(t.title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(t.description, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(u.username, '')), 'C')
+    FROM tickets_customuser AS u
+    WHERE u.id = t.customer_id
+    """,
+    "CREATE INDEX IF NOT EXISTS ticket_search_vector_gin ON tickets_ticket USING gin (search_vector)",
+    "CREATE INDEX IF NOT EXISTS ticket_title_trgm_gin ON tickets_ticket USING gin (title gin_trgm_ops)",
+]
+
+POSTGRES_REVERSE_SQL = [
+    "DROP INDEX IF EXISTS ticket_title_trgm_gin",
+    "DROP INDEX IF EXISTS ticket_search_vector_gin",
+]
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in POSTGRES_FORWARD_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in POSTGRES_REVERSE_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0007_ticket_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
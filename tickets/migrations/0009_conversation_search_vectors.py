@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:31
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+# PostgreSQL only: a BEFORE INSERT/UPDATE trigger keeps each row's vector in
+# step with its content as part of the same write (this also covers
+# bulk_create), existing rows are backfilled and the vectors GIN indexed.
+CONVERSATION_TABLES = ['tickets_message', 'tickets_internalcomment']
+
+
+def create_conversation_search(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in CONVERSATION_TABLES:
+        schema_editor.execute(
+            f"CREATE TRIGGER {table}_search_vector_update "
+            f"BEFORE INSERT OR UPDATE OF content ON {table} "
+            f"FOR EACH ROW EXECUTE FUNCTION "
+            f"tsvector_update_trigger(search_vector, 'pg_catalog.english', content)"
+        )
+        schema_editor.execute(
+            f"UPDATE {table} SET search_vector = to_tsvector('pg_catalog.english', coalesce(content, ''))"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {table}_search_gin ON {table} USING gin (search_vector)"
+        )
+
+
+def drop_conversation_search(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in CONVERSATION_TABLES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {table}_search_gin")
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {table}_search_vector_update ON {table}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0008_ticket_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='internalcomment',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(create_conversation_search, drop_conversation_search),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0009_conversation_search_vectors'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='internalcomment',
+            index=models.Index(fields=['ticket', 'created_at', 'id'], name='comment_ticket_timeline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['ticket', 'created_at', 'id'], name='message_ticket_timeline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(condition=models.Q(('agent__isnull', True), models.Q(('status', 'RESOLVED'), _negated=True)), fields=['-created_at', '-id'], name='ticket_unassigned_open_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(condition=models.Q(('status', 'RESOLVED'), _negated=True), fields=['agent', '-updated_at', '-id'], name='ticket_agent_open_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(condition=models.Q(('status', 'RESOLVED')), fields=['agent', '-updated_at'], name='ticket_agent_resolved_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(condition=models.Q(('status', 'RESOLVED')), fields=['-updated_at'], name='ticket_resolved_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticketattachment',
+            index=models.Index(fields=['ticket', '-uploaded_at'], name='attachment_ticket_idx'),
+        ),
+    ]
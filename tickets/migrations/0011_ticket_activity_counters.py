@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_activity(apps, schema_editor):
+    # Same computation as tickets.activity.rebuild_ticket_activity, on the
+    # historical models; `manage.py rebuild_ticket_activity` can re-run it.
+    Ticket = apps.get_model('tickets', 'Ticket')
+    Message = apps.get_model('tickets', 'Message')
+    TicketAttachment = apps.get_model('tickets', 'TicketAttachment')
+
+    def count(queryset):
+        return Coalesce(
+            Subquery(queryset.order_by().values('ticket').annotate(total=Count('pk')).values('total')),
+            Value(0),
+            output_field=IntegerField(),
+        )
+
+    ticket_messages = Message.objects.filter(ticket=OuterRef('pk'))
+    latest_message = ticket_messages.order_by('-created_at', '-id')
+    Ticket.objects.update(
+        message_count=count(ticket_messages),
+        attachment_count=(
+            count(TicketAttachment.objects.filter(ticket=OuterRef('pk')))
+            + count(ticket_messages.filter(~Q(attachment='') & Q(attachment__isnull=False)))
+        ),
+        last_message_at=Subquery(latest_message.values('created_at')[:1]),
+        last_message_by=Subquery(latest_message.values('sender')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0010_dashboard_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='attachment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='last_message_by',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='message_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_activity, migrations.RunPython.noop),
+    ]
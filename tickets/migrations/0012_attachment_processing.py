@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0011_ticket_activity_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticketattachment',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ticketattachment',
+            name='content_type',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='ticketattachment',
+            name='metadata',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='ticketattachment',
+            name='processed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ticketattachment',
+            name='processing_attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='ticketattachment',
+            name='processing_error',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='ticketattachment',
+            name='sha256',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='ticketattachment',
+            name='size',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        # Attachments uploaded before the pipeline existed were scanned on
+        # upload and are served as they are
+        migrations.AddField(
+            model_name='ticketattachment',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('PROCESSING', 'Processing'), ('READY', 'Ready'), ('REJECTED', 'Rejected')], default='READY', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='ticketattachment',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('PROCESSING', 'Processing'), ('READY', 'Ready'), ('REJECTED', 'Rejected')], default='PENDING', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='ticketattachment',
+            index=models.Index(condition=models.Q(('status__in', ['PENDING', 'PROCESSING'])), fields=['uploaded_at'], name='attachment_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:30
+
+import django.utils.timezone
+import tickets.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0012_attachment_processing'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='message',
+            name='attachment',
+            field=models.FileField(blank=True, max_length=255, null=True, storage=tickets.storage.get_attachment_storage, upload_to='message_attachments/'),
+        ),
+        migrations.AlterField(
+            model_name='ticketattachment',
+            name='file',
+            field=models.FileField(max_length=255, storage=tickets.storage.get_attachment_storage, upload_to='ticket_attachments/'),
+        ),
+        migrations.CreateModel(
+            name='AttachmentBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('sha256', models.CharField(max_length=64)),
+                ('size', models.PositiveBigIntegerField()),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_referenced_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('ref_count', 0)), fields=['last_referenced_at'], name='blob_unreferenced_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0013_content_addressed_attachments'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='first_responded_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='first_response_due',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='next_sla_due',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='resolution_due',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='resolved_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='sla_state',
+            field=models.CharField(choices=[('OK', 'On track'), ('AT_RISK', 'At risk'), ('BREACHED', 'Breached')], default='OK', editable=False, max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(condition=models.Q(('next_sla_due__isnull', False), models.Q(('sla_state', 'BREACHED'), _negated=True)), fields=['next_sla_due'], name='ticket_sla_due_idx'),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:14
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+# PostgreSQL only: a BRIN index on created_at (rows arrive in time order, so
+# a few pages of block ranges cover reports over any time window and the
+# index stays tiny), and a trigger refusing UPDATEs so the log stays
+# append-only whatever writes to the table. DELETE stays possible, to drop
+# old events in created_at ranges with tickets.events.prune_ticket_events()
+# (the ORM's delete() refuses to).
+POSTGRES_FORWARD_SQL = [
+    "CREATE INDEX IF NOT EXISTS ticketevent_created_brin ON tickets_ticketevent USING brin (created_at)",
+    """
+    CREATE OR REPLACE FUNCTION tickets_ticketevent_append_only() RETURNS trigger AS $$
+    BEGIN
+        RAISE EXCEPTION 'tickets_ticketevent is append-only';
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER ticketevent_append_only BEFORE UPDATE ON tickets_ticketevent
+    FOR EACH ROW EXECUTE FUNCTION tickets_ticketevent_append_only()
+    """,
+]
+
+POSTGRES_REVERSE_SQL = [
+    "DROP TRIGGER IF EXISTS ticketevent_append_only ON tickets_ticketevent",
+    "DROP FUNCTION IF EXISTS tickets_ticketevent_append_only()",
+    "DROP INDEX IF EXISTS ticketevent_created_brin",
+]
+
+
+def create_event_log_extras(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in POSTGRES_FORWARD_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_event_log_extras(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in POSTGRES_REVERSE_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0014_ticket_sla_tracking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.PositiveSmallIntegerField(choices=[(1, 'Status'), (2, 'Priority'), (3, 'Agent')])),
+                ('old_value', models.CharField(blank=True, max_length=20)),
+                ('new_value', models.CharField(blank=True, max_length=20)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('actor', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('ticket', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='events', to='tickets.ticket')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ticket', 'created_at', 'id'], name='ticketevent_ticket_idx')],
+            },
+        ),
+        migrations.RunPython(create_event_log_extras, drop_event_log_extras),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0015_ticket_event_log'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ticketevent',
+            name='field',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'Status'), (2, 'Priority'), (3, 'Agent'), (4, 'First response')]),
+        ),
+        migrations.CreateModel(
+            name='DailyStatusRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(choices=[('OPEN', 'Open'), ('IN_PROGRESS', 'In Progress'), ('RESOLVED', 'Resolved'), ('CLOSED', 'Closed')], max_length=20)),
+                ('entered', models.PositiveIntegerField(default=0)),
+                ('exited', models.PositiveIntegerField(default=0)),
+                ('seconds_in_status', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'status'), name='rollup_status_day_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyTicketRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('priority', models.CharField(choices=[('LOW', 'Low'), ('MEDIUM', 'Medium'), ('HIGH', 'High'), ('URGENT', 'Urgent')], max_length=10)),
+                ('created', models.PositiveIntegerField(default=0)),
+                ('assigned', models.PositiveIntegerField(default=0)),
+                ('first_responses', models.PositiveIntegerField(default=0)),
+                ('first_response_seconds', models.BigIntegerField(default=0)),
+                ('resolved', models.PositiveIntegerField(default=0)),
+                ('resolution_seconds', models.BigIntegerField(default=0)),
+                ('reopened', models.PositiveIntegerField(default=0)),
+                ('agent', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='rollup_ticket_day_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('agent__isnull', False)), fields=('day', 'agent', 'priority'), name='rollup_ticket_agent_unique'), models.UniqueConstraint(condition=models.Q(('agent__isnull', True)), fields=('day', 'priority'), name='rollup_ticket_unassigned_unique')],
+            },
+        ),
+    ]
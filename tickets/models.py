@@ -1,10 +1,13 @@
 # tickets/models.py
-from django.db import models
+from django.db import models, transaction
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.utils import timezone
 from django.conf import settings
 import os
 
+from .storage import get_attachment_storage
+
 class CustomUserManager(BaseUserManager):
     def create_user(self, mobile, password=None, **extra_fields):
         """
@@ -151,10 +154,245 @@ class Ticket(models.Model):
     priority = models.CharField(max_length=10, choices=PRIORITY_CHOICES, default='MEDIUM')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Denormalized activity, maintained by tickets.activity
+    message_count = models.PositiveIntegerField(default=0, editable=False)
+    attachment_count = models.PositiveIntegerField(default=0, editable=False)
+    last_message_at = models.DateTimeField(null=True, blank=True, editable=False)
+    last_message_by = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='+', null=True, blank=True, editable=False, on_delete=models.SET_NULL)
+    # Weighted title/description/customer tsvector, maintained by tickets.search
+    # (PostgreSQL only; stays empty on other databases)
+    search_vector = SearchVectorField(null=True, blank=True, editable=False)
+    # Service level deadlines and state, maintained by tickets.sla
+    SLA_OK = 'OK'
+    SLA_AT_RISK = 'AT_RISK'
+    SLA_BREACHED = 'BREACHED'
+    SLA_STATE_CHOICES = [
+        (SLA_OK, 'On track'),
+        (SLA_AT_RISK, 'At risk'),
+        (SLA_BREACHED, 'Breached'),
+    ]
+    first_response_due = models.DateTimeField(null=True, blank=True, editable=False)
+    resolution_due = models.DateTimeField(null=True, blank=True, editable=False)
+    first_responded_at = models.DateTimeField(null=True, blank=True, editable=False)
+    resolved_at = models.DateTimeField(null=True, blank=True, editable=False)
+    next_sla_due = models.DateTimeField(null=True, blank=True, editable=False)
+    sla_state = models.CharField(max_length=10, choices=SLA_STATE_CHOICES, default=SLA_OK, editable=False)
+
+    # Fields whose changes are reported by changed_fields()
+    TRACKED_FIELDS = ('status', 'priority', 'agent_id')
+    # Fields the stored search vector is computed from (tickets/search.py)
+    SEARCH_FIELDS = ('title', 'description')
 
     def __str__(self):
         return f"Ticket #{self.id} - {self.title}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the values as loaded so changes can be detected on save
+        watched = cls.TRACKED_FIELDS + cls.SEARCH_FIELDS
+        instance._loaded_values = {
+            name: value for name, value in zip(field_names, values) if name in watched
+        }
+        return instance
+
+    def changed_fields(self, fields=None):
+        """
+        Return {field: (old, new)} for the TRACKED_FIELDS (or the given
+        ``fields``) that differ from the values loaded from the database.
+        New tickets report nothing.
+        """
+        loaded = getattr(self, '_loaded_values', {})
+        return {
+            name: (loaded[name], getattr(self, name))
+            for name in (self.TRACKED_FIELDS if fields is None else fields)
+            if name in loaded and getattr(self, name) != loaded[name]
+        }
+
+    def reset_tracked_fields(self):
+        # Deferred fields stay unloaded; they are not reported as changed
+        deferred = self.get_deferred_fields()
+        self._loaded_values = {
+            name: getattr(self, name)
+            for name in self.TRACKED_FIELDS + self.SEARCH_FIELDS if name not in deferred
+        }
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        # The reloaded values are what later changes are measured against
+        loaded = getattr(self, '_loaded_values', {})
+        deferred = self.get_deferred_fields()
+        for name in self.TRACKED_FIELDS + self.SEARCH_FIELDS:
+            if name in deferred:
+                continue
+            if fields is None or name in fields or name.removesuffix('_id') in fields:
+                loaded[name] = getattr(self, name)
+        self._loaded_values = loaded
+
+    def save(self, *args, **kwargs):
+        # The change and its TicketEvent rows (post_save) commit together
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+        # post_save handlers have seen the changes; start tracking afresh
+        self.reset_tracked_fields()
+
+    class Meta:
+        indexes = [
+            # Keyset pagination on the dashboards (see tickets/pagination.py)
+            models.Index(fields=['customer', '-created_at', '-id'], name='ticket_customer_created_idx'),
+            models.Index(fields=['-created_at', '-id'], name='ticket_created_idx'),
+            models.Index(fields=['-updated_at', '-id'], name='ticket_updated_idx'),
+            # agent_dashboard: open unassigned tickets, newest first
+            models.Index(
+                fields=['-created_at', '-id'], name='ticket_unassigned_open_idx',
+                condition=models.Q(agent__isnull=True) & ~models.Q(status='RESOLVED'),
+            ),
+            # agent_dashboard: an agent's unresolved tickets by last update
+            models.Index(
+                fields=['agent', '-updated_at', '-id'], name='ticket_agent_open_idx',
+                condition=~models.Q(status='RESOLVED'),
+            ),
+            # agent_dashboard: recently resolved tickets (per agent / all)
+            models.Index(
+                fields=['agent', '-updated_at'], name='ticket_agent_resolved_idx',
+                condition=models.Q(status='RESOLVED'),
+            ),
+            models.Index(
+                fields=['-updated_at'], name='ticket_resolved_idx',
+                condition=models.Q(status='RESOLVED'),
+            ),
+            # SLA sweeper: tickets whose next deadline is near, not yet breached
+            models.Index(
+                fields=['next_sla_due'], name='ticket_sla_due_idx',
+                condition=models.Q(next_sla_due__isnull=False) & ~models.Q(sla_state='BREACHED'),
+            ),
+        ]
+
+
+# --- TicketEvent Model ---
+class TicketEventQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        raise TypeError('Ticket events are append-only.')
+
+    def delete(self):
+        raise TypeError('Ticket events are append-only.')
+
+
+class TicketEvent(models.Model):
+    """
+    One change of a ticket's status, priority or agent, or its first
+    response (tickets/events.py). Rows are only ever inserted; they stay
+    when the ticket or user is deleted, so the foreign keys carry no
+    database constraint.
+    """
+    FIELD_STATUS = 1
+    FIELD_PRIORITY = 2
+    FIELD_AGENT = 3
+    FIELD_FIRST_RESPONSE = 4  # No values; the actor answered the customer
+    FIELD_CHOICES = [
+        (FIELD_STATUS, 'Status'),
+        (FIELD_PRIORITY, 'Priority'),
+        (FIELD_AGENT, 'Agent'),
+        (FIELD_FIRST_RESPONSE, 'First response'),
+    ]
+
+    ticket = models.ForeignKey(
+        Ticket, related_name='events', on_delete=models.DO_NOTHING, db_constraint=False, db_index=False,
+    )
+    field = models.PositiveSmallIntegerField(choices=FIELD_CHOICES)
+    # Status/priority codes, or agent ids; empty for "none"
+    old_value = models.CharField(max_length=20, blank=True)
+    new_value = models.CharField(max_length=20, blank=True)
+    actor = models.ForeignKey(
+        settings.AUTH_USER_MODEL, related_name='+', null=True, blank=True,
+        on_delete=models.DO_NOTHING, db_constraint=False, db_index=False,
+    )
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    objects = TicketEventQuerySet.as_manager()
+
+    def __str__(self):
+        return f"Ticket #{self.ticket_id} {self.get_field_display()}: {self.old_value or '-'} -> {self.new_value or '-'}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise TypeError('Ticket events are append-only.')
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise TypeError('Ticket events are append-only.')
+
+    class Meta:
+        indexes = [
+            # A ticket's history in order, in one index range scan
+            models.Index(fields=['ticket', 'created_at', 'id'], name='ticketevent_ticket_idx'),
+            # Time windows use a BRIN index on created_at (PostgreSQL only, migration 0015)
+        ]
+
+
+# --- Reporting rollups ---
+class DailyTicketRollup(models.Model):
+    """
+    Per day, agent and priority: tickets created, assigned, first answered,
+    resolved and reopened, with the summed times to first response and to
+    resolution (tickets/reports.py). Incremented as ticket events are
+    logged; rebuilt a day at a time from the event log to backfill.
+    """
+    day = models.DateField()
+    # The ticket's agent and priority when it happened; no agent: unassigned
+    agent = models.ForeignKey(
+        settings.AUTH_USER_MODEL, related_name='+', null=True, blank=True,
+        on_delete=models.DO_NOTHING, db_constraint=False, db_index=False,
+    )
+    priority = models.CharField(max_length=10, choices=Ticket.PRIORITY_CHOICES)
+    created = models.PositiveIntegerField(default=0)
+    assigned = models.PositiveIntegerField(default=0)
+    first_responses = models.PositiveIntegerField(default=0)
+    first_response_seconds = models.BigIntegerField(default=0)
+    resolved = models.PositiveIntegerField(default=0)
+    resolution_seconds = models.BigIntegerField(default=0)
+    reopened = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.day} agent {self.agent_id or '-'} {self.priority}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['day'], name='rollup_ticket_day_idx'),
+        ]
+        # One row per day, agent and priority, so increments never split
+        # across rows (two constraints, as NULL agents aren't equal in SQL)
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'agent', 'priority'], condition=models.Q(agent__isnull=False),
+                name='rollup_ticket_agent_unique',
+            ),
+            models.UniqueConstraint(
+                fields=['day', 'priority'], condition=models.Q(agent__isnull=True),
+                name='rollup_ticket_unassigned_unique',
+            ),
+        ]
+
+
+class DailyStatusRollup(models.Model):
+    """
+    Per day and status: how many tickets entered and left the status, and
+    the summed time the departing tickets had spent in it (tickets/reports.py).
+    """
+    day = models.DateField()
+    status = models.CharField(max_length=20, choices=Ticket.STATUS_CHOICES)
+    entered = models.PositiveIntegerField(default=0)
+    exited = models.PositiveIntegerField(default=0)
+    seconds_in_status = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.day} {self.status}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'status'], name='rollup_status_day_unique'),
+        ]
+
 
 # --- Message Model ---
 class Message(models.Model):
@@ -162,32 +400,107 @@ class Message(models.Model):
     sender = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='sent_messages', on_delete=models.CASCADE)
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
-    attachment = models.FileField(upload_to='message_attachments/', null=True, blank=True)
+    attachment = models.FileField(
+        upload_to='message_attachments/', storage=get_attachment_storage, max_length=255, null=True, blank=True,
+    )
     via_whatsapp = models.BooleanField(default=False)
+    # Filled in by a database trigger on PostgreSQL (see tickets/search.py)
+    search_vector = SearchVectorField(null=True, blank=True, editable=False)
 
     def __str__(self):
         sender_identifier = self.sender.mobile if hasattr(self.sender, 'mobile') else self.sender.username
         return f"Message by {sender_identifier} on Ticket #{self.ticket.id} at {self.created_at}"
 
+    @property
+    def has_preview(self):
+        from .thumbnails import is_previewable
+
+        return bool(self.attachment) and is_previewable(self.attachment.name)
+
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            # Per-ticket conversation timeline
+            models.Index(fields=['ticket', 'created_at', 'id'], name='message_ticket_timeline_idx'),
+        ]
 
 # --- TicketAttachment Model ---
 class TicketAttachment(models.Model):
+    # Processing pipeline (tickets/attachments.py): uploads are stored as
+    # PENDING and scanned, hashed and thumbnailed in the background.
+    STATUS_PENDING = 'PENDING'
+    STATUS_PROCESSING = 'PROCESSING'
+    STATUS_READY = 'READY'
+    STATUS_REJECTED = 'REJECTED'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_PROCESSING, 'Processing'),
+        (STATUS_READY, 'Ready'),
+        (STATUS_REJECTED, 'Rejected'),
+    ]
+
     ticket = models.ForeignKey(Ticket, related_name='attachments', on_delete=models.CASCADE)
-    file = models.FileField(upload_to='ticket_attachments/')
+    file = models.FileField(upload_to='ticket_attachments/', storage=get_attachment_storage, max_length=255)
     uploaded_by = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='uploaded_attachments', on_delete=models.CASCADE)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     description = models.CharField(max_length=255, blank=True)
 
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    processing_error = models.CharField(max_length=255, blank=True)
+    processing_attempts = models.PositiveSmallIntegerField(default=0)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    # Filled in by processing
+    sha256 = models.CharField(max_length=64, blank=True)
+    size = models.PositiveBigIntegerField(null=True, blank=True)
+    content_type = models.CharField(max_length=100, blank=True)
+    metadata = models.JSONField(default=dict, blank=True)
+
     def __str__(self):
         return f"Attachment {self.file.name} for Ticket #{self.ticket.id}"
 
     def filename(self):
         return os.path.basename(self.file.name)
 
+    @property
+    def is_ready(self):
+        return self.status == self.STATUS_READY
+
+    @property
+    def has_preview(self):
+        from .thumbnails import is_previewable
+
+        return self.is_ready and is_previewable(self.file.name, self.content_type)
+
     class Meta:
         ordering = ['-uploaded_at']
+        indexes = [
+            models.Index(fields=['ticket', '-uploaded_at'], name='attachment_ticket_idx'),
+            # Work queue of the attachment pipeline
+            models.Index(
+                fields=['uploaded_at'], name='attachment_pending_idx',
+                condition=models.Q(status__in=['PENDING', 'PROCESSING']),
+            ),
+        ]
+
+# --- AttachmentBlob Model ---
+class AttachmentBlob(models.Model):
+    """A stored file shared by every attachment with the same content (tickets/storage.py)."""
+    name = models.CharField(max_length=255, unique=True)
+    sha256 = models.CharField(max_length=64)
+    size = models.PositiveBigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_referenced_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} references)"
+
+    class Meta:
+        indexes = [
+            # Garbage collection candidates
+            models.Index(fields=['last_referenced_at'], name='blob_unreferenced_idx', condition=models.Q(ref_count=0)),
+        ]
 
 # --- InternalComment Model ---
 class InternalComment(models.Model):
@@ -195,9 +508,15 @@ class InternalComment(models.Model):
     author = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='internal_comments', on_delete=models.CASCADE)
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    # Filled in by a database trigger on PostgreSQL (see tickets/search.py)
+    search_vector = SearchVectorField(null=True, blank=True, editable=False)
 
     def __str__(self):
         return f"Internal comment by {self.author.username} on Ticket #{self.ticket.id}"
 
     class Meta:
-        ordering = ['created_at']
\ No newline at end of file
+        ordering = ['created_at']
+        indexes = [
+            # Per-ticket internal comment timeline
+            models.Index(fields=['ticket', 'created_at', 'id'], name='comment_ticket_timeline_idx'),
+        ]
@@ -0,0 +1,94 @@
+# tickets/pagination.py
+"""
+Keyset (cursor) pagination for ticket lists and conversations.
+
+Pages are ordered newest first on (<field>, id) and each page is fetched
+with a WHERE clause on the last row of the previous page, so the cost of a
+page does not depend on how deep it is (unlike OFFSET pagination).
+Cursors record the field they were created for and are ignored if the
+ordering changes.
+"""
+import base64
+import binascii
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 25
+
+# Annotation added by tickets.search for ranked full-text results
+RANK_FIELD = 'search_rank'
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def encode_cursor(field, value, pk):
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = f"{field}|{value}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, field):
+    """
+    Return (value, pk) for a cursor created for ``field``, or None if it is
+    missing, malformed or belongs to another ordering.
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        cursor_field, value, pk = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        if cursor_field != field:
+            return None
+        value = float(value) if field == RANK_FIELD else datetime.fromisoformat(value)
+        return value, int(pk)
+    except (ValueError, TypeError, binascii.Error, UnicodeDecodeError):
+        return None
+
+
+def keyset_paginate(queryset, field, cursor=None, per_page=None):
+    """
+    Return one KeysetPage of ``queryset`` ordered by ``-field, -id``.
+
+    ``cursor`` is the ``next_cursor`` of the previous page; an invalid
+    cursor falls back to the first page. ``per_page`` defaults to the
+    TICKETS_PER_PAGE setting. Ranked search results are paged by
+    relevance instead of ``field``.
+    """
+    if per_page is None:
+        per_page = getattr(settings, 'TICKETS_PER_PAGE', DEFAULT_PAGE_SIZE)
+    if RANK_FIELD in queryset.query.annotations:
+        field = RANK_FIELD
+    queryset = queryset.order_by(f'-{field}', '-id')
+
+    position = decode_cursor(cursor, field)
+    if position is not None:
+        value, pk = position
+        queryset = queryset.filter(
+            Q(**{f'{field}__lt': value}) | Q(**{field: value, 'id__lt': pk})
+        )
+
+    # Fetch one extra row to know whether another page follows
+    rows = list(queryset[:per_page + 1])
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        next_cursor = encode_cursor(field, getattr(last, field), last.pk)
+    return KeysetPage(rows, next_cursor)
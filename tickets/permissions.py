@@ -0,0 +1,34 @@
+# tickets/permissions.py
+"""
+Ticket visibility rules, shared by ticket_detail and the endpoints that
+expose ticket data outside of it.
+"""
+from .models import Ticket
+from .roles import is_in_group
+
+
+def is_staff_member(user):
+    """Agents, Admins and superusers: may see internal comments."""
+    return user.is_superuser or is_in_group(user, 'Agents') or is_in_group(user, 'Admins')
+
+
+def viewable_tickets(user, queryset=None):
+    """
+    Restrict a Ticket queryset to the tickets ``user`` may open:
+    customers see their own tickets, agents the tickets assigned to them,
+    admins and superusers everything.
+    """
+    if queryset is None:
+        queryset = Ticket.objects.all()
+
+    is_customer = is_in_group(user, 'Customers')
+    is_agent = is_in_group(user, 'Agents')
+    is_admin = is_in_group(user, 'Admins')
+    if not (is_customer or is_agent or is_admin or user.is_superuser):
+        return queryset.none()
+
+    if is_customer:
+        queryset = queryset.filter(customer=user)
+    if is_agent and not is_admin and not user.is_superuser:
+        queryset = queryset.filter(agent=user)
+    return queryset
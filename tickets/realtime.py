@@ -0,0 +1,179 @@
+# tickets/realtime.py
+"""
+Real-time ticket conversation updates.
+
+New Message and InternalComment rows are published (after the
+transaction commits, see tickets/signals.py) on a per-ticket channel;
+the WebSocket endpoint in tickets/websocket.py forwards them to the
+browsers that have the ticket open.
+
+Publishing goes through a broker chosen by the TICKET_REALTIME_BROKER_URL
+setting: a redis:// URL uses Redis pub/sub, so events reach subscribers
+served by any process; when it is empty an in-process broker is used,
+which needs no extra service but only reaches subscribers in the same
+process (development, tests, single-process ASGI deployments).
+"""
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+from django.conf import settings
+from django.urls import reverse
+from django.utils import dateformat, timezone
+
+logger = logging.getLogger(__name__)
+
+# Events buffered per subscriber before new ones are dropped
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+def ticket_channel(ticket_id, internal=False):
+    return f'ticket.{ticket_id}.internal' if internal else f'ticket.{ticket_id}'
+
+
+class InProcessBroker:
+    """Fan-out to asyncio queues living in this process."""
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def publish(self, channel, payload):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for loop, queue in subscribers:
+            # publish() is called from sync code in another thread
+            loop.call_soon_threadsafe(self._deliver, queue, payload)
+
+    @staticmethod
+    def _deliver(queue, payload):
+        try:
+            queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            logger.warning('Dropping real-time event for a slow subscriber')
+
+    @asynccontextmanager
+    async def subscribe(self, *channels):
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE))
+        with self._lock:
+            for channel in channels:
+                self._subscribers[channel].add(subscriber)
+        try:
+            yield subscriber[1]
+        finally:
+            with self._lock:
+                for channel in channels:
+                    self._subscribers[channel].discard(subscriber)
+                    if not self._subscribers[channel]:
+                        del self._subscribers[channel]
+
+
+class RedisBroker:
+    """Redis pub/sub, for deployments with several worker processes."""
+
+    def __init__(self, url):
+        self.url = url
+        self._client = None
+
+    def publish(self, channel, payload):
+        import redis
+
+        if self._client is None:
+            self._client = redis.Redis.from_url(self.url)
+        self._client.publish(channel, json.dumps(payload))
+
+    @asynccontextmanager
+    async def subscribe(self, *channels):
+        import redis.asyncio as aioredis
+
+        client = aioredis.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        await pubsub.subscribe(*channels)
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+        async def pump():
+            async for event in pubsub.listen():
+                if event['type'] == 'message':
+                    InProcessBroker._deliver(queue, json.loads(event['data']))
+
+        task = asyncio.create_task(pump())
+        try:
+            yield queue
+        finally:
+            task.cancel()
+            await pubsub.unsubscribe(*channels)
+            await pubsub.aclose()
+            await client.aclose()
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            url = getattr(settings, 'TICKET_REALTIME_BROKER_URL', '')
+            _broker = RedisBroker(url) if url else InProcessBroker()
+        return _broker
+
+
+# --- Payloads ---
+def _display_name(user):
+    return user.get_full_name() or user.username
+
+
+def _timestamps(created_at):
+    return {
+        'created_at': created_at.isoformat(),
+        'created_at_display': dateformat.format(timezone.localtime(created_at), 'g:i A'),
+    }
+
+
+def message_payload(message):
+    return {
+        'type': 'message',
+        'id': message.pk,
+        'ticket_id': message.ticket_id,
+        'sender_id': message.sender_id,
+        'sender_name': _display_name(message.sender),
+        'content': message.content,
+        'attachment_url': reverse('tickets:download_message_attachment', args=[message.pk]) if message.attachment else None,
+        'attachment_name': message.attachment.name.rsplit('/', 1)[-1] if message.attachment else None,
+        'attachment_thumbnail_url': (
+            reverse('tickets:message_attachment_thumbnail', args=[message.pk, 'thumb']) if message.has_preview else None
+        ),
+        **_timestamps(message.created_at),
+    }
+
+
+def internal_comment_payload(comment):
+    return {
+        'type': 'internal_comment',
+        'id': comment.pk,
+        'ticket_id': comment.ticket_id,
+        'sender_id': comment.author_id,
+        'sender_name': _display_name(comment.author),
+        'content': comment.content,
+        **_timestamps(comment.created_at),
+    }
+
+
+def _publish(channel, payload):
+    try:
+        get_broker().publish(channel, payload)
+    except Exception:
+        # A broker outage must not break posting messages
+        logger.exception('Could not publish real-time event on %s', channel)
+
+
+def publish_message(message):
+    _publish(ticket_channel(message.ticket_id), message_payload(message))
+
+
+def publish_internal_comment(comment):
+    _publish(ticket_channel(comment.ticket_id, internal=True), internal_comment_payload(comment))
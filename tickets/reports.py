@@ -0,0 +1,377 @@
+# tickets/reports.py
+"""
+Ticket reporting: response and resolution times, agent throughput and
+time in status.
+
+Reports read two daily rollup tables rather than the tickets and
+messages: DailyTicketRollup (per day, agent and priority: tickets
+created, assigned, first answered, resolved and reopened, with the
+summed times to first response and resolution) and DailyStatusRollup
+(per day and status: tickets entering and leaving it and the time they
+spent in it). A report over any range is an aggregate over a few hundred
+of these rows.
+
+The rows are kept up to date incrementally: once a transaction that
+logged ticket events (tickets/events.py) commits, record_events() adds
+them to the current day's rows with F() increments, a few small UPDATEs
+per ticket change. Everything is counted on the day it happened, under
+the agent and priority the ticket had then, so finished days never
+change. Days are calendar days in TIME_ZONE.
+
+rollup_day() rebuilds a day's rows from that day's events instead,
+replaying each ticket's earlier events to know its agent, priority and
+status going into the day; both paths count through _DayCounters, so
+they agree. ``manage.py rollup_ticket_stats`` uses it to backfill days
+logged before the rollups existed (or imported, tickets/imports.py) and
+to repair a day.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Max, Min, Q, Sum
+from django.utils import timezone
+
+from .models import DailyStatusRollup, DailyTicketRollup, Ticket, TicketEvent
+from .stats import UNRESOLVED_STATUSES
+
+# Ticket ids per query when loading earlier events
+BATCH_SIZE = 500
+
+TICKET_COUNTERS = ('created', 'assigned', 'first_responses', 'first_response_seconds', 'resolved', 'resolution_seconds', 'reopened')
+STATUS_COUNTERS = ('entered', 'exited', 'seconds_in_status')
+
+PRIORITY_ORDER = {priority: i for i, (priority, _) in enumerate(Ticket.PRIORITY_CHOICES)}
+
+GROUP_BY_AGENT = 'agent'
+GROUP_BY_PRIORITY = 'priority'
+GROUP_BY_DAY = 'day'
+GROUP_BY_CHOICES = [
+    (GROUP_BY_AGENT, 'Agent'),
+    (GROUP_BY_PRIORITY, 'Priority'),
+    (GROUP_BY_DAY, 'Day'),
+]
+
+# Report columns, in order: (key, heading)
+REPORT_COLUMNS = [
+    ('created', 'Created'),
+    ('assigned', 'Assigned'),
+    ('first_responses', 'First responses'),
+    ('mean_first_response_hours', 'Mean first response (h)'),
+    ('resolved', 'Resolved'),
+    ('mean_resolution_hours', 'Mean resolution (h)'),
+    ('reopened', 'Reopened'),
+]
+STATUS_REPORT_COLUMNS = [
+    ('entered', 'Entered'),
+    ('exited', 'Left'),
+    ('mean_hours_in_status', 'Mean time in status (h)'),
+]
+
+
+def day_bounds(day):
+    """The start and end of a calendar day in the current time zone."""
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+
+
+# --- Building the rollups ---
+class _TicketState:
+    __slots__ = ('created_at', 'status', 'status_since', 'priority', 'agent_id', 'initial_priority')
+
+    def __init__(self):
+        self.created_at = self.status = self.status_since = self.priority = self.agent_id = self.initial_priority = None
+
+
+def _seconds(later, earlier):
+    return int((later - earlier).total_seconds()) if earlier is not None else 0
+
+
+def _replay_earlier(states, start, day_events):
+    """Bring ``states`` to where the tickets stood at ``start``."""
+    ticket_ids = list(states)
+    for i in range(0, len(ticket_ids), BATCH_SIZE):
+        rows = (
+            TicketEvent.objects.filter(ticket_id__in=ticket_ids[i:i + BATCH_SIZE], created_at__lt=start)
+            .exclude(field=TicketEvent.FIELD_FIRST_RESPONSE)
+            .order_by('ticket_id', 'created_at', 'id')
+            .values_list('ticket_id', 'field', 'old_value', 'new_value', 'created_at')
+        )
+        for ticket_id, field, old, new, at in rows.iterator(chunk_size=2000):
+            state = states[ticket_id]
+            if field == TicketEvent.FIELD_STATUS:
+                if not old:
+                    state.created_at = at
+                state.status, state.status_since = new, at
+            elif field == TicketEvent.FIELD_PRIORITY:
+                state.priority = new
+            else:
+                state.agent_id = int(new) if new else None
+
+    # Tickets created before the event log started: the old values of their
+    # first change that day, or else what the ticket row knows now
+    unknown = {pk: state for pk, state in states.items() if state.created_at is None and state.status is None}
+    if not unknown:
+        return
+    seen = set()
+    for ticket_id, field, old, new, at in day_events:
+        if ticket_id in unknown and (ticket_id, field) not in seen:
+            seen.add((ticket_id, field))
+            if field == TicketEvent.FIELD_PRIORITY:
+                unknown[ticket_id].priority = old
+            elif field == TicketEvent.FIELD_AGENT:
+                unknown[ticket_id].agent_id = int(old) if old else None
+    ticket_ids = list(unknown)
+    for i in range(0, len(ticket_ids), BATCH_SIZE):
+        rows = Ticket.objects.filter(pk__in=ticket_ids[i:i + BATCH_SIZE]).values_list('pk', 'created_at', 'priority', 'agent_id')
+        for pk, created_at, priority, agent_id in rows:
+            state = unknown[pk]
+            state.created_at = state.status_since = created_at
+            if (pk, TicketEvent.FIELD_PRIORITY) not in seen:
+                state.priority = priority
+            if (pk, TicketEvent.FIELD_AGENT) not in seen:
+                state.agent_id = agent_id
+
+
+class _DayCounters:
+    """A day's rollup counters, fed the day's events in log order."""
+
+    def __init__(self):
+        self.tickets = defaultdict(lambda: dict.fromkeys(TICKET_COUNTERS, 0))
+        self.statuses = defaultdict(lambda: dict.fromkeys(STATUS_COUNTERS, 0))
+        self.created = []
+
+    def add(self, state, field, old, new, at):
+        """Count one event of the ticket whose state (just before it) is ``state``, and advance the state."""
+        if field == TicketEvent.FIELD_STATUS:
+            if not old:
+                state.created_at = at
+                self.created.append(state)
+            elif old in UNRESOLVED_STATUSES and new not in UNRESOLVED_STATUSES:
+                counters = self.tickets[state.agent_id, state.priority]
+                counters['resolved'] += 1
+                counters['resolution_seconds'] += _seconds(at, state.created_at)
+            elif old not in UNRESOLVED_STATUSES and new in UNRESOLVED_STATUSES:
+                self.tickets[state.agent_id, state.priority]['reopened'] += 1
+            if old:
+                self.statuses[old]['exited'] += 1
+                self.statuses[old]['seconds_in_status'] += _seconds(at, state.status_since)
+            self.statuses[new]['entered'] += 1
+            state.status, state.status_since = new, at
+        elif field == TicketEvent.FIELD_PRIORITY:
+            if not old:
+                state.initial_priority = new
+            state.priority = new
+        elif field == TicketEvent.FIELD_AGENT:
+            state.agent_id = int(new) if new else None
+            if state.agent_id is not None:
+                self.tickets[state.agent_id, state.priority]['assigned'] += 1
+        elif field == TicketEvent.FIELD_FIRST_RESPONSE:
+            counters = self.tickets[state.agent_id, state.priority]
+            counters['first_responses'] += 1
+            counters['first_response_seconds'] += _seconds(at, state.created_at)
+
+    def finish(self):
+        # New tickets count towards the unassigned row of the priority they were created with
+        for state in self.created:
+            self.tickets[None, state.initial_priority or state.priority]['created'] += 1
+        self.created = []
+        return self
+
+
+def compute_day(day):
+    """(DailyTicketRollup rows, DailyStatusRollup rows) for ``day``, unsaved."""
+    start, end = day_bounds(day)
+    day_events = list(
+        TicketEvent.objects.filter(created_at__gte=start, created_at__lt=end)
+        .order_by('created_at', 'id')
+        .values_list('ticket_id', 'field', 'old_value', 'new_value', 'created_at')
+    )
+    states = {ticket_id: _TicketState() for ticket_id, *_ in day_events}
+    _replay_earlier(states, start, day_events)
+
+    counters = _DayCounters()
+    for ticket_id, field, old, new, at in day_events:
+        counters.add(states[ticket_id], field, old, new, at)
+    counters.finish()
+
+    return (
+        [
+            DailyTicketRollup(day=day, agent_id=agent_id, priority=priority or '', **values)
+            for (agent_id, priority), values in counters.tickets.items()
+        ],
+        [DailyStatusRollup(day=day, status=status, **values) for status, values in counters.statuses.items()],
+    )
+
+
+@transaction.atomic
+def rollup_day(day):
+    """Replace the rollup rows of ``day``. Returns the number of rows written."""
+    ticket_rows, status_rows = compute_day(day)
+    DailyTicketRollup.objects.filter(day=day).delete()
+    DailyStatusRollup.objects.filter(day=day).delete()
+    DailyTicketRollup.objects.bulk_create(ticket_rows)
+    DailyStatusRollup.objects.bulk_create(status_rows)
+    return len(ticket_rows) + len(status_rows)
+
+
+def rollup_days(first_day, last_day=None):
+    """Rebuild every day from ``first_day`` to ``last_day`` (default today). Returns rows written."""
+    last_day = last_day or timezone.localdate()
+    written, day = 0, first_day
+    while day <= last_day:
+        written += rollup_day(day)
+        day += timedelta(days=1)
+    return written
+
+
+# --- Keeping them up to date ---
+def _states_before(events):
+    """
+    {ticket id: _TicketState} as the tickets stood just before ``events``,
+    from the ticket rows (which already include the events' changes), the
+    old values of the events and the tickets' earlier status events.
+    """
+    ticket_ids = {event.ticket_id for event in events}
+    since = min(event.created_at for event in events)
+    states = {}
+    for pk, created_at, status, priority, agent_id in (
+        Ticket.objects.filter(pk__in=ticket_ids).values_list('pk', 'created_at', 'status', 'priority', 'agent_id')
+    ):
+        state = states[pk] = _TicketState()
+        state.created_at = state.status_since = created_at
+        state.status, state.priority, state.agent_id = status, priority, agent_id
+
+    # Undo the events' changes: each field's first old value in the batch
+    seen = set()
+    for event in events:
+        state = states.get(event.ticket_id)
+        if state is None or (event.ticket_id, event.field) in seen:
+            continue
+        seen.add((event.ticket_id, event.field))
+        if event.field == TicketEvent.FIELD_STATUS:
+            state.status = event.old_value or None
+        elif event.field == TicketEvent.FIELD_PRIORITY:
+            state.priority = event.old_value or None
+        elif event.field == TicketEvent.FIELD_AGENT:
+            state.agent_id = int(event.old_value) if event.old_value else None
+
+    # When the ticket was created and entered its status, as replayed by compute_day
+    earlier = (
+        TicketEvent.objects.filter(ticket_id__in=states, field=TicketEvent.FIELD_STATUS, created_at__lt=since)
+        .order_by().values('ticket_id')
+        .annotate(status_since=Max('created_at'), created_at=Min('created_at', filter=Q(old_value='')))
+        .values_list('ticket_id', 'status_since', 'created_at')
+    )
+    for ticket_id, status_since, created_at in earlier:
+        states[ticket_id].status_since = status_since
+        if created_at is not None:
+            states[ticket_id].created_at = created_at
+    return states
+
+
+def _increment(model, key, values):
+    """Add ``values`` to the row of ``model`` identified by ``key``, creating it if needed."""
+    values = {name: value for name, value in values.items() if value}
+    if not values:
+        return
+    increments = {name: F(name) + value for name, value in values.items()}
+    if model.objects.filter(**key).update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**key, **values)
+    except IntegrityError:
+        # Created concurrently
+        model.objects.filter(**key).update(**increments)
+
+
+def record_events(events):
+    """
+    Add newly logged events (one transaction's, in log order) to the
+    rollup rows of their day. Called by tickets/events.py once they are
+    committed.
+    """
+    events = [event for event in events if event.ticket_id is not None]
+    if not events:
+        return
+    states = _states_before(events)
+    days = defaultdict(_DayCounters)
+    for event in events:
+        if event.ticket_id in states:
+            days[timezone.localdate(event.created_at)].add(
+                states[event.ticket_id], event.field, event.old_value, event.new_value, event.created_at,
+            )
+
+    with transaction.atomic():
+        for day, counters in days.items():
+            counters.finish()
+            for (agent_id, priority), values in counters.tickets.items():
+                _increment(DailyTicketRollup, {'day': day, 'agent_id': agent_id, 'priority': priority or ''}, values)
+            for status, values in counters.statuses.items():
+                _increment(DailyStatusRollup, {'day': day, 'status': status}, values)
+
+
+# --- Reading them ---
+def _hours(seconds, count):
+    return round(seconds / count / 3600, 1) if count else None
+
+
+def ticket_report(start_day, end_day, group_by=GROUP_BY_AGENT):
+    """
+    Rows of REPORT_COLUMNS for the days from ``start_day`` to ``end_day``
+    (inclusive), one per agent, priority or day, each with a 'label'.
+    """
+    keys = {
+        GROUP_BY_AGENT: ('agent_id', 'agent__username', 'agent__first_name', 'agent__last_name'),
+        GROUP_BY_PRIORITY: ('priority',),
+        GROUP_BY_DAY: ('day',),
+    }[group_by]
+    rows = (
+        DailyTicketRollup.objects.filter(day__gte=start_day, day__lte=end_day)
+        .order_by().values(*keys).annotate(**{name: Sum(name) for name in TICKET_COUNTERS})
+    )
+    report = []
+    for row in rows:
+        if group_by == GROUP_BY_AGENT:
+            if row['agent_id'] is None:
+                label, order = 'Unassigned', (1, '')
+            else:
+                name = f"{row['agent__first_name']} {row['agent__last_name']}".strip()
+                label = name or row['agent__username'] or f"User #{row['agent_id']}"
+                order = (0, label.lower())
+        elif group_by == GROUP_BY_PRIORITY:
+            label = dict(Ticket.PRIORITY_CHOICES).get(row['priority'], row['priority'])
+            order = PRIORITY_ORDER.get(row['priority'], len(PRIORITY_ORDER))
+        else:
+            label = order = row['day'].isoformat()
+        report.append((order, {
+            'label': label,
+            'created': row['created'],
+            'assigned': row['assigned'],
+            'first_responses': row['first_responses'],
+            'mean_first_response_hours': _hours(row['first_response_seconds'], row['first_responses']),
+            'resolved': row['resolved'],
+            'mean_resolution_hours': _hours(row['resolution_seconds'], row['resolved']),
+            'reopened': row['reopened'],
+        }))
+    report.sort(key=lambda item: item[0])
+    return [row for _, row in report]
+
+
+def status_report(start_day, end_day):
+    """Rows of STATUS_REPORT_COLUMNS, one per status, each with a 'label'."""
+    rows = {
+        row['status']: row
+        for row in DailyStatusRollup.objects.filter(day__gte=start_day, day__lte=end_day)
+        .order_by().values('status').annotate(**{name: Sum(name) for name in STATUS_COUNTERS})
+    }
+    return [
+        {
+            'label': label,
+            'entered': rows[status]['entered'],
+            'exited': rows[status]['exited'],
+            'mean_hours_in_status': _hours(rows[status]['seconds_in_status'], rows[status]['exited']),
+        }
+        for status, label in Ticket.STATUS_CHOICES if status in rows
+    ]
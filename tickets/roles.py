@@ -0,0 +1,100 @@
+# tickets/roles.py
+"""
+Role resolution shared by views, the context processor and template filters.
+
+A user's group ids are loaded once per request (memoized on the user
+object, which Django shares between the view, context processors and the
+template) and cached per user across requests. Group names are resolved
+through a process-level name -> id map, so checking a role costs no
+queries once both are warm.
+
+The signal handlers in tickets/signals.py drop a user's cached ids when
+their membership changes, and reset the group map when a Group is saved
+or deleted.
+"""
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+
+# How long a user's group ids stay in the shared cache (seconds)
+ROLE_CACHE_TIMEOUT = 60 * 15
+
+# How long a process trusts its group map. Signals reset it in the process
+# that changed a group; this bounds staleness in the other workers.
+GROUP_MAP_TIMEOUT = 60 * 5
+
+# Attribute used to memoize the group ids on the user instance
+_USER_ATTR = '_role_group_ids'
+
+_group_ids_by_name = {}
+_group_map_loaded_at = None
+
+
+def role_cache_key(user_id):
+    return f'user_group_ids_{user_id}'
+
+
+# --- Process-level group map ---
+def get_group_map():
+    """Return the {group name: group id} map, loading it if needed."""
+    global _group_ids_by_name, _group_map_loaded_at
+    now = time.monotonic()
+    if _group_map_loaded_at is None or now - _group_map_loaded_at > GROUP_MAP_TIMEOUT:
+        _group_ids_by_name = dict(Group.objects.values_list('name', 'pk'))
+        _group_map_loaded_at = now
+    return _group_ids_by_name
+
+
+def invalidate_group_map():
+    global _group_ids_by_name, _group_map_loaded_at
+    _group_ids_by_name = {}
+    _group_map_loaded_at = None
+
+
+# --- Per-user roles ---
+def get_user_group_ids(user):
+    """Return a frozenset with the ids of the groups the user belongs to."""
+    if user is None or not user.is_authenticated:
+        return frozenset()
+
+    group_ids = getattr(user, _USER_ATTR, None)
+    if group_ids is None:
+        cache_key = role_cache_key(user.pk)
+        group_ids = cache.get(cache_key)
+        if group_ids is None:
+            # Read the through table directly, no need to join auth_group
+            memberships = get_user_model().groups.through.objects.filter(customuser_id=user.pk)
+            group_ids = frozenset(memberships.values_list('group_id', flat=True))
+            cache.set(cache_key, group_ids, ROLE_CACHE_TIMEOUT)
+        setattr(user, _USER_ATTR, group_ids)
+    return group_ids
+
+
+def get_user_group_names(user):
+    """Return a frozenset with the names of the groups the user belongs to."""
+    group_ids = get_user_group_ids(user)
+    if not group_ids:
+        return frozenset()
+    # Ids of deleted groups are simply not found in the map
+    return frozenset(name for name, pk in get_group_map().items() if pk in group_ids)
+
+
+def is_in_group(user, group_name):
+    group_ids = get_user_group_ids(user)
+    if not group_ids:
+        return False
+    group_id = get_group_map().get(group_name)
+    return group_id is not None and group_id in group_ids
+
+
+def invalidate_user_roles(*user_ids):
+    """Drop the cached group ids for the given user ids."""
+    if user_ids:
+        cache.delete_many([role_cache_key(user_id) for user_id in user_ids])
+
+
+def forget_user_roles(user):
+    """Drop the group ids memoized on this user instance."""
+    user.__dict__.pop(_USER_ATTR, None)
@@ -0,0 +1,230 @@
+# tickets/routing.py
+"""
+Automatic assignment of new tickets.
+
+create_ticket hands every new ticket to route_ticket(), which asks the
+strategy named by TICKET_ROUTING_STRATEGY for an agent and assigns the
+ticket to them (the status stays OPEN until the agent picks it up).
+Built-in strategies:
+
+- 'round_robin': agents in turn.
+- 'least_open': the agent with the fewest unresolved tickets.
+- 'priority_aware': the agent with the lowest priority-weighted load
+  (an urgent ticket weighs as much as five low ones).
+
+A dotted path to a RoutingStrategy subclass selects a custom one; an
+empty setting turns routing off and tickets wait in the unassigned list.
+Agents at TICKET_ROUTING_MAX_OPEN unresolved tickets are skipped.
+
+Decisions are made from a cached view of the workload: the eligible
+agents and per-agent counters of unresolved tickets and weighted load.
+It is built with two queries when missing, then kept current by
+incrementing the counters on each routed assignment, so routing a ticket
+costs no queries beyond the assignment itself. Any other change to
+assignments, statuses or priorities invalidates the whole view (a new
+cache generation, see tickets/signals.py and tickets/bulk.py), as does a
+change of group membership.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, Count, IntegerField, Sum, Value, When
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .events import record_change
+from .models import Ticket
+from .stats import UNRESOLVED_STATUSES, invalidate_ticket_stats
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_WEIGHTS = {'LOW': 1, 'MEDIUM': 2, 'HIGH': 3, 'URGENT': 5}
+
+AGENTS_CACHE_KEY = 'routing_agents'
+GENERATION_CACHE_KEY = 'routing_generation'
+ROUND_ROBIN_CACHE_KEY = 'routing_round_robin'
+# Upper bound on how long the cached view can drift from the database
+WORKLOAD_CACHE_TIMEOUT = 60 * 5
+
+
+# --- Cached workload ---
+class Workload:
+    """Unresolved tickets and priority-weighted load per eligible agent."""
+
+    def __init__(self, agent_ids, open_counts, loads):
+        self.agent_ids = agent_ids
+        self.open_counts = open_counts
+        self.loads = loads
+
+
+def _generation():
+    generation = cache.get(GENERATION_CACHE_KEY)
+    if generation is None:
+        generation = int(time.time())
+        cache.add(GENERATION_CACHE_KEY, generation, None)
+        generation = cache.get(GENERATION_CACHE_KEY, generation)
+    return generation
+
+
+def _counter_keys(generation, agent_id):
+    return f'routing_open_{generation}_{agent_id}', f'routing_load_{generation}_{agent_id}'
+
+
+def eligible_agent_ids():
+    agent_ids = cache.get(AGENTS_CACHE_KEY)
+    if agent_ids is None:
+        agent_ids = list(
+            get_user_model().objects.filter(groups__name='Agents', is_active=True)
+            .order_by('pk').values_list('pk', flat=True).distinct()
+        )
+        cache.set(AGENTS_CACHE_KEY, agent_ids, WORKLOAD_CACHE_TIMEOUT)
+    return agent_ids
+
+
+def _count_workload(agent_ids):
+    weight = Case(
+        *(When(priority=priority, then=Value(w)) for priority, w in PRIORITY_WEIGHTS.items()),
+        default=Value(1), output_field=IntegerField(),
+    )
+    rows = (
+        Ticket.objects.filter(agent_id__in=agent_ids, status__in=UNRESOLVED_STATUSES)
+        .order_by().values('agent_id').annotate(open=Count('pk'), load=Sum(weight))
+    )
+    counts = {row['agent_id']: row for row in rows}
+    return (
+        {pk: counts[pk]['open'] if pk in counts else 0 for pk in agent_ids},
+        {pk: counts[pk]['load'] if pk in counts else 0 for pk in agent_ids},
+    )
+
+
+def get_workload():
+    agent_ids = eligible_agent_ids()
+    generation = _generation()
+    keys = {pk: _counter_keys(generation, pk) for pk in agent_ids}
+    cached = cache.get_many([key for pair in keys.values() for key in pair])
+    if len(cached) == 2 * len(agent_ids):
+        return Workload(
+            agent_ids,
+            {pk: cached[keys[pk][0]] for pk in agent_ids},
+            {pk: cached[keys[pk][1]] for pk in agent_ids},
+        )
+
+    open_counts, loads = _count_workload(agent_ids)
+    values = {}
+    for pk in agent_ids:
+        values[keys[pk][0]] = open_counts[pk]
+        values[keys[pk][1]] = loads[pk]
+    cache.set_many(values, WORKLOAD_CACHE_TIMEOUT)
+    return Workload(agent_ids, open_counts, loads)
+
+
+def _record_assignment(agent_id, priority):
+    open_key, load_key = _counter_keys(_generation(), agent_id)
+    try:
+        cache.incr(open_key)
+        cache.incr(load_key, PRIORITY_WEIGHTS.get(priority, 1))
+    except ValueError:
+        pass  # Not cached (expired or invalidated): rebuilt on next use
+
+
+def invalidate_workload():
+    """Drop the cached counters, e.g. after assignments changed outside routing."""
+    try:
+        cache.incr(GENERATION_CACHE_KEY)
+    except ValueError:
+        pass  # No generation yet, so nothing is cached
+
+
+def invalidate_routing_agents():
+    cache.delete(AGENTS_CACHE_KEY)
+
+
+# --- Strategies ---
+class RoutingStrategy:
+    """Picks the agent for a new ticket from those under the open-ticket cap."""
+
+    def choose(self, ticket, agent_ids, workload):
+        """Return an agent id from ``agent_ids`` (never empty), or None to leave the ticket unassigned."""
+        raise NotImplementedError
+
+
+class RoundRobinStrategy(RoutingStrategy):
+    def choose(self, ticket, agent_ids, workload):
+        cache.add(ROUND_ROBIN_CACHE_KEY, 0, None)
+        try:
+            turn = cache.incr(ROUND_ROBIN_CACHE_KEY)
+        except ValueError:
+            turn = 0
+        return agent_ids[turn % len(agent_ids)]
+
+
+class LeastOpenStrategy(RoutingStrategy):
+    def choose(self, ticket, agent_ids, workload):
+        return min(agent_ids, key=lambda pk: (workload.open_counts[pk], workload.loads[pk], pk))
+
+
+class PriorityAwareStrategy(RoutingStrategy):
+    def choose(self, ticket, agent_ids, workload):
+        return min(agent_ids, key=lambda pk: (workload.loads[pk], workload.open_counts[pk], pk))
+
+
+STRATEGIES = {
+    'round_robin': RoundRobinStrategy,
+    'least_open': LeastOpenStrategy,
+    'priority_aware': PriorityAwareStrategy,
+}
+
+_strategy = None
+_strategy_name = None
+
+
+def get_strategy():
+    """The configured strategy, or None when routing is off."""
+    global _strategy, _strategy_name
+    name = getattr(settings, 'TICKET_ROUTING_STRATEGY', '')
+    if name != _strategy_name:
+        strategy_class = STRATEGIES.get(name) or (import_string(name) if name else None)
+        _strategy = strategy_class() if strategy_class else None
+        _strategy_name = name
+    return _strategy
+
+
+# --- Routing ---
+def route_ticket(ticket):
+    """Assign a new, unassigned ticket to an agent. Returns the agent id or None."""
+    strategy = get_strategy()
+    if strategy is None or ticket.agent_id is not None:
+        return None
+
+    workload = get_workload()
+    max_open = getattr(settings, 'TICKET_ROUTING_MAX_OPEN', None)
+    agent_ids = [
+        pk for pk in workload.agent_ids
+        if max_open is None or workload.open_counts[pk] < max_open
+    ]
+    if not agent_ids:
+        return None
+    agent_id = strategy.choose(ticket, agent_ids, workload)
+    if agent_id is None:
+        return None
+
+    # Conditional, so a ticket someone assigned meanwhile is left alone.
+    # QuerySet.update() bypasses post_save, which would invalidate the view.
+    with transaction.atomic():
+        assigned = Ticket.objects.filter(pk=ticket.pk, agent__isnull=True).update(
+            agent_id=agent_id, updated_at=timezone.now(),
+        )
+        if not assigned:
+            return None
+        # Made by the system, not the user creating the ticket
+        record_change(ticket.pk, 'agent_id', None, agent_id, actor_id=None)
+    ticket.agent_id = agent_id
+    ticket.reset_tracked_fields()
+    transaction.on_commit(lambda: _record_assignment(agent_id, ticket.priority))
+    transaction.on_commit(invalidate_ticket_stats)
+    logger.info('Routed ticket %s to agent %s (%s)', ticket.pk, agent_id, _strategy_name)
+    return agent_id
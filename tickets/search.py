@@ -0,0 +1,211 @@
+# tickets/search.py
+"""
+Ticket search.
+
+On PostgreSQL tickets are matched against ``Ticket.search_vector`` (a
+weighted tsvector of title, description and customer username kept up to
+date on save, GIN indexed) and, for partial words, by trigram similarity
+on the title (GIN trigram index). Matches are annotated with
+``search_rank`` so callers can order by relevance.
+
+The conversation is searched through ``Message.search_vector`` and
+``InternalComment.search_vector``, which a database trigger fills in as
+each row is inserted (see migration 0009), so new messages are
+searchable immediately without re-indexing anything.
+
+Other databases (SQLite in development) fall back to icontains lookups.
+Purely numeric queries are treated as ticket numbers and resolved with a
+primary key lookup.
+"""
+from django.db import connection
+from django.db.models import F, FloatField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import CustomUser, InternalComment, Message, Ticket
+
+# Text search configuration used for the tsvector and the queries
+SEARCH_CONFIG = 'english'
+
+# Highlight markers placed by ts_headline, swapped for <mark> after escaping
+_HL_START = '\x02'
+_HL_STOP = '\x03'
+
+# Characters of context kept around a match in fallback snippets
+_SNIPPET_CONTEXT = 60
+
+
+def uses_full_text_search():
+    return connection.vendor == 'postgresql'
+
+
+def ticket_search_vector(customer_username=''):
+    """
+    Expression computing a ticket's search vector (PostgreSQL only).
+    ``customer_username`` is a string or an expression.
+    """
+    from django.contrib.postgres.search import SearchVector
+
+    if not hasattr(customer_username, 'resolve_expression'):
+        customer_username = Value(customer_username or '')
+    return (
+        SearchVector('title', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('description', weight='B', config=SEARCH_CONFIG)
+        + SearchVector(customer_username, weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vector(ticket):
+    """Recompute the stored search vector of a single ticket."""
+    # The customer's username is read in the UPDATE, not loaded here
+    rebuild_search_vectors(Ticket.objects.filter(pk=ticket.pk))
+
+
+def rebuild_search_vectors(tickets):
+    """Recompute the search vectors of a Ticket queryset with one UPDATE, e.g. after bulk_create."""
+    if not uses_full_text_search():
+        return 0
+    username = Subquery(CustomUser.objects.filter(pk=OuterRef('customer_id')).values('username')[:1])
+    return tickets.update(search_vector=ticket_search_vector(username))
+
+
+def search_tickets(queryset, query, include_internal=False):
+    """
+    Filter a Ticket queryset by a free text search query.
+
+    Tickets also match on their messages and, with ``include_internal``
+    (agents only), on their internal comments.
+    """
+    query = query.strip()
+    if not query:
+        return queryset
+
+    # "#123" or "123": look the ticket up by number
+    ticket_number = query.lstrip('#')
+    if ticket_number.isdigit():
+        return queryset.filter(pk=int(ticket_number))
+
+    if not uses_full_text_search():
+        match = (
+            Q(title__icontains=query) |
+            Q(description__icontains=query) |
+            Q(customer__username__icontains=query) |
+            Q(pk__in=Message.objects.filter(content__icontains=query).values('ticket_id'))
+        )
+        if include_internal:
+            match |= Q(pk__in=InternalComment.objects.filter(content__icontains=query).values('ticket_id'))
+        return queryset.filter(match)
+
+    from django.contrib.postgres.lookups import TrigramWordSimilar
+    from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+
+    search_query = SearchQuery(query, search_type='websearch', config=SEARCH_CONFIG)
+    # "title %> query" can use the trigram GIN index; the cut-off is
+    # pg_trgm.word_similarity_threshold (0.6 by default)
+    match = (
+        Q(search_vector=search_query) |
+        Q(TrigramWordSimilar(F('title'), query)) |
+        Q(pk__in=Message.objects.filter(search_vector=search_query).values('ticket_id'))
+    )
+    if include_internal:
+        match |= Q(pk__in=InternalComment.objects.filter(search_vector=search_query).values('ticket_id'))
+    return queryset.annotate(
+        search_rank=Coalesce(SearchRank(F('search_vector'), search_query), Value(0.0), output_field=FloatField())
+        + TrigramWordSimilarity(Value(query), 'title'),
+    ).filter(match)
+
+
+# --- Conversation search ---
+def search_conversations(query, tickets, include_internal=False, limit=20):
+    """
+    Return up to ``limit`` conversation hits for ``query`` within the
+    ``tickets`` queryset, best matches first.
+
+    Each hit is a dict with the ticket id and title, the source
+    ('message' or 'internal_comment'), the row's created_at and an
+    HTML-safe snippet with the matched terms wrapped in <mark>.
+    """
+    query = query.strip()
+    if not query:
+        return []
+
+    sources = [('message', Message.objects.filter(ticket__in=tickets))]
+    if include_internal:
+        sources.append(('internal_comment', InternalComment.objects.filter(ticket__in=tickets)))
+
+    if uses_full_text_search():
+        hits = _ranked_conversation_hits(query, sources, limit)
+    else:
+        hits = _fallback_conversation_hits(query, sources, limit)
+    return hits[:limit]
+
+
+def _ranked_conversation_hits(query, sources, limit):
+    from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank
+
+    search_query = SearchQuery(query, search_type='websearch', config=SEARCH_CONFIG)
+    hits = []
+    for source, queryset in sources:
+        # Rank on the GIN-matched rows first and only build headlines for
+        # the rows that make the cut; ts_headline re-parses the content.
+        top = list(
+            queryset.filter(search_vector=search_query)
+            .annotate(rank=SearchRank(F('search_vector'), search_query))
+            .order_by('-rank', '-created_at')
+            .values_list('pk', 'rank')[:limit]
+        )
+        ranks = dict(top)
+        rows = queryset.filter(pk__in=ranks).select_related('ticket').annotate(
+            headline=SearchHeadline(
+                'content', search_query, config=SEARCH_CONFIG,
+                start_sel=_HL_START, stop_sel=_HL_STOP, max_fragments=2,
+            )
+        )
+        for row in rows:
+            hits.append(_hit(source, row, _highlight(row.headline), ranks[row.pk]))
+    hits.sort(key=lambda hit: (hit['rank'], hit['created_at']), reverse=True)
+    return hits
+
+
+def _fallback_conversation_hits(query, sources, limit):
+    hits = []
+    for source, queryset in sources:
+        rows = queryset.filter(content__icontains=query).select_related('ticket').order_by('-created_at')[:limit]
+        for row in rows:
+            hits.append(_hit(source, row, _fallback_snippet(row.content, query), 0.0))
+    hits.sort(key=lambda hit: hit['created_at'], reverse=True)
+    return hits
+
+
+def _hit(source, row, snippet, rank):
+    return {
+        'ticket_id': row.ticket_id,
+        'ticket_title': row.ticket.title,
+        'source': source,
+        'created_at': row.created_at,
+        'snippet': snippet,
+        'rank': rank,
+    }
+
+
+def _highlight(headline):
+    marked = escape(headline).replace(_HL_START, '<mark>').replace(_HL_STOP, '</mark>')
+    return mark_safe(marked)
+
+
+def _fallback_snippet(content, query):
+    position = content.lower().find(query.lower())
+    if position < 0:
+        return escape(content[:2 * _SNIPPET_CONTEXT])
+    start = max(position - _SNIPPET_CONTEXT, 0)
+    end = position + len(query)
+    snippet = (
+        escape(content[start:position]) + '<mark>' + escape(content[position:end]) + '</mark>'
+        + escape(content[end:end + _SNIPPET_CONTEXT])
+    )
+    if start > 0:
+        snippet = '&hellip;' + snippet
+    if end + _SNIPPET_CONTEXT < len(content):
+        snippet += '&hellip;'
+    return mark_safe(snippet)
@@ -0,0 +1,126 @@
+# tickets/signals.py
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import activity, events, realtime, routing, sla
+from .attachments import enqueue_attachment
+from .models import InternalComment, Message, Ticket, TicketAttachment
+from .roles import forget_user_roles, invalidate_group_map, invalidate_user_roles
+from .search import update_search_vector
+from .stats import invalidate_ticket_stats
+from .storage import release_file
+
+CustomUser = get_user_model()
+
+
+def _member_ids(group):
+    return list(group.customuser_group_set.values_list('pk', flat=True))
+
+
+# --- Role cache invalidation ---
+@receiver(m2m_changed, sender=CustomUser.groups.through)
+def user_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        # user.groups.add(...) / remove / clear: only this user is affected
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            forget_user_roles(instance)
+            invalidate_user_roles(instance.pk)
+            routing.invalidate_routing_agents()
+        return
+
+    # group.customuser_group_set.add(...) etc.: pk_set holds user ids
+    if action == 'pre_clear':
+        instance._role_cleared_user_ids = _member_ids(instance)
+    elif action == 'post_clear':
+        invalidate_user_roles(*instance.__dict__.pop('_role_cleared_user_ids', []))
+    elif action in ('post_add', 'post_remove') and pk_set:
+        invalidate_user_roles(*pk_set)
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        routing.invalidate_routing_agents()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    # Users cache group ids, so only the name -> id map needs resetting
+    invalidate_group_map()
+
+
+# --- Search index, event log, statistics and routing workload maintenance ---
+@receiver(pre_save, sender=Ticket)
+def ticket_saving(sender, instance, raw=False, **kwargs):
+    # SLA deadlines follow the priority; resolution follows the status
+    if raw:
+        return
+    changed = instance.changed_fields()
+    if instance._state.adding or set(sla.SLA_INPUT_FIELDS) & set(changed):
+        sla.apply_sla(instance, recompute_due=instance._state.adding or 'priority' in changed)
+
+
+@receiver(post_save, sender=Ticket)
+def ticket_saved(sender, instance, created, update_fields, raw=False, **kwargs):
+    # Only a new ticket or a saved change to the searchable fields needs
+    # the vector refreshed; changed_fields() compares with the loaded values
+    search_fields = Ticket.SEARCH_FIELDS
+    if update_fields is not None:
+        search_fields = set(search_fields) & set(update_fields)
+    if created or instance.changed_fields(search_fields):
+        update_search_vector(instance)
+
+    changed = instance.changed_fields()
+    # Inside Ticket.save()'s transaction, so the events commit with the change
+    if not raw:
+        events.record_ticket_saved(instance, created)
+    if created or changed:
+        invalidate_ticket_stats()
+    # Routing keeps per-agent counters of unresolved tickets
+    if changed or (created and instance.agent_id):
+        routing.invalidate_workload()
+
+
+@receiver(post_delete, sender=Ticket)
+def ticket_deleted(sender, instance, **kwargs):
+    invalidate_ticket_stats()
+    if instance.agent_id:
+        routing.invalidate_workload()
+
+
+# --- Denormalized ticket activity, live updates and attachment files ---
+@receiver(post_save, sender=Message)
+def message_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        activity.message_created(instance)
+        sla.record_first_response(instance)
+        transaction.on_commit(lambda: realtime.publish_message(instance))
+
+
+@receiver(post_delete, sender=Message)
+def message_deleted(sender, instance, **kwargs):
+    activity.message_deleted(instance)
+    transaction.on_commit(lambda: release_file(instance.attachment))
+
+
+@receiver(post_save, sender=InternalComment)
+def internal_comment_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        activity.internal_comment_created(instance)
+        transaction.on_commit(lambda: realtime.publish_internal_comment(instance))
+
+
+@receiver(post_save, sender=TicketAttachment)
+def attachment_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        activity.attachment_created(instance)
+        if instance.status == TicketAttachment.STATUS_PENDING:
+            transaction.on_commit(lambda: enqueue_attachment(instance.pk))
+
+
+@receiver(post_delete, sender=TicketAttachment)
+def attachment_deleted(sender, instance, **kwargs):
+    activity.attachment_deleted(instance)
+    # Rejected attachments already released their file
+    if instance.status != TicketAttachment.STATUS_REJECTED:
+        transaction.on_commit(lambda: release_file(instance.file))
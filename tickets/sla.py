@@ -0,0 +1,172 @@
+# tickets/sla.py
+"""
+Service level tracking.
+
+Each priority has a first-response and a resolution target
+(TICKET_SLA_POLICIES, hours). Tickets store the resulting deadlines,
+first_response_due and resolution_due, computed from created_at when
+the ticket is created and whenever its priority changes. first_responded_at
+is set by the first message of anyone but the customer, and resolved_at
+when the ticket is resolved or closed (cleared again if it is reopened).
+
+next_sla_due holds the deadline the ticket is currently working towards:
+the first-response deadline until someone answers, then the resolution
+deadline, and nothing once resolved. sla_state is OK, AT_RISK (the next
+deadline is less than TICKET_SLA_WARNING_MINUTES away) or BREACHED (a
+deadline was missed; this sticks).
+
+Ticket saves keep all of this current through the pre_save handler in
+tickets/signals.py, which also records first responses as messages are
+posted; tickets/bulk.py recomputes it after its set-based updates.
+Time passing is handled by sweep_sla() (``manage.py sweep_sla``), which
+finds every ticket needing a state change with one range query on a
+partial index over next_sla_due, so it never scans the open tickets that
+are on track. ``manage.py rebuild_sla`` recomputes everything, e.g. after
+changing the policies or to fill in tickets created before SLA tracking.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Case, F, OuterRef, Q, Subquery, Value, When
+from django.utils import timezone
+
+from . import events
+from .models import Message, Ticket
+from .stats import UNRESOLVED_STATUSES, invalidate_ticket_stats
+
+logger = logging.getLogger(__name__)
+
+# Priority -> (first response, resolution) targets in hours
+DEFAULT_SLA_POLICIES = {
+    'URGENT': (1, 4),
+    'HIGH': (4, 24),
+    'MEDIUM': (8, 72),
+    'LOW': (24, 120),
+}
+DEFAULT_WARNING_MINUTES = 60
+
+# Fields whose change requires the SLA fields to be recomputed
+SLA_INPUT_FIELDS = ('priority', 'status')
+SLA_FIELDS = ('first_response_due', 'resolution_due', 'resolved_at', 'next_sla_due', 'sla_state')
+
+
+def sla_policy(priority):
+    """(first response, resolution) timedeltas for a priority."""
+    policies = getattr(settings, 'TICKET_SLA_POLICIES', DEFAULT_SLA_POLICIES)
+    first_response, resolution = policies.get(priority, policies.get('MEDIUM', DEFAULT_SLA_POLICIES['MEDIUM']))
+    return timedelta(hours=first_response), timedelta(hours=resolution)
+
+
+def warning_window():
+    return timedelta(minutes=getattr(settings, 'TICKET_SLA_WARNING_MINUTES', DEFAULT_WARNING_MINUTES))
+
+
+def apply_sla(ticket, now=None, recompute_due=True):
+    """Set the SLA fields of ``ticket`` (not saved) from its priority, status and history."""
+    now = now or timezone.now()
+    if recompute_due or ticket.first_response_due is None:
+        first_response, resolution = sla_policy(ticket.priority)
+        created = ticket.created_at or now
+        ticket.first_response_due = created + first_response
+        ticket.resolution_due = created + resolution
+
+    if ticket.status in UNRESOLVED_STATUSES:
+        ticket.resolved_at = None
+    elif ticket.resolved_at is None:
+        ticket.resolved_at = now
+
+    if ticket.resolved_at is not None:
+        ticket.next_sla_due = None
+    elif ticket.first_responded_at is None:
+        ticket.next_sla_due = ticket.first_response_due
+    else:
+        ticket.next_sla_due = ticket.resolution_due
+
+    responded = ticket.first_responded_at or ticket.resolved_at or now
+    resolved = ticket.resolved_at or now
+    if responded > ticket.first_response_due or resolved > ticket.resolution_due:
+        ticket.sla_state = Ticket.SLA_BREACHED
+    elif ticket.next_sla_due is not None and ticket.next_sla_due < now + warning_window():
+        ticket.sla_state = Ticket.SLA_AT_RISK
+    else:
+        ticket.sla_state = Ticket.SLA_OK
+
+
+def refresh_tickets(ticket_ids, recompute_due=False, now=None, batch_size=500):
+    """Recompute and store the SLA fields of the given tickets. Returns how many changed."""
+    now = now or timezone.now()
+    tickets = list(Ticket.objects.filter(pk__in=ticket_ids).only(
+        'pk', 'priority', 'status', 'created_at', 'first_responded_at', *SLA_FIELDS,
+    ))
+    changed = []
+    for ticket in tickets:
+        before = [getattr(ticket, name) for name in SLA_FIELDS]
+        apply_sla(ticket, now, recompute_due=recompute_due)
+        if before != [getattr(ticket, name) for name in SLA_FIELDS]:
+            changed.append(ticket)
+    Ticket.objects.bulk_update(changed, SLA_FIELDS, batch_size=batch_size)
+    return len(changed)
+
+
+def rebuild_sla(tickets, now=None):
+    """
+    Recompute every SLA field of the ``tickets`` queryset from the messages
+    and the current policies. Resolved tickets without resolved_at (resolved
+    before tracking started) are taken to be resolved at their last update.
+    """
+    first_answer = (
+        Message.objects.filter(ticket=OuterRef('pk')).exclude(sender=OuterRef('customer'))
+        .order_by('created_at').values('created_at')[:1]
+    )
+    tickets.update(first_responded_at=Subquery(first_answer))
+    tickets.exclude(status__in=UNRESOLVED_STATUSES).filter(resolved_at__isnull=True).update(resolved_at=F('updated_at'))
+    return refresh_tickets(tickets.values_list('pk', flat=True), recompute_due=True, now=now)
+
+
+def record_first_response(message):
+    """Mark the first answer to the customer on the message's ticket (one conditional UPDATE)."""
+    updated = Ticket.objects.filter(
+        pk=message.ticket_id, first_responded_at__isnull=True,
+    ).exclude(customer_id=message.sender_id).update(
+        first_responded_at=message.created_at,
+        next_sla_due=Case(When(resolved_at__isnull=True, then=F('resolution_due')), default=None),
+        # Answered in time: any warning was about this deadline
+        sla_state=Case(
+            When(Q(sla_state=Ticket.SLA_BREACHED) | Q(first_response_due__lt=message.created_at), then=Value(Ticket.SLA_BREACHED)),
+            default=Value(Ticket.SLA_OK),
+        ),
+    )
+    if updated:
+        events.record_first_response(message)
+        invalidate_ticket_stats()
+    return updated
+
+
+def sweep_sla(now=None):
+    """
+    Move tickets whose next deadline is near or past to AT_RISK / BREACHED.
+    Returns (ids newly at risk, ids newly breached).
+    """
+    now = now or timezone.now()
+    warn_before = now + warning_window()
+    # Served by the ticket_sla_due_idx partial index
+    due = list(
+        Ticket.objects.filter(next_sla_due__lt=warn_before)
+        .exclude(sla_state=Ticket.SLA_BREACHED)
+        .values_list('pk', 'next_sla_due', 'sla_state')
+    )
+    breached = [pk for pk, due_at, _ in due if due_at < now]
+    at_risk = [pk for pk, due_at, state in due if due_at >= now and state == Ticket.SLA_OK]
+
+    # Conditions repeated so a ticket answered or resolved meanwhile is left alone
+    if breached:
+        Ticket.objects.filter(pk__in=breached, next_sla_due__lt=now).update(sla_state=Ticket.SLA_BREACHED)
+        logger.warning('SLA breached for tickets %s', ', '.join(map(str, breached)))
+    if at_risk:
+        Ticket.objects.filter(pk__in=at_risk, sla_state=Ticket.SLA_OK, next_sla_due__lt=warn_before).update(
+            sla_state=Ticket.SLA_AT_RISK,
+        )
+    if breached or at_risk:
+        invalidate_ticket_stats()
+    return at_risk, breached
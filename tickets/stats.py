@@ -0,0 +1,110 @@
+# tickets/stats.py
+"""
+Ticket statistics for the agent dashboard and the stats JSON endpoint.
+
+Everything is computed with three aggregate queries (status x priority
+counts, per-agent workload, tickets created per day) and kept in the
+default cache. The signal handlers in tickets/signals.py drop the cached
+entry when a ticket is created or deleted, or its status, priority or
+agent changes; tickets/sla.py does when SLA states change.
+"""
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Ticket
+
+STATS_CACHE_KEY = 'ticket_stats'
+STATS_CACHE_TIMEOUT = 60 * 10
+
+# Length of the "tickets created per day" series
+CREATED_PER_DAY_WINDOW = 30
+
+UNRESOLVED_STATUSES = ('OPEN', 'IN_PROGRESS')
+
+
+def compute_ticket_stats():
+    statuses = [status for status, _ in Ticket.STATUS_CHOICES]
+    priorities = [priority for priority, _ in Ticket.PRIORITY_CHOICES]
+
+    by_priority = {priority: dict.fromkeys(statuses, 0) for priority in priorities}
+    unassigned_open = sla_at_risk = sla_breached = 0
+    counts = Ticket.objects.order_by().values('status', 'priority').annotate(
+        total=Count('pk'),
+        unassigned=Count('pk', filter=Q(agent__isnull=True)),
+        at_risk=Count('pk', filter=Q(sla_state=Ticket.SLA_AT_RISK)),
+        breached=Count('pk', filter=Q(sla_state=Ticket.SLA_BREACHED)),
+    )
+    for row in counts:
+        by_priority.setdefault(row['priority'], dict.fromkeys(statuses, 0))[row['status']] = row['total']
+        if row['status'] in UNRESOLVED_STATUSES:
+            unassigned_open += row['unassigned']
+            sla_at_risk += row['at_risk']
+            sla_breached += row['breached']
+    by_status = {status: sum(row[status] for row in by_priority.values()) for status in statuses}
+
+    workload = (
+        Ticket.objects.filter(agent__isnull=False, status__in=UNRESOLVED_STATUSES)
+        .order_by()
+        .values('agent_id', 'agent__username', 'agent__first_name', 'agent__last_name')
+        .annotate(
+            open=Count('pk', filter=Q(status='OPEN')),
+            in_progress=Count('pk', filter=Q(status='IN_PROGRESS')),
+            total=Count('pk'),
+        )
+    )
+    agent_workload = sorted(
+        (
+            {
+                'agent_id': row['agent_id'],
+                'name': f"{row['agent__first_name']} {row['agent__last_name']}".strip() or row['agent__username'],
+                'open': row['open'],
+                'in_progress': row['in_progress'],
+                'total': row['total'],
+            }
+            for row in workload
+        ),
+        key=lambda row: (-row['total'], row['name']),
+    )
+
+    today = timezone.localdate()
+    since = today - timedelta(days=CREATED_PER_DAY_WINDOW - 1)
+    per_day = dict(
+        Ticket.objects.filter(created_at__date__gte=since)
+        .annotate(day=TruncDate('created_at'))
+        .order_by()
+        .values('day')
+        .annotate(total=Count('pk'))
+        .values_list('day', 'total')
+    )
+    created_per_day = [
+        {'date': day.isoformat(), 'total': per_day.get(day, 0)}
+        for day in (since + timedelta(days=offset) for offset in range(CREATED_PER_DAY_WINDOW))
+    ]
+
+    return {
+        'generated_at': timezone.now().isoformat(),
+        'by_status': by_status,
+        'by_priority': by_priority,
+        'unassigned_open': unassigned_open,
+        # Unresolved tickets by SLA state (tickets/sla.py)
+        'sla_at_risk': sla_at_risk,
+        'sla_breached': sla_breached,
+        'agent_workload': agent_workload,
+        'created_per_day': created_per_day,
+    }
+
+
+def get_ticket_stats():
+    stats = cache.get(STATS_CACHE_KEY)
+    if stats is None:
+        stats = compute_ticket_stats()
+        cache.set(STATS_CACHE_KEY, stats, STATS_CACHE_TIMEOUT)
+    return stats
+
+
+def invalidate_ticket_stats():
+    cache.delete(STATS_CACHE_KEY)
@@ -0,0 +1,152 @@
+# tickets/storage.py
+"""
+Content-addressed storage for ticket and message attachments.
+
+Files are stored once per distinct content, as blobs named after their
+SHA-256 under ``blobs/``. The name saved on the model is
+``cas/<sha256>/<original file name>``: it keeps the name the user
+uploaded for display while every copy of the same content resolves to
+the same blob.
+
+Each blob has an AttachmentBlob row counting the names that reference
+it; save() adds a reference and delete() releases one, removing the
+blob once the release of its last reference is committed. The garbage
+collection of ``manage.py dedupe_attachments`` recounts references from
+the database (counts can drift, e.g. when a file is saved but the row
+naming it never is) and removes the blobs that turn out unreferenced.
+Names that are not content-addressed (files stored before this backend)
+are handled like FileSystemStorage.
+"""
+import hashlib
+import os
+import uuid
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+CAS_PREFIX = 'cas'
+BLOB_DIR = 'blobs'
+
+
+def is_content_addressed(name):
+    parts = (name or '').split('/')
+    return len(parts) == 3 and parts[0] == CAS_PREFIX and len(parts[1]) == 64
+
+
+def blob_name(name):
+    """Storage path of the blob behind a ``cas/<sha256>/<file>`` name."""
+    _, sha256, filename = name.split('/')
+    extension = os.path.splitext(filename)[1].lower()
+    return f'{BLOB_DIR}/{sha256[:2]}/{sha256[2:4]}/{sha256}{extension}'
+
+
+def file_sha256(content):
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def path(self, name):
+        if is_content_addressed(name):
+            name = blob_name(name)
+        return super().path(name)
+
+    def url(self, name):
+        if is_content_addressed(name):
+            name = blob_name(name)
+        return super().url(name)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        # Uploads are hashed while they are received (tickets/uploads.py)
+        sha256 = getattr(content, 'sha256', None) or file_sha256(content)
+        filename = self._fit_filename(os.path.basename(name), max_length)
+        name = f'{CAS_PREFIX}/{sha256}/{filename}'
+        blob = blob_name(name)
+
+        if not super().exists(blob):
+            self._write_blob(blob, content)
+        self._add_reference(sha256, blob, content.size)
+        if not super().exists(blob):
+            # Garbage-collected between the check and the new reference
+            self._write_blob(blob, content)
+        return name
+
+    def _write_blob(self, blob, content):
+        # Write under a temporary name and move it in place, so a
+        # concurrent upload of the same content never sees half a blob
+        content.seek(0)
+        temporary = super()._save(f'{BLOB_DIR}/tmp/{uuid.uuid4().hex}', content)
+        target = super().path(blob)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(super().path(temporary), target)
+
+    def delete(self, name):
+        if not is_content_addressed(name):
+            return super().delete(name)
+        from .models import AttachmentBlob
+
+        # The blob is shared: drop this reference, and the blob with the last one
+        blob = blob_name(name)
+        AttachmentBlob.objects.filter(name=blob, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+        transaction.on_commit(lambda: self._delete_unreferenced(blob))
+
+    def _delete_unreferenced(self, blob):
+        from .models import AttachmentBlob
+
+        # Deleting the row locks it until the file is gone: a save() of the
+        # same content meanwhile waits, finds no row and writes a new blob
+        with transaction.atomic():
+            if AttachmentBlob.objects.filter(name=blob, ref_count=0).delete()[0]:
+                super().delete(blob)
+
+    def _fit_filename(self, filename, max_length):
+        if max_length is None:
+            return filename
+        available = max_length - len(CAS_PREFIX) - 64 - 2
+        if len(filename) <= available:
+            return filename
+        stem, extension = os.path.splitext(filename)
+        return stem[:max(available - len(extension), 1)] + extension
+
+    def _add_reference(self, sha256, blob, size):
+        from .models import AttachmentBlob
+
+        updated = AttachmentBlob.objects.filter(name=blob).update(
+            ref_count=F('ref_count') + 1, last_referenced_at=timezone.now(),
+        )
+        if not updated:
+            _, created = AttachmentBlob.objects.get_or_create(
+                name=blob, defaults={'sha256': sha256, 'size': size, 'ref_count': 1},
+            )
+            if not created:
+                # Created concurrently by another upload
+                AttachmentBlob.objects.filter(name=blob).update(ref_count=F('ref_count') + 1)
+
+
+_attachment_storage = None
+
+
+def get_attachment_storage():
+    """Storage of TicketAttachment.file and Message.attachment."""
+    global _attachment_storage
+    if _attachment_storage is None:
+        _attachment_storage = ContentAddressedStorage()
+    return _attachment_storage
+
+
+def release_file(field_file):
+    """Drop the reference a deleted row held on its stored file."""
+    if field_file and is_content_addressed(field_file.name):
+        field_file.storage.delete(field_file.name)
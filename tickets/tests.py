@@ -0,0 +1,906 @@
+# tickets/tests.py
+import html
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from unittest import mock
+
+from PIL import Image
+from asgiref.sync import sync_to_async
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.models import Case, FloatField, Value, When
+from django.db.models.fields.files import FieldFile
+from django.template.loader import render_to_string
+from django.test import RequestFactory, TestCase, TransactionTestCase, modify_settings, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import bulk, reports, roles, routing, sla, views
+from .assignment import claim_ticket
+from .attachments import run_attachment_job
+from .bulk import update_tickets
+from .downloads import STREAM_CHUNK_SIZE
+from .models import (
+    AttachmentBlob, CustomUser, DailyStatusRollup, DailyTicketRollup, InternalComment, Message, Ticket, TicketAttachment,
+    TicketEvent,
+)
+from .pagination import decode_cursor, encode_cursor, keyset_paginate
+from .storage import get_attachment_storage
+from .thumbnails import get_thumbnail
+
+
+def make_user(mobile, group_name, **extra_fields):
+    user = CustomUser.objects.create_user(mobile=mobile, password=None, username=f'user{mobile}', **extra_fields)
+    user.groups.add(Group.objects.get_or_create(name=group_name)[0])
+    return user
+
+
+class MediaRootMixin:
+    """Keeps uploads made by the tests in a temporary MEDIA_ROOT."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._media_root = tempfile.mkdtemp()
+        cls._media_override = override_settings(
+            MEDIA_ROOT=cls._media_root, THUMBNAIL_CACHE_DIR=os.path.join(cls._media_root, 'derived'),
+            ATTACHMENT_WORKER_THREADS=0,
+        )
+        cls._media_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._media_override.disable()
+        shutil.rmtree(cls._media_root, ignore_errors=True)
+        super().tearDownClass()
+
+
+@modify_settings(MIDDLEWARE={'append': 'tickets.middleware.FileUploadSecurityMiddleware'})
+class FileUploadSecurityMiddlewareTests(MediaRootMixin, TestCase):
+    def setUp(self):
+        self.customer = make_user('0700000001', 'Customers')
+        self.ticket = Ticket.objects.create(title='Printer', description='Jammed', customer=self.customer)
+        self.client.force_login(self.customer)
+
+    def post_message(self, name, content):
+        return self.client.post(
+            reverse('tickets:ticket_detail', args=[self.ticket.pk]),
+            {'content': 'See attached', 'attachment': SimpleUploadedFile(name, content)},
+        )
+
+    def test_message_attachment_with_script_is_refused(self):
+        response = self.post_message('notes.txt', b'hello <script>alert(1)</script>')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.content, b'Suspicious file content detected')
+        self.assertFalse(Message.objects.exists())
+
+    def test_plain_message_attachment_is_accepted(self):
+        response = self.post_message('notes.txt', b'hello')
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Message.objects.count(), 1)
+
+
+class TicketEventActorTests(TestCase):
+    def setUp(self):
+        self.agent = make_user('0700000004', 'Agents')
+        customer = make_user('0700000005', 'Customers')
+        self.ticket = Ticket.objects.create(title='VPN', description='No access', customer=customer)
+
+    def assert_claimed_by_agent(self):
+        event = TicketEvent.objects.get(ticket=self.ticket, field=TicketEvent.FIELD_AGENT)
+        self.assertEqual(event.new_value, str(self.agent.pk))
+        self.assertEqual(event.actor_id, self.agent.pk)
+
+    def test_request_user_is_the_actor(self):
+        self.client.force_login(self.agent)
+        self.client.post(reverse('tickets:assign_ticket_to_self', args=[self.ticket.pk]))
+        self.assert_claimed_by_agent()
+
+    async def test_request_user_is_the_actor_under_asgi(self):
+        await self.async_client.aforce_login(self.agent)
+        response = await self.async_client.post(reverse('tickets:assign_ticket_to_self', args=[self.ticket.pk]))
+        self.assertEqual(response.status_code, 302)
+        await sync_to_async(self.assert_claimed_by_agent)()
+
+
+class TicketEventPruningTests(TestCase):
+    def test_old_events_can_only_be_pruned(self):
+        customer = make_user('0700000029', 'Customers')
+        old, recent = (Ticket.objects.create(title=title, description='-', customer=customer) for title in ('Old', 'New'))
+        with self.assertRaises(TypeError):
+            TicketEvent.objects.filter(ticket=old).delete()
+
+        TicketEvent.objects.bulk_create([
+            TicketEvent(ticket_id=old.pk, field=TicketEvent.FIELD_STATUS, new_value='OPEN',
+                        created_at=timezone.now() - timedelta(days=400)),
+        ])
+        stdout = io.StringIO()
+        call_command('prune_ticket_events', days=365, stdout=stdout)
+        self.assertIn('Deleted 1 ticket events', stdout.getvalue())
+        self.assertFalse(TicketEvent.objects.filter(created_at__lt=timezone.now() - timedelta(days=365)).exists())
+        self.assertTrue(TicketEvent.objects.filter(ticket=recent).exists())
+
+
+class BaseTemplateQueryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        roles.invalidate_group_map()
+        self.users = {
+            'Customers': make_user('0700000008', 'Customers'),
+            'Agents': make_user('0700000009', 'Agents'),
+            'Admins': make_user('0700000010', 'Admins', is_staff=True),
+        }
+
+    def render(self, user):
+        request = RequestFactory().get('/')
+        request.user = user
+        return render_to_string('base.html', request=request)
+
+    def fresh(self, user):
+        """A new instance of ``user``, as each request loads one, with nothing memoized on it."""
+        return CustomUser.objects.get(pk=user.pk)
+
+    def test_navbar_costs_no_queries_once_roles_are_cached(self):
+        links = {
+            'Customers': ('My Tickets', 'Agent Dashboard'),
+            'Agents': ('Agent Dashboard', 'Reports'),
+            'Admins': ('Reports', 'My Tickets'),
+        }
+        for group_name, user in self.users.items():
+            with self.subTest(group_name):
+                user = self.fresh(user)
+                self.render(user)  # Warms the role cache (and the group map)
+                user = self.fresh(user)
+                with self.assertNumQueries(0):
+                    html = self.render(user)
+                shown, hidden = links[group_name]
+                self.assertIn(shown, html)
+                self.assertNotIn(hidden, html)
+
+    def test_first_render_loads_group_ids_and_group_map_once(self):
+        user = self.fresh(self.users['Agents'])
+        with self.assertNumQueries(2):
+            self.render(user)
+
+
+class AgentDashboardQueryTests(TestCase):
+    def setUp(self):
+        self.agent = make_user('0700000011', 'Agents')
+        self.client.force_login(self.agent)
+        self.created = 0
+
+    def add_tickets(self, count):
+        """Unassigned, assigned to the agent and resolved tickets, each from its own customer."""
+        for i in range(self.created, self.created + count):
+            customer = make_user(f'0720000{i:03d}', 'Customers', first_name=f'Customer {i}')
+            ticket = Ticket.objects.create(
+                title=f'Ticket {i}', description='Broken', customer=customer,
+                agent=self.agent if i % 3 else None, status='RESOLVED' if i % 3 == 2 else 'OPEN',
+            )
+            Message.objects.create(ticket=ticket, sender=customer, content='Any news?')
+        self.created += count
+
+    def get_dashboard(self):
+        # Ticket stats and roles computed afresh each time
+        cache.clear()
+        roles.invalidate_group_map()
+        response = self.client.get(reverse('tickets:agent_dashboard'))
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_query_count_does_not_grow_with_tickets(self):
+        self.add_tickets(5)
+        with CaptureQueriesContext(connection) as queries:
+            self.get_dashboard()
+        self.add_tickets(45)
+        with self.assertNumQueries(len(queries)):
+            response = self.get_dashboard()
+        self.assertIn('Customer 49', response.content.decode())
+
+
+class ExportTicketsTests(TestCase):
+    def setUp(self):
+        self.agent = make_user('0700000002', 'Agents')
+        customer = make_user('0700000003', 'Customers')
+        for i in range(3):
+            Ticket.objects.create(title=f'Ticket {i}', description='Broken', customer=customer, agent=self.agent)
+        self.url = reverse('tickets:export_tickets') + '?format=csv'
+
+    def assert_export(self, lines):
+        self.assertEqual(lines[0].split(',')[:2], ['id', 'title'])
+        self.assertEqual(len(lines), 4)
+
+    def test_streams_sync_iterator_under_wsgi(self):
+        self.client.force_login(self.agent)
+        response = self.client.get(self.url)
+        self.assertFalse(response.is_async)
+        self.assert_export(b''.join(response.streaming_content).decode().splitlines())
+
+    async def test_streams_async_iterator_under_asgi(self):
+        await self.async_client.aforce_login(self.agent)
+        response = await self.async_client.get(self.url)
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content])
+        self.assert_export(content.decode().splitlines())
+
+
+class DownloadTests(MediaRootMixin, TestCase):
+    # More than one STREAM_CHUNK_SIZE chunk
+    data = bytes(range(256)) * 1024
+
+    def setUp(self):
+        customer = make_user('0700000006', 'Customers')
+        ticket = Ticket.objects.create(title='Logs', description='Attached', customer=customer)
+        self.message = Message.objects.create(
+            ticket=ticket, sender=customer, content='Logs',
+            attachment=ContentFile(self.data, name='logs.pdf'),
+        )
+        self.customer = customer
+        self.url = reverse('tickets:download_message_attachment', args=[self.message.pk])
+
+    def test_streams_file_under_wsgi(self):
+        self.client.force_login(self.customer)
+        response = self.client.get(self.url)
+        self.assertFalse(response.is_async)
+        self.assertEqual(b''.join(response.streaming_content), self.data)
+
+    async def test_streams_file_in_chunks_under_asgi(self):
+        await self.async_client.aforce_login(self.customer)
+        response = await self.async_client.get(self.url)
+        self.assertTrue(response.is_async)
+        self.assertEqual(response['Content-Length'], str(len(self.data)))
+        chunks = [chunk async for chunk in response.streaming_content]
+        self.assertEqual(b''.join(chunks), self.data)
+        self.assertEqual({len(chunk) for chunk in chunks[:-1]}, {STREAM_CHUNK_SIZE})
+
+    async def test_streams_range_under_asgi(self):
+        await self.async_client.aforce_login(self.customer)
+        response = await self.async_client.get(self.url, headers={'Range': 'bytes=100000-'})
+        self.assertEqual(response.status_code, 206)
+        self.assertTrue(response.is_async)
+        self.assertEqual(b''.join([chunk async for chunk in response.streaming_content]), self.data[100000:])
+
+
+class ClaimTicketRaceTests(TransactionTestCase):
+    claimants = 8
+
+    def setUp(self):
+        # Threads can't share SQLite's in-memory test database without
+        # "database table is locked" errors; run with a file or PostgreSQL
+        # test database (or manage.py stress_ticket_assignment)
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('needs a test database that threads can share')
+
+    def test_exactly_one_concurrent_claim_wins(self):
+        customer = make_user('0700000007', 'Customers')
+        agents = [make_user(f'07100000{i:02d}', 'Agents') for i in range(self.claimants)]
+        ticket = Ticket.objects.create(title='Laptop', description='Screen', customer=customer)
+        barrier = threading.Barrier(len(agents))
+        results, errors = [], []
+
+        def claim(agent):
+            try:
+                barrier.wait()
+                results.append((agent, claim_ticket(ticket.pk, agent)))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=claim, args=(agent,)) for agent in agents]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        winners = [agent for agent, won in results if won]
+        self.assertEqual(len(winners), 1)
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.agent, winners[0])
+        self.assertEqual(ticket.events.filter(field=TicketEvent.FIELD_AGENT).count(), 1)
+
+
+class ContentAddressedStorageTests(MediaRootMixin, TestCase):
+    def setUp(self):
+        self.storage = get_attachment_storage()
+
+    def test_blob_is_removed_with_its_last_reference(self):
+        first = self.storage.save('ticket_attachments/a.txt', ContentFile(b'same content'))
+        second = self.storage.save('ticket_attachments/b.txt', ContentFile(b'same content'))
+        path = self.storage.path(first)
+        self.assertEqual(path, self.storage.path(second))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.storage.delete(first)
+        self.assertTrue(os.path.exists(path))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.storage.delete(second)
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(AttachmentBlob.objects.exists())
+
+    def test_rejected_attachment_file_is_removed(self):
+        customer = make_user('0700000012', 'Customers')
+        ticket = Ticket.objects.create(title='Form', description='Attached', customer=customer)
+        attachment = TicketAttachment.objects.create(
+            ticket=ticket, uploaded_by=customer, file=ContentFile(b'<script>alert(1)</script>', name='form.txt'),
+        )
+        path = attachment.file.path
+
+        with self.captureOnCommitCallbacks(execute=True):
+            run_attachment_job(attachment.pk)
+        attachment.refresh_from_db()
+        self.assertEqual(attachment.status, TicketAttachment.STATUS_REJECTED)
+        self.assertFalse(os.path.exists(path))
+
+
+class ThumbnailCacheTests(MediaRootMixin, TestCase):
+    def setUp(self):
+        customer = make_user('0700000013', 'Customers')
+        ticket = Ticket.objects.create(title='Screenshot', description='Attached', customer=customer)
+        self.message = Message.objects.create(ticket=ticket, sender=customer, content='Screenshot')
+        # Stored by upload path, as before content-addressed storage
+        self.message.attachment.name = FileSystemStorage().save('message_attachments/screen.png', self.image('red'))
+
+    def image(self, color):
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 48), color).save(buffer, 'PNG')
+        return ContentFile(buffer.getvalue())
+
+    def test_legacy_file_is_not_reread_on_cache_hit(self):
+        path = get_thumbnail(self.message.attachment, 'thumb')
+        with mock.patch.object(FieldFile, 'open', side_effect=AssertionError('file was read')):
+            self.assertEqual(get_thumbnail(self.message.attachment, 'thumb'), path)
+
+    def test_replaced_legacy_file_gets_a_new_thumbnail(self):
+        path = get_thumbnail(self.message.attachment, 'thumb')
+        with open(self.message.attachment.path, 'wb') as f:
+            f.write(self.image('blue').read())
+        os.utime(self.message.attachment.path, ns=(0, 0))
+        self.assertNotEqual(get_thumbnail(self.message.attachment, 'thumb'), path)
+
+
+class TicketChangeTrackingTests(TestCase):
+    def test_refresh_from_db_resets_tracked_values(self):
+        customer = make_user('0700000016', 'Customers')
+        ticket = Ticket.objects.create(title='Mail', description='Bounces', customer=customer)
+        Ticket.objects.filter(pk=ticket.pk).update(status='RESOLVED')
+        ticket.refresh_from_db()
+        ticket.status = 'OPEN'
+        self.assertEqual(ticket.changed_fields(), {'status': ('RESOLVED', 'OPEN')})
+        ticket.save()
+        event = TicketEvent.objects.filter(ticket=ticket, field=TicketEvent.FIELD_STATUS).latest('id')
+        self.assertEqual((event.old_value, event.new_value), ('RESOLVED', 'OPEN'))
+
+    def test_search_vector_only_recomputed_for_searchable_changes(self):
+        customer = make_user('0700000017', 'Customers')
+        with mock.patch('tickets.signals.update_search_vector') as update_search_vector:
+            ticket = Ticket.objects.create(title='VPN', description='Times out', customer=customer)
+            self.assertEqual(update_search_vector.call_count, 1)
+            ticket.status = 'IN_PROGRESS'
+            ticket.save()
+            ticket.save()
+            self.assertEqual(update_search_vector.call_count, 1)
+            ticket.description = 'Times out after login'
+            ticket.save()
+            self.assertEqual(update_search_vector.call_count, 2)
+            ticket.title = 'VPN drops'
+            ticket.save(update_fields=['status'])
+            self.assertEqual(update_search_vector.call_count, 2)
+
+
+class ReportRollupTests(TestCase):
+    def rollup_rows(self):
+        return (
+            sorted(DailyTicketRollup.objects.values_list('day', 'agent_id', 'priority', *reports.TICKET_COUNTERS), key=str),
+            sorted(DailyStatusRollup.objects.values_list('day', 'status', *reports.STATUS_COUNTERS)),
+        )
+
+    def test_rollups_are_updated_as_events_are_logged(self):
+        agent = make_user('0700000014', 'Agents')
+        customer = make_user('0700000015', 'Customers')
+        # Each block commits, as a request would
+        with self.captureOnCommitCallbacks(execute=True):
+            ticket = Ticket.objects.create(title='Wi-Fi', description='Drops', customer=customer, priority='HIGH')
+        with self.captureOnCommitCallbacks(execute=True):
+            ticket.agent, ticket.status = agent, 'IN_PROGRESS'
+            ticket.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            Message.objects.create(ticket=ticket, sender=agent, content='Restarting the router')
+        with self.captureOnCommitCallbacks(execute=True):
+            update_tickets(Ticket.objects.filter(pk=ticket.pk), {'status': 'RESOLVED'})
+        with self.captureOnCommitCallbacks(execute=True):
+            ticket.refresh_from_db()
+            ticket.status = 'OPEN'
+            ticket.save()
+
+        today = timezone.localdate()
+        [row] = [row for row in reports.ticket_report(today, today) if row['label'] != 'Unassigned']
+        self.assertEqual(
+            (row['assigned'], row['first_responses'], row['resolved'], row['reopened']), (1, 1, 1, 1),
+        )
+        statuses = {row['label']: row for row in reports.status_report(today, today)}
+        self.assertEqual(statuses['Resolved']['entered'], 1)
+        self.assertEqual(statuses['Resolved']['exited'], 1)
+
+        # A rebuild from the event log gives the same rows
+        incremental = self.rollup_rows()
+        reports.rollup_days(today, today)
+        self.assertEqual(self.rollup_rows(), incremental)
+
+
+class TicketRoutingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.customer = make_user('0700000018', 'Customers')
+        self.agents = [make_user(f'073000000{i}', 'Agents') for i in range(3)]
+        self.client.force_login(self.customer)
+
+    def give(self, agent, *priorities):
+        for priority in priorities:
+            Ticket.objects.create(title='Earlier', description='Open', customer=self.customer, agent=agent, priority=priority)
+
+    def create_ticket(self, priority='MEDIUM'):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('tickets:create_ticket'), {'title': 'Laptop', 'description': 'No power', 'priority': priority},
+            )
+        self.assertEqual(response.status_code, 302)
+        return Ticket.objects.latest('id')
+
+    def test_each_strategy_assigns_new_tickets(self):
+        # Open tickets / priority-weighted load: 2/2, 1/5 and 2/5
+        self.give(self.agents[0], 'LOW', 'LOW')
+        self.give(self.agents[1], 'URGENT')
+        self.give(self.agents[2], 'HIGH', 'MEDIUM')
+
+        with self.subTest('least_open'):
+            ticket = self.create_ticket()
+            self.assertEqual(ticket.agent, self.agents[1])
+            self.assertEqual(ticket.status, 'OPEN')
+            event = TicketEvent.objects.get(ticket=ticket, field=TicketEvent.FIELD_AGENT)
+            self.assertIsNone(event.actor_id)
+
+        with self.subTest('priority_aware'), override_settings(TICKET_ROUTING_STRATEGY='priority_aware'):
+            self.assertEqual(self.create_ticket().agent, self.agents[0])
+
+        with self.subTest('round_robin'), override_settings(TICKET_ROUTING_STRATEGY='round_robin'):
+            assigned = [self.create_ticket().agent for _ in range(3)]
+            self.assertCountEqual(assigned, self.agents)
+
+        with self.subTest('off'), override_settings(TICKET_ROUTING_STRATEGY=''):
+            self.assertIsNone(self.create_ticket().agent)
+
+    def test_agents_at_the_open_ticket_cap_are_skipped(self):
+        self.give(self.agents[0], 'LOW', 'LOW')
+        self.give(self.agents[1], 'LOW')
+        self.give(self.agents[2], 'LOW', 'LOW')
+        with override_settings(TICKET_ROUTING_STRATEGY='priority_aware', TICKET_ROUTING_MAX_OPEN=2):
+            self.assertEqual(self.create_ticket().agent, self.agents[1])
+            # Now everyone is at the cap
+            self.assertIsNone(self.create_ticket().agent)
+
+    def test_assigned_ticket_is_left_alone(self):
+        ticket = Ticket.objects.create(title='Phone', description='Cracked', customer=self.customer)
+        # Claimed by an agent after the ticket was loaded
+        Ticket.objects.filter(pk=ticket.pk).update(agent=self.agents[2])
+        self.assertIsNone(routing.route_ticket(ticket))
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.agent, self.agents[2])
+        self.assertFalse(TicketEvent.objects.filter(ticket=ticket, field=TicketEvent.FIELD_AGENT).exists())
+
+        self.assertIsNone(routing.route_ticket(ticket))
+
+    def test_cached_workload_follows_assignments_and_status_changes(self):
+        agent = self.agents[0]
+        ticket = self.create_ticket()
+        self.assertEqual(ticket.agent, agent)
+        # Cached, and kept current by the routed assignment
+        with self.assertNumQueries(0):
+            self.assertEqual(routing.get_workload().open_counts[agent.pk], 1)
+
+        # A manual reassignment through save()
+        ticket.agent = self.agents[1]
+        ticket.save()
+        workload = routing.get_workload()
+        self.assertEqual((workload.open_counts[agent.pk], workload.open_counts[self.agents[1].pk]), (0, 1))
+
+        # A status change through save()
+        ticket.status = 'RESOLVED'
+        ticket.save()
+        self.assertEqual(routing.get_workload().open_counts[self.agents[1].pk], 0)
+
+        # A bulk update
+        with self.captureOnCommitCallbacks(execute=True):
+            update_tickets(Ticket.objects.filter(pk=ticket.pk), {'status': 'OPEN', 'agent': self.agents[2]})
+        self.assertEqual(routing.get_workload().open_counts[self.agents[2].pk], 1)
+        self.assertEqual(self.create_ticket().agent, agent)
+
+
+@override_settings(TICKET_SLA_POLICIES={'HIGH': (2, 8), 'MEDIUM': (4, 24)}, TICKET_SLA_WARNING_MINUTES=30)
+class SlaTrackingTests(TestCase):
+    def setUp(self):
+        self.customer = make_user('0700000019', 'Customers')
+        self.agent = make_user('0700000020', 'Agents')
+        self.ticket = Ticket.objects.create(title='Server', description='Down', customer=self.customer, priority='HIGH')
+
+    def test_deadlines_come_from_the_priority_policy(self):
+        ticket = self.ticket
+        # Computed as the ticket is created, just before created_at is stamped
+        self.assertAlmostEqual(ticket.first_response_due, ticket.created_at + timedelta(hours=2), delta=timedelta(seconds=1))
+        self.assertAlmostEqual(ticket.resolution_due, ticket.created_at + timedelta(hours=8), delta=timedelta(seconds=1))
+        self.assertEqual(ticket.next_sla_due, ticket.first_response_due)
+        self.assertEqual(ticket.sla_state, Ticket.SLA_OK)
+
+        # Counted from creation again when the priority changes
+        ticket.priority = 'MEDIUM'
+        ticket.save()
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.first_response_due, ticket.created_at + timedelta(hours=4))
+        self.assertEqual(ticket.resolution_due, ticket.created_at + timedelta(hours=24))
+
+        ticket.status = 'RESOLVED'
+        ticket.save()
+        ticket.refresh_from_db()
+        self.assertIsNotNone(ticket.resolved_at)
+        self.assertIsNone(ticket.next_sla_due)
+
+    def test_first_response_is_the_first_message_not_from_the_customer(self):
+        Message.objects.create(ticket=self.ticket, sender=self.customer, content='Any news?')
+        self.ticket.refresh_from_db()
+        self.assertIsNone(self.ticket.first_responded_at)
+
+        reply = Message.objects.create(ticket=self.ticket, sender=self.agent, content='Looking into it')
+        Message.objects.create(ticket=self.ticket, sender=self.agent, content='Rebooting')
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.first_responded_at, reply.created_at)
+        self.assertEqual(self.ticket.next_sla_due, self.ticket.resolution_due)
+        self.assertEqual(
+            TicketEvent.objects.filter(ticket=self.ticket, field=TicketEvent.FIELD_FIRST_RESPONSE).count(), 1,
+        )
+
+    def test_sweep_moves_tickets_to_at_risk_then_breached(self):
+        answered = Ticket.objects.create(title='Mail', description='Slow', customer=self.customer, priority='HIGH')
+        Message.objects.create(ticket=answered, sender=self.agent, content='On it')
+        first_response_due = self.ticket.first_response_due
+
+        self.assertEqual(sla.sweep_sla(now=first_response_due - timedelta(hours=1)), ([], []))
+
+        at_risk, breached = sla.sweep_sla(now=first_response_due - timedelta(minutes=10))
+        self.assertEqual((at_risk, breached), ([self.ticket.pk], []))
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.sla_state, Ticket.SLA_AT_RISK)
+
+        with self.assertLogs('tickets.sla', 'WARNING'):
+            at_risk, breached = sla.sweep_sla(now=first_response_due + timedelta(minutes=1))
+        self.assertEqual((at_risk, breached), ([], [self.ticket.pk]))
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.sla_state, Ticket.SLA_BREACHED)
+        # The answered ticket works towards its resolution deadline instead
+        answered.refresh_from_db()
+        self.assertEqual(answered.sla_state, Ticket.SLA_OK)
+
+        # Breached sticks, and is not reported again
+        self.assertEqual(sla.sweep_sla(now=first_response_due + timedelta(hours=1)), ([], []))
+
+
+class BulkUpdateTests(TestCase):
+    def setUp(self):
+        self.agent = make_user('0700000021', 'Agents')
+        self.other_agent = make_user('0700000022', 'Agents')
+        self.customer = make_user('0700000023', 'Customers')
+        self.mine = [self.ticket(agent=self.agent) for _ in range(2)]
+        self.theirs = self.ticket(agent=self.other_agent)
+        self.unassigned = self.ticket()
+
+    def ticket(self, **fields):
+        return Ticket.objects.create(title='Printer', description='Offline', customer=self.customer, **fields)
+
+    def post(self, ticket_ids, action, value=''):
+        self.client.force_login(self.agent)
+        response = self.client.post(
+            reverse('tickets:bulk_update_tickets'),
+            {'ticket_ids': [str(pk) for pk in ticket_ids], 'action': action, 'value': value},
+            headers={'X-Requested-With': 'XMLHttpRequest'},
+        )
+        self.assertEqual(response.status_code, 200)
+        return {int(pk): result for pk, result in response.json()['results'].items()}
+
+    def test_set_status_reports_each_ticket(self):
+        Ticket.objects.filter(pk=self.mine[1].pk).update(status='RESOLVED')
+        results = self.post([self.mine[0].pk, self.mine[1].pk, self.theirs.pk, 999999], bulk.SET_STATUS, 'RESOLVED')
+        self.assertEqual(results, {
+            self.mine[0].pk: bulk.UPDATED,
+            self.mine[1].pk: bulk.UNCHANGED,
+            self.theirs.pk: bulk.NOT_FOUND,
+            999999: bulk.NOT_FOUND,
+        })
+
+    def test_agents_cannot_change_tickets_they_do_not_own(self):
+        for action, value in [(bulk.SET_STATUS, 'CLOSED'), (bulk.SET_PRIORITY, 'URGENT'), (bulk.REASSIGN, self.agent.pk)]:
+            with self.subTest(action):
+                self.assertEqual(self.post([self.theirs.pk, self.unassigned.pk], action, value), {
+                    self.theirs.pk: bulk.NOT_FOUND, self.unassigned.pk: bulk.NOT_FOUND,
+                })
+        self.theirs.refresh_from_db()
+        self.assertEqual(
+            (self.theirs.status, self.theirs.priority, self.theirs.agent), ('OPEN', 'MEDIUM', self.other_agent),
+        )
+        self.assertFalse(TicketEvent.objects.filter(ticket=self.theirs, actor=self.agent).exists())
+
+    def test_assign_to_self_skips_assigned_tickets(self):
+        results = self.post([self.unassigned.pk, self.theirs.pk, self.mine[0].pk], bulk.ASSIGN_TO_SELF)
+        self.assertEqual(results, {
+            self.unassigned.pk: bulk.UPDATED,
+            self.theirs.pk: bulk.ALREADY_ASSIGNED,
+            self.mine[0].pk: bulk.ALREADY_ASSIGNED,
+        })
+        self.unassigned.refresh_from_db()
+        self.assertEqual((self.unassigned.agent, self.unassigned.status), (self.agent, 'IN_PROGRESS'))
+
+    def test_one_event_per_changed_ticket(self):
+        last_id = TicketEvent.objects.latest('id').pk
+        results = bulk.apply_bulk_action(self.agent, [ticket.pk for ticket in self.mine], bulk.SET_STATUS, 'CLOSED')
+        self.assertEqual(set(results.values()), {bulk.UPDATED})
+        events = TicketEvent.objects.filter(pk__gt=last_id).order_by('ticket_id')
+        self.assertEqual(
+            [(event.ticket_id, event.field, event.old_value, event.new_value, event.actor_id) for event in events],
+            [(ticket.pk, TicketEvent.FIELD_STATUS, 'OPEN', 'CLOSED', self.agent.pk) for ticket in self.mine],
+        )
+
+        # Nothing left to change: no more events
+        bulk.apply_bulk_action(self.agent, [ticket.pk for ticket in self.mine], bulk.SET_STATUS, 'CLOSED')
+        self.assertEqual(TicketEvent.objects.filter(pk__gt=last_id).count(), 2)
+
+    @override_settings(TICKET_SLA_POLICIES={'URGENT': (1, 4), 'MEDIUM': (8, 72)})
+    def test_priority_change_refreshes_sla_deadlines(self):
+        ticket = self.mine[0]
+        bulk.apply_bulk_action(self.agent, [ticket.pk], bulk.SET_PRIORITY, 'URGENT')
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.priority, 'URGENT')
+        self.assertEqual(ticket.first_response_due, ticket.created_at + timedelta(hours=1))
+        self.assertEqual(ticket.resolution_due, ticket.created_at + timedelta(hours=4))
+        self.assertEqual(ticket.next_sla_due, ticket.first_response_due)
+
+    def test_form_post_summarises_the_results(self):
+        self.client.force_login(self.agent)
+        response = self.client.post(
+            reverse('tickets:bulk_update_tickets'),
+            {'ticket_ids': [self.mine[0].pk, self.theirs.pk], 'action': bulk.SET_PRIORITY, 'value': 'HIGH'},
+            follow=True,
+        )
+        self.assertRedirects(response, reverse('tickets:agent_dashboard'))
+        messages = [str(message) for message in response.context['messages']]
+        self.assertIn('1 ticket updated.', messages)
+        self.assertIn('1 ticket skipped (already up to date, already assigned or not yours).', messages)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.customer = make_user('0700000024', 'Customers')
+        self.tickets = [
+            Ticket.objects.create(title=f'Ticket {i}', description='Slow', customer=self.customer) for i in range(5)
+        ]
+
+    def pages(self, queryset, field, per_page):
+        """The ids on every page, following the cursors."""
+        pages, cursor = [], None
+        while True:
+            page = keyset_paginate(queryset, field, cursor, per_page=per_page)
+            pages.append([ticket.pk for ticket in page])
+            if not page.has_next:
+                return pages
+            cursor = page.next_cursor
+
+    def test_ties_on_the_ordering_field_are_broken_by_id(self):
+        Ticket.objects.update(created_at=timezone.now())
+        ids = sorted((ticket.pk for ticket in self.tickets), reverse=True)
+        self.assertEqual(self.pages(Ticket.objects.all(), 'created_at', 2), [ids[:2], ids[2:4], ids[4:]])
+
+    def test_invalid_cursors_fall_back_to_the_first_page(self):
+        first_page = [ticket.pk for ticket in keyset_paginate(Ticket.objects.all(), 'created_at', per_page=2)]
+        cursors = ['not a cursor', '!!!', 'Zm9v', encode_cursor('updated_at', timezone.now(), 1)]
+        for cursor in cursors:
+            with self.subTest(cursor=cursor):
+                self.assertIsNone(decode_cursor(cursor, 'created_at'))
+                page = keyset_paginate(Ticket.objects.all(), 'created_at', cursor, per_page=2)
+                self.assertEqual([ticket.pk for ticket in page], first_page)
+
+    def test_ranked_results_are_paged_by_rank(self):
+        ranked = Ticket.objects.annotate(search_rank=Case(
+            When(pk__in=[self.tickets[0].pk, self.tickets[1].pk], then=Value(0.9)),
+            default=Value(0.1), output_field=FloatField(),
+        ))
+        page = keyset_paginate(ranked, 'created_at', per_page=2)
+        self.assertEqual([ticket.pk for ticket in page], [self.tickets[1].pk, self.tickets[0].pk])
+        self.assertIsNotNone(decode_cursor(page.next_cursor, 'search_rank'))
+        self.assertEqual(
+            self.pages(ranked, 'created_at', 2)[1:],
+            [[self.tickets[4].pk, self.tickets[3].pk], [self.tickets[2].pk]],
+        )
+
+    def older_link(self, response, label):
+        match = re.search(rf'href="([^"]*)"[^>]*>{label}', response.content.decode())
+        self.assertIsNotNone(match, f'No "{label}" link')
+        return html.unescape(match.group(1))
+
+    @override_settings(TICKETS_PER_PAGE=2)
+    def test_customer_dashboard_older_link_keeps_the_filters(self):
+        Ticket.objects.filter(pk=self.tickets[2].pk).update(priority='HIGH')
+        self.client.force_login(self.customer)
+        url = reverse('tickets:customer_dashboard')
+        response = self.client.get(url, {'status': 'OPEN', 'priority': 'MEDIUM'})
+        link = self.older_link(response, 'Older tickets')
+        self.assertIn('status=OPEN', link)
+        self.assertIn('priority=MEDIUM', link)
+
+        response = self.client.get(url + link)
+        self.assertEqual([ticket.pk for ticket in response.context['tickets']], [self.tickets[1].pk, self.tickets[0].pk])
+
+    @override_settings(TICKETS_PER_PAGE=2)
+    def test_agent_dashboard_older_link_keeps_the_filters(self):
+        Ticket.objects.filter(pk=self.tickets[2].pk).update(priority='HIGH')
+        agent = make_user('0700000025', 'Agents')
+        self.client.force_login(agent)
+        url = reverse('tickets:agent_dashboard')
+        response = self.client.get(url, {'priority': 'MEDIUM', 'assigned': 'unassigned'})
+        link = self.older_link(response, 'Older unassigned tickets')
+        self.assertIn('priority=MEDIUM', link)
+        self.assertIn('assigned=unassigned', link)
+
+        response = self.client.get(url + link)
+        self.assertEqual(
+            [ticket.pk for ticket in response.context['unassigned_tickets']], [self.tickets[1].pk, self.tickets[0].pk],
+        )
+
+
+class TicketMessagesSinceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.customer = make_user('0700000026', 'Customers')
+        self.agent = make_user('0700000027', 'Agents')
+        self.ticket = Ticket.objects.create(title='Scanner', description='Stuck', customer=self.customer, agent=self.agent)
+        self.url = reverse('tickets:ticket_messages_since', args=[self.ticket.pk])
+
+    def poll(self, user, **params):
+        headers = {'HTTP_IF_NONE_MATCH': params.pop('etag')} if 'etag' in params else {}
+        request = RequestFactory().get(self.url, params, **headers)
+        request.user = user
+        return views.ticket_messages_since(request, self.ticket.pk)
+
+    def test_idle_poll_is_a_single_query_not_modified(self):
+        Message.objects.create(ticket=self.ticket, sender=self.customer, content='Hello')
+        first = self.poll(self.customer)
+        self.assertEqual(first.status_code, 200)
+        last_id = json.loads(first.content)['last_message_id']
+
+        response = self.poll(self.customer, after=last_id)
+        with self.assertNumQueries(1):
+            response = self.poll(self.customer, after=last_id, etag=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        # A new message changes the ETag
+        Message.objects.create(ticket=self.ticket, sender=self.agent, content='On my way')
+        response = self.poll(self.customer, after=last_id, etag=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([message['content'] for message in json.loads(response.content)['messages']], ['On my way'])
+
+    def test_has_more_when_over_the_limit(self):
+        messages = [Message.objects.create(ticket=self.ticket, sender=self.customer, content=f'#{i}') for i in range(3)]
+        with mock.patch.object(views, 'MESSAGES_SINCE_LIMIT', 2):
+            data = json.loads(self.poll(self.customer).content)
+            self.assertEqual([message['id'] for message in data['messages']], [messages[0].pk, messages[1].pk])
+            self.assertTrue(data['has_more'])
+            self.assertEqual(data['last_message_id'], messages[1].pk)
+
+            data = json.loads(self.poll(self.customer, after=data['last_message_id']).content)
+            self.assertEqual([message['id'] for message in data['messages']], [messages[2].pk])
+            self.assertFalse(data['has_more'])
+
+    def test_internal_comments_are_only_for_staff(self):
+        Message.objects.create(ticket=self.ticket, sender=self.agent, content='Public reply')
+        InternalComment.objects.create(ticket=self.ticket, author=self.agent, content='Customer is difficult')
+
+        data = json.loads(self.poll(self.customer, after_comment=0).content)
+        self.assertEqual(data['internal_comments'], [])
+        self.assertNotIn('Customer is difficult', json.dumps(data))
+
+        data = json.loads(self.poll(self.agent).content)
+        self.assertEqual([comment['content'] for comment in data['internal_comments']], ['Customer is difficult'])
+
+
+class ImportHelpdeskTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        Group.objects.get_or_create(name='Agents')
+        Group.objects.get_or_create(name='Customers')
+        self.existing = make_user('0700000028', 'Customers')
+        CustomUser.objects.filter(pk=self.existing.pk).update(username='alice')
+
+    def write(self, name, records):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as output:
+            output.writelines(json.dumps(record) + '\n' for record in records)
+        return path
+
+    def run_import(self, users=(), tickets=(), messages=(), **options):
+        files = {
+            kind: self.write(f'{kind}.jsonl', records)
+            for kind, records in (('users', users), ('tickets', tickets), ('messages', messages)) if records
+        }
+        stdout, stderr = io.StringIO(), io.StringIO()
+        call_command('import_helpdesk', **files, **options, stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_username_collisions_get_a_suffix(self):
+        self.run_import(users=[
+            {'id': 'u1', 'mobile': '0740000001', 'username': 'alice'},
+            {'id': 'u2', 'mobile': '0740000002', 'username': 'alice'},
+            {'id': 'u3', 'mobile': '0740000003'},
+            {'id': 'u4', 'mobile': '0700000028', 'username': 'someone else'},
+        ])
+        usernames = dict(CustomUser.objects.values_list('mobile', 'username'))
+        self.assertEqual(usernames['0740000001'], 'alice_1')
+        self.assertEqual(usernames['0740000002'], 'alice_2')
+        self.assertEqual(usernames['0740000003'], 'user_0740000003')
+        # An existing mobile number maps to the existing account, unchanged
+        self.assertEqual(usernames['0700000028'], 'alice')
+        self.assertEqual(CustomUser.objects.filter(mobile='0700000028').count(), 1)
+
+    def test_hashed_passwords_are_kept(self):
+        _, errors = self.run_import(users=[
+            {'id': 'u1', 'mobile': '0740000011', 'password': make_password('correct horse')},
+            {'id': 'u2', 'mobile': '0740000012', 'password': 'plain text'},
+        ], passwords='hashed')
+        self.assertTrue(CustomUser.objects.get(mobile='0740000011').check_password('correct horse'))
+        self.assertFalse(CustomUser.objects.filter(mobile='0740000012').exists())
+        self.assertIn('not a Django password hash', errors)
+
+    def test_unusable_passwords_ignore_the_password_column(self):
+        self.run_import(users=[{'id': 'u1', 'mobile': '0740000021', 'password': make_password('correct horse')}])
+        self.assertFalse(CustomUser.objects.get(mobile='0740000021').has_usable_password())
+
+    @override_settings(TICKET_SLA_POLICIES={'HIGH': (4, 24)})
+    def test_finish_rebuilds_activity_sla_and_search(self):
+        with mock.patch('tickets.imports.rebuild_search_vectors') as rebuild_search_vectors:
+            self.run_import(
+                users=[
+                    {'id': 'c1', 'mobile': '0740000031', 'role': 'customer'},
+                    {'id': 'a1', 'mobile': '0740000032', 'role': 'agent'},
+                ],
+                tickets=[{
+                    'id': 't1', 'customer': 'c1', 'agent': 'a1', 'title': 'Projector', 'priority': 'high',
+                    'status': 'resolved', 'created_at': '2026-01-05T09:00:00+00:00', 'updated_at': '2026-01-05T15:00:00+00:00',
+                }],
+                messages=[
+                    {'ticket': 't1', 'sender': 'c1', 'content': 'No signal', 'created_at': '2026-01-05T09:00:00+00:00'},
+                    {'ticket': 't1', 'sender': 'a1', 'content': 'Cable replaced', 'created_at': '2026-01-05T10:00:00+00:00'},
+                ],
+            )
+        ticket = Ticket.objects.get(title='Projector')
+        imported_ids = list(rebuild_search_vectors.call_args.args[0].values_list('pk', flat=True))
+        self.assertEqual(imported_ids, [ticket.pk])
+
+        agent = CustomUser.objects.get(mobile='0740000032')
+        self.assertEqual(ticket.created_at.isoformat(), '2026-01-05T09:00:00+00:00')
+        self.assertEqual((ticket.message_count, ticket.last_message_by), (2, agent))
+        self.assertEqual(ticket.last_message_at.isoformat(), '2026-01-05T10:00:00+00:00')
+        self.assertEqual(ticket.first_responded_at.isoformat(), '2026-01-05T10:00:00+00:00')
+        self.assertEqual(ticket.resolved_at.isoformat(), '2026-01-05T15:00:00+00:00')
+        self.assertEqual(ticket.first_response_due.isoformat(), '2026-01-05T13:00:00+00:00')
+        self.assertEqual((ticket.next_sla_due, ticket.sla_state), (None, Ticket.SLA_OK))
+        self.assertTrue(TicketEvent.objects.filter(ticket=ticket, field=TicketEvent.FIELD_STATUS, new_value='RESOLVED').exists())
@@ -0,0 +1,184 @@
+# tickets/thumbnails.py
+"""
+Thumbnail and preview cache for image attachments.
+
+Derived images are generated with Pillow and stored on disk under
+THUMBNAIL_CACHE_DIR, keyed by the attachment's SHA-256 and the
+requested size, so identical images share their thumbnails and a
+cached file never goes stale. Files stored before content-addressed
+storage are keyed by their name, size and mtime instead, so they are
+not re-read and hashed on every request. The small size is generated
+in the background by the attachment pipeline (tickets/attachments.py);
+every size is otherwise generated on first request.
+
+Disk use is bounded by THUMBNAIL_CACHE_MAX_BYTES. A cache hit refreshes
+the file's mtime (at most once per TOUCH_INTERVAL), and eviction removes
+the least recently used files until the cache is back under
+EVICT_TO_RATIO of the limit. Eviction runs after enough new bytes have
+been written and from ``manage.py prune_thumbnails``.
+"""
+import hashlib
+import io
+import logging
+import mimetypes
+import os
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+from .storage import is_content_addressed
+
+logger = logging.getLogger(__name__)
+
+# Named sizes (longest side in pixels); only these can be requested
+THUMBNAIL_SIZES = {
+    'thumb': 320,
+    'preview': 1280,
+}
+
+# Image types that can be decoded for metadata and thumbnails
+THUMBNAIL_TYPES = {'image/jpeg', 'image/png', 'image/gif', 'image/bmp', 'image/webp', 'image/tiff'}
+
+DEFAULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+EVICT_TO_RATIO = 0.9
+# Bytes written before the next eviction check, as a share of the limit
+EVICT_CHECK_RATIO = 0.05
+# Hits refresh the LRU position at most this often (seconds)
+TOUCH_INTERVAL = 3600
+
+
+class ThumbnailError(Exception):
+    pass
+
+
+def is_previewable(name, content_type=''):
+    return (content_type or mimetypes.guess_type(name)[0]) in THUMBNAIL_TYPES
+
+
+def cache_dir():
+    return getattr(settings, 'THUMBNAIL_CACHE_DIR', os.path.join(settings.MEDIA_ROOT, 'derived'))
+
+
+def cache_max_bytes():
+    return int(getattr(settings, 'THUMBNAIL_CACHE_MAX_BYTES', DEFAULT_CACHE_MAX_BYTES))
+
+
+def _output_format():
+    from PIL import features
+
+    return ('WEBP', 'webp') if features.check('webp') else ('PNG', 'png')
+
+
+def cache_path(sha256, size_name):
+    _, extension = _output_format()
+    return os.path.join(cache_dir(), sha256[:2], f'{sha256}-{size_name}.{extension}')
+
+
+def render_thumbnail(source, longest_side):
+    """Encode a thumbnail of the image file object ``source``; returns (bytes, metadata)."""
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    image_format, _ = _output_format()
+    try:
+        with Image.open(source) as image:
+            metadata = {'width': image.width, 'height': image.height, 'format': image.format}
+            # JPEG can decode straight to a reduced scale, far cheaper than
+            # decoding the full image and shrinking it afterwards
+            image.draft('RGB', (longest_side, longest_side))
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((longest_side, longest_side))
+            if image.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+                image = image.convert('RGBA')
+            buffer = io.BytesIO()
+            image.save(buffer, format=image_format)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError) as e:
+        raise ThumbnailError(str(e) or 'The file is not a valid image.')
+    return buffer.getvalue(), metadata
+
+
+# --- Cache ---
+_written_since_check = 0
+_evict_lock = threading.Lock()
+
+
+def source_digest(field_file, sha256=''):
+    """Cache key of a stored image: its known or content-addressed hash, else one of its name, size and mtime."""
+    if sha256:
+        return sha256
+    if is_content_addressed(field_file.name):
+        return field_file.name.split('/')[1]
+    # Replacing the file changes its size or mtime, and so the key
+    stat = os.stat(field_file.path)
+    return hashlib.sha256(f'{field_file.name}\0{stat.st_size}\0{stat.st_mtime_ns}'.encode()).hexdigest()
+
+
+def get_thumbnail(field_file, size_name, sha256=''):
+    """Path of the cached ``size_name`` rendition of a stored image, generated if needed."""
+    path = cache_path(source_digest(field_file, sha256), size_name)
+    try:
+        if time.time() - os.stat(path).st_mtime > TOUCH_INTERVAL:
+            os.utime(path)
+        return path
+    except FileNotFoundError:
+        pass
+
+    with field_file.open('rb') as source:
+        data, _ = render_thumbnail(source, THUMBNAIL_SIZES[size_name])
+    store(path, data)
+    return path
+
+
+def store(path, data):
+    """Write a rendition atomically, then evict if the cache has grown enough."""
+    global _written_since_check
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(data)
+    os.replace(temporary, path)
+
+    _written_since_check += len(data)
+    if _written_since_check >= cache_max_bytes() * EVICT_CHECK_RATIO:
+        _written_since_check = 0
+        evict()
+
+
+def evict(max_bytes=None):
+    """Delete least recently used renditions until the cache fits. Returns (files, bytes) removed."""
+    if max_bytes is None:
+        max_bytes = cache_max_bytes()
+    if not _evict_lock.acquire(blocking=False):
+        return 0, 0  # Another thread is already evicting
+    try:
+        entries = []
+        total = 0
+        for directory, _, filenames in os.walk(cache_dir()):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        if total <= max_bytes:
+            return 0, 0
+
+        target = max_bytes * EVICT_TO_RATIO
+        removed = removed_bytes = 0
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+            removed_bytes += size
+        logger.info('Evicted %d thumbnails (%d bytes)', removed, removed_bytes)
+        return removed, removed_bytes
+    finally:
+        _evict_lock.release()
@@ -0,0 +1,172 @@
+# tickets/uploads.py
+"""
+Upload validation while the request body is being received.
+
+ValidatingUploadHandler (first in FILE_UPLOAD_HANDLERS) checks ticket and
+message attachments chunk by chunk: the extension against the field's
+allow-list, the leading magic bytes against that extension and the size
+against MAX_UPLOAD_SIZE. The first failure stops buffering the file; the
+rest of its data is discarded as it arrives, and the form receives a
+RejectedUpload carrying the reason, which it reports as a field error.
+Accepted files are hashed in the same pass (``uploaded_file.sha256``)
+and buffered in memory up to FILE_UPLOAD_MAX_MEMORY_SIZE, then spilled
+to a temporary file, like Django's own handlers.
+
+Uploads to other fields are passed through to the default handlers.
+"""
+import hashlib
+import io
+import os
+
+from django.conf import settings
+from django.core.files.uploadedfile import InMemoryUploadedFile, TemporaryUploadedFile, UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+
+DEFAULT_MAX_UPLOAD_SIZE = 5 * 1024 * 1024
+
+TICKET_ATTACHMENT_EXTENSIONS = ['.pdf', '.doc', '.docx', '.jpg', '.jpeg', '.png', '.txt', '.zip', '.rar']
+MESSAGE_ATTACHMENT_EXTENSIONS = ['.pdf', '.doc', '.docx', '.jpg', '.jpeg', '.png', '.txt']
+
+# Upload field name -> allowed extensions
+UPLOAD_FIELDS = {
+    'attachments': TICKET_ATTACHMENT_EXTENSIONS,  # TicketCreationForm
+    'attachment': MESSAGE_ATTACHMENT_EXTENSIONS,  # MessageCreationForm
+}
+
+_OLE2 = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+_ZIP = (b'PK\x03\x04', b'PK\x05\x06')
+MAGIC_BYTES = {
+    '.pdf': (b'%PDF-',),
+    '.png': (b'\x89PNG\r\n\x1a\n',),
+    '.jpg': (b'\xff\xd8\xff',),
+    '.jpeg': (b'\xff\xd8\xff',),
+    '.doc': (_OLE2,),
+    '.docx': _ZIP,
+    '.zip': _ZIP,
+    '.rar': (b'Rar!\x1a\x07',),
+}
+# Bytes needed to identify any of the types above
+MAGIC_LENGTH = 16
+
+
+def max_upload_size():
+    return int(getattr(settings, 'MAX_UPLOAD_SIZE', DEFAULT_MAX_UPLOAD_SIZE))
+
+
+def extension_error(file_name, allowed_extensions):
+    extension = os.path.splitext(file_name)[1].lower()
+    if extension not in allowed_extensions:
+        return f'File type {extension or "(none)"} is not allowed. Allowed types: {", ".join(allowed_extensions)}'
+    return None
+
+
+def content_error(extension, head):
+    """Check the first bytes of a file against what its extension promises."""
+    signatures = MAGIC_BYTES.get(extension)
+    if signatures is not None:
+        if not head.startswith(signatures):
+            return f'The file content does not match its {extension} extension.'
+    elif extension == '.txt' and b'\x00' in head:
+        return 'The file content does not match its .txt extension.'
+    return None
+
+
+class RejectedUpload(UploadedFile):
+    """Stand-in for a file refused while it was uploaded; nothing is kept."""
+
+    def __init__(self, name, content_type, size, upload_error):
+        super().__init__(io.BytesIO(), name, content_type, size)
+        self.upload_error = upload_error
+
+
+class ValidatingUploadHandler(FileUploadHandler):
+    # Allow-list of the file being received; None passes it through
+    allowed_extensions = None
+    spilled = None
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        self.allowed_extensions = UPLOAD_FIELDS.get(field_name)
+        if self.allowed_extensions is None:
+            return
+
+        self.extension = os.path.splitext(file_name)[1].lower()
+        self.error = extension_error(file_name, self.allowed_extensions)
+        self.head = b''
+        self.received = 0
+        self.digest = hashlib.sha256()
+        self.buffer = io.BytesIO()
+        self.spilled = None
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.allowed_extensions is None:
+            return raw_data
+
+        self.received += len(raw_data)
+        if self.error:
+            return None
+
+        if self.received > max_upload_size():
+            self._reject(f'File size cannot exceed {max_upload_size() // (1024 * 1024)}MB.')
+            return None
+
+        if len(self.head) < MAGIC_LENGTH:
+            self.head += raw_data[:MAGIC_LENGTH - len(self.head)]
+            if len(self.head) >= MAGIC_LENGTH:
+                error = content_error(self.extension, self.head)
+                if error:
+                    self._reject(error)
+                    return None
+
+        self.digest.update(raw_data)
+        self._write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        if self.allowed_extensions is None:
+            return None
+
+        if not self.error and len(self.head) < MAGIC_LENGTH:
+            # Files shorter than the sniffed prefix
+            error = content_error(self.extension, self.head)
+            if error:
+                self._reject(error)
+        if self.error:
+            return RejectedUpload(self.file_name, self.content_type, self.received, self.error)
+
+        if self.spilled is not None:
+            uploaded = self.spilled
+            uploaded.file.seek(0)
+            uploaded.size = file_size
+        else:
+            self.buffer.seek(0)
+            uploaded = InMemoryUploadedFile(
+                self.buffer, self.field_name, self.file_name, self.content_type,
+                file_size, self.charset, self.content_type_extra,
+            )
+        uploaded.sha256 = self.digest.hexdigest()
+        uploaded.upload_validated = True
+        return uploaded
+
+    def upload_interrupted(self):
+        if self.spilled is not None:
+            self.spilled.close()
+
+    def _write(self, data):
+        if self.spilled is None and self.received > settings.FILE_UPLOAD_MAX_MEMORY_SIZE:
+            self.spilled = TemporaryUploadedFile(
+                self.file_name, self.content_type, 0, self.charset, self.content_type_extra,
+            )
+            self.spilled.write(self.buffer.getvalue())
+            self.buffer = None
+        if self.spilled is not None:
+            self.spilled.write(data)
+        else:
+            self.buffer.write(data)
+
+    def _reject(self, error):
+        self.error = error
+        self.buffer = None
+        if self.spilled is not None:
+            self.spilled.close()  # Removes the temporary file
+            self.spilled = None
@@ -16,8 +16,20 @@ urlpatterns = [
     path('register/', views.register_customer, name='register_customer'),
     path('dashboard/', views.customer_dashboard, name='customer_dashboard'),
     path('agent/dashboard/', views.agent_dashboard, name='agent_dashboard'),
+    path('agent/stats/', views.ticket_stats, name='ticket_stats'),
+    path('agent/bulk/', views.bulk_update_tickets, name='bulk_update_tickets'),
+    path('agent/export/', views.export_tickets, name='export_tickets'),
+    path('reports/', views.ticket_reports, name='ticket_reports'),
+    path('reports/export/', views.export_ticket_report, name='export_ticket_report'),
     path('create/', views.create_ticket, name='create_ticket'),
+    path('search/', views.conversation_search, name='conversation_search'),
     path('<int:ticket_id>/', views.ticket_detail, name='ticket_detail'),
+    path('<int:ticket_id>/messages/', views.ticket_messages_since, name='ticket_messages_since'),
+    path('<int:ticket_id>/messages/earlier/', views.ticket_earlier_conversation, name='ticket_earlier_conversation'),
+    path('attachments/<int:attachment_id>/', views.download_attachment, name='download_attachment'),
+    path('messages/<int:message_id>/attachment/', views.download_message_attachment, name='download_message_attachment'),
+    path('attachments/<int:attachment_id>/<slug:size>/', views.attachment_thumbnail, name='attachment_thumbnail'),
+    path('messages/<int:message_id>/attachment/<slug:size>/', views.message_attachment_thumbnail, name='message_attachment_thumbnail'),
     path('<int:ticket_id>/assign/', views.assign_ticket_to_self, name='assign_ticket_to_self'),
     path('<int:ticket_id>/update/', views.update_ticket_by_agent, name='update_ticket_by_agent'),
 ]
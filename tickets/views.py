@@ -4,16 +4,37 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import Group
 from django.contrib import messages as django_messages
-from django.contrib.auth import login
-from django.db.models import Q 
+from django.contrib.auth import get_user_model, login
+from django.db.models import Count, Q
 from django.contrib.auth.views import LoginView as DjangoLoginView 
 from django.conf import settings
-from django.urls import reverse_lazy
-from django.http import JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.urls import reverse, reverse_lazy
+from django.http import Http404, HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
 from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.dateparse import parse_date, parse_datetime
+from django.template.defaultfilters import pluralize
+from django.utils.http import parse_etags, quote_etag
+from collections import Counter
 from datetime import timedelta
+import csv
+import hashlib
+import os
 import traceback
 
+from . import bulk, exports, reports, roles
+from .assignment import claim_ticket
+from .conversation import CONVERSATION_KINDS, recent_conversation
+from .downloads import serve_file, serve_path
+from .filters import filter_tickets
+from .pagination import decode_cursor, keyset_paginate
+from .realtime import internal_comment_payload, message_payload
+from .routing import route_ticket
+from .permissions import is_staff_member, viewable_tickets
+from .search import search_conversations
+from .stats import get_ticket_stats
+from .thumbnails import THUMBNAIL_SIZES, ThumbnailError, get_thumbnail, is_previewable
 from .models import Ticket, Message, InternalComment, TicketAttachment
 from .forms import (
     CustomLoginForm, 
@@ -24,45 +45,10 @@ from .forms import (
     InternalCommentForm
 )
 
-def get_date_range_filter():
-    """Helper function to return date filters based on the date range"""
-    today = timezone.now().date()
-    return {
-        'today': Q(created_at__date=today),
-        'week': Q(created_at__date__gte=today - timedelta(days=7)),
-        'month': Q(created_at__date__gte=today - timedelta(days=30)),
-    }
-
 def apply_ticket_filters(queryset, request):
     """Apply common filters to ticket queryset based on request parameters"""
-    # Search filter
-    search_query = request.GET.get('search', '').strip()
-    if search_query:
-        queryset = queryset.filter(
-            Q(title__icontains=search_query) |
-            Q(description__icontains=search_query) |
-            Q(customer__username__icontains=search_query) |
-            Q(id__icontains=search_query)
-        )
-
-    # Status filter
-    status = request.GET.get('status', '')
-    if status:
-        queryset = queryset.filter(status=status)
-
-    # Priority filter
-    priority = request.GET.get('priority', '')
-    if priority:
-        queryset = queryset.filter(priority=priority)
-
-    # Date range filter
-    date_range = request.GET.get('date_range', '')
-    if date_range:
-        date_filters = get_date_range_filter()
-        if date_range in date_filters:
-            queryset = queryset.filter(date_filters[date_range])
-
-    return queryset
+    # Agents also match on internal comments
+    return filter_tickets(queryset, request.GET, include_internal=is_staff_member(request.user))
 
 def register_customer(request):
     if request.method == 'POST':
@@ -117,10 +103,8 @@ def register_customer(request):
 
 # --- Helper function for checking group ---
 def is_in_group(user, group_name):
-    # Ensure user is authenticated before checking groups
-    if user.is_authenticated:
-        return user.groups.filter(name=group_name).exists()
-    return False
+    # Group names are resolved once per request and cached per user (see tickets/roles.py)
+    return roles.is_in_group(user, group_name)
 
 # --- User Registration ---
 
@@ -137,13 +121,17 @@ def customer_dashboard(request):
             return redirect('tickets:login')
 
         # Get all tickets for the current customer
-        tickets = Ticket.objects.filter(customer=request.user).order_by('-created_at')
+        tickets = Ticket.objects.filter(customer=request.user).select_related('agent', 'last_message_by')
         
         # Apply filters
         tickets = apply_ticket_filters(tickets, request)
 
+        # Newest first, one keyset page at a time
+        page = keyset_paginate(tickets, 'created_at', request.GET.get('cursor'))
+
         context = {
-            'tickets': tickets,
+            'tickets': page.object_list,
+            'next_cursor': page.next_cursor,
         }
         return render(request, 'tickets/customer_dashboard.html', context)
     
@@ -194,7 +182,10 @@ def create_ticket(request):
                         file=attachments,
                         uploaded_by=request.user
                     )
-            
+
+            # Hand the ticket to an agent right away (tickets/routing.py)
+            route_ticket(ticket)
+
             django_messages.success(request, 'Ticket created successfully!')
             return redirect('tickets:ticket_detail', ticket_id=ticket.id)
     else:
@@ -203,7 +194,7 @@ def create_ticket(request):
 
 @login_required
 def ticket_detail(request, ticket_id):
-    ticket = get_object_or_404(Ticket, id=ticket_id)
+    ticket = get_object_or_404(Ticket.objects.select_related('customer', 'agent'), id=ticket_id)
     is_customer = is_in_group(request.user, 'Customers')
     is_agent = is_in_group(request.user, 'Agents')
     is_admin = is_in_group(request.user, 'Admins')
@@ -224,6 +215,9 @@ def ticket_detail(request, ticket_id):
         django_messages.error(request, "You do not have permission to view this page.")
         return redirect('home')
 
+    message_form = MessageCreationForm()
+    internal_comment_form = InternalCommentForm() if (is_agent or is_admin or request.user.is_superuser) else None
+
     if request.method == 'POST':
         if 'internal_comment' in request.POST and (is_agent or is_admin or request.user.is_superuser):
             internal_comment_form = InternalCommentForm(request.POST)
@@ -231,8 +225,7 @@ def ticket_detail(request, ticket_id):
                 comment = internal_comment_form.save(commit=False)
                 comment.ticket = ticket
                 comment.author = request.user
-                comment.save()
-                ticket.save()  # Update the ticket's updated_at timestamp
+                comment.save()  # Also bumps the ticket's updated_at (tickets/activity.py)
                 
                 if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
                     return JsonResponse({
@@ -251,8 +244,7 @@ def ticket_detail(request, ticket_id):
                 # Ensure via_whatsapp is set (defaults to False for web interface)
                 if not hasattr(message, 'via_whatsapp') or message.via_whatsapp is None:
                     message.via_whatsapp = False
-                message.save()
-                ticket.save()  # Update the ticket's updated_at timestamp
+                message.save()  # Also updates the ticket's activity fields (tickets/activity.py)
                 
                 if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
                     return JsonResponse({
@@ -262,25 +254,32 @@ def ticket_detail(request, ticket_id):
                 
                 django_messages.success(request, 'Message posted successfully!')
                 return redirect('tickets:ticket_detail', ticket_id=ticket.id)
-    else:
-        message_form = MessageCreationForm()
-        internal_comment_form = InternalCommentForm() if (is_agent or is_admin or request.user.is_superuser) else None
 
-    messages_queryset = ticket.messages.all().order_by('created_at')
-    internal_comments = ticket.internal_comments.all().order_by('created_at') if (is_agent or is_admin or request.user.is_superuser) else None
+            if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+                # e.g. an attachment refused by tickets.uploads
+                return JsonResponse({'success': False, 'errors': message_form.errors}, status=400)
+
+    # Only the most recent page of the conversation is rendered; older
+    # entries are fetched on demand from ticket_earlier_conversation.
+    messages_page = recent_conversation(ticket, 'message')
+    internal_comments_page = None
+    if is_agent or is_admin or request.user.is_superuser:
+        internal_comments_page = recent_conversation(ticket, 'internal_comment')
     
     ticket_update_form = None
     if (is_agent and ticket.agent == request.user) or is_admin or request.user.is_superuser:
         ticket_update_form = TicketUpdateForm(instance=ticket)
 
     # Get ticket attachments
-    ticket_attachments = ticket.attachments.all().order_by('-uploaded_at')
+    ticket_attachments = ticket.attachments.select_related('uploaded_by').order_by('-uploaded_at')
 
     context = {
         'ticket': ticket,
-        'messages_list': messages_queryset,
+        'messages_list': messages_page.entries,
+        'earlier_messages_cursor': messages_page.next_cursor,
         'message_form': message_form,
-        'internal_comments': internal_comments,
+        'internal_comments': internal_comments_page.entries if internal_comments_page else None,
+        'earlier_comments_cursor': internal_comments_page.next_cursor if internal_comments_page else None,
         'internal_comment_form': internal_comment_form,
         'ticket_update_form': ticket_update_form,
         'ticket_attachments': ticket_attachments,
@@ -290,6 +289,162 @@ def ticket_detail(request, ticket_id):
     return render(request, 'tickets/ticket_detail.html', context)
 
 
+@login_required
+def ticket_earlier_conversation(request, ticket_id):
+    """
+    One page of conversation entries older than the ``before`` cursor, as
+    JSON (oldest first). ``kind`` is 'message' (default) or
+    'internal_comment' (staff only).
+    """
+    kind = request.GET.get('kind', 'message')
+    if kind not in CONVERSATION_KINDS or (kind == 'internal_comment' and not is_staff_member(request.user)):
+        return JsonResponse({'error': 'Unknown conversation.'}, status=400)
+
+    ticket = viewable_tickets(request.user).filter(pk=ticket_id).first()
+    if ticket is None:
+        return JsonResponse({'error': 'Ticket not found.'}, status=404)
+
+    before = request.GET.get('before', '')
+    if decode_cursor(before, 'created_at') is None:
+        return JsonResponse({'error': 'Invalid cursor.'}, status=400)
+
+    page = recent_conversation(ticket, kind, cursor=before)
+    serialize = message_payload if kind == 'message' else internal_comment_payload
+    return JsonResponse({
+        'ticket_id': ticket.pk,
+        'kind': kind,
+        'entries': [serialize(entry) for entry in page.entries],
+        'next_cursor': page.next_cursor,
+    })
+
+
+@login_required
+def download_attachment(request, attachment_id):
+    """A ticket attachment, for users allowed to open its ticket."""
+    attachment = get_object_or_404(
+        TicketAttachment.objects.filter(ticket__in=viewable_tickets(request.user)),
+        pk=attachment_id, status=TicketAttachment.STATUS_READY,
+    )
+    return serve_file(request, attachment.file, attachment.filename(), as_attachment='inline' not in request.GET)
+
+
+@login_required
+def download_message_attachment(request, message_id):
+    """The file attached to a message, for users allowed to open its ticket."""
+    message = get_object_or_404(Message.objects.filter(ticket__in=viewable_tickets(request.user)), pk=message_id)
+    if not message.attachment:
+        raise Http404('This message has no attachment.')
+    filename = message.attachment.name.rsplit('/', 1)[-1]
+    return serve_file(request, message.attachment, filename, as_attachment='inline' not in request.GET)
+
+
+# Thumbnails are immutable for a given attachment, so browsers may reuse them
+THUMBNAIL_CACHE_CONTROL = 'private, max-age=86400'
+
+
+def _serve_thumbnail(request, field_file, filename, size, sha256=''):
+    if size not in THUMBNAIL_SIZES or not is_previewable(field_file.name):
+        raise Http404('No preview for this attachment.')
+    try:
+        path = get_thumbnail(field_file, size, sha256)
+    except ThumbnailError:
+        raise Http404('No preview for this attachment.')
+    stem = os.path.splitext(filename)[0]
+    return serve_path(
+        request, path, f'{stem}-{size}{os.path.splitext(path)[1]}', as_attachment=False,
+        etag=os.path.basename(path), cache_control=THUMBNAIL_CACHE_CONTROL,
+    )
+
+
+@login_required
+def attachment_thumbnail(request, attachment_id, size):
+    """A cached thumbnail (``thumb``) or preview (``preview``) of an image ticket attachment."""
+    attachment = get_object_or_404(
+        TicketAttachment.objects.filter(ticket__in=viewable_tickets(request.user)),
+        pk=attachment_id, status=TicketAttachment.STATUS_READY,
+    )
+    return _serve_thumbnail(request, attachment.file, attachment.filename(), size, attachment.sha256)
+
+
+@login_required
+def message_attachment_thumbnail(request, message_id, size):
+    """A cached thumbnail or preview of the image attached to a message."""
+    message = get_object_or_404(Message.objects.filter(ticket__in=viewable_tickets(request.user)), pk=message_id)
+    if not message.attachment:
+        raise Http404('This message has no attachment.')
+    return _serve_thumbnail(request, message.attachment, message.attachment.name.rsplit('/', 1)[-1], size)
+
+
+# Rows returned per poll; clients page with the returned ids
+MESSAGES_SINCE_LIMIT = 200
+
+
+def _id_param(request, name):
+    value = request.GET.get(name, '')
+    return int(value) if value.isdigit() else 0
+
+
+@login_required
+def ticket_messages_since(request, ticket_id):
+    """
+    Messages (and internal comments for staff) newer than the ``after`` /
+    ``after_comment`` ids and the optional ``since`` ISO timestamp, as JSON.
+
+    The ETag is derived from the ticket's activity fields, so an idle poll
+    with If-None-Match costs a single primary key lookup and returns 304.
+    """
+    include_internal = is_staff_member(request.user)
+    activity = viewable_tickets(request.user).filter(pk=ticket_id).values(
+        'message_count', 'last_message_at', 'updated_at',
+    ).first()
+    if activity is None:
+        return JsonResponse({'error': 'Ticket not found.'}, status=404)
+
+    after = _id_param(request, 'after')
+    after_comment = _id_param(request, 'after_comment')
+    since = parse_datetime(request.GET.get('since', ''))
+    if since is not None and timezone.is_naive(since):
+        since = timezone.make_aware(since)
+
+    fingerprint = ':'.join(str(part) for part in (
+        ticket_id, activity['message_count'], activity['last_message_at'], activity['updated_at'],
+        include_internal, after, after_comment, since,
+    ))
+    etag = quote_etag(hashlib.md5(fingerprint.encode()).hexdigest())
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    messages_queryset = Message.objects.filter(ticket_id=ticket_id, pk__gt=after)
+    if since is not None:
+        messages_queryset = messages_queryset.filter(created_at__gt=since)
+    new_messages = list(messages_queryset.select_related('sender').order_by('pk')[:MESSAGES_SINCE_LIMIT + 1])
+
+    new_comments = []
+    if include_internal:
+        comments_queryset = InternalComment.objects.filter(ticket_id=ticket_id, pk__gt=after_comment)
+        if since is not None:
+            comments_queryset = comments_queryset.filter(created_at__gt=since)
+        new_comments = list(comments_queryset.select_related('author').order_by('pk')[:MESSAGES_SINCE_LIMIT + 1])
+
+    has_more = len(new_messages) > MESSAGES_SINCE_LIMIT or len(new_comments) > MESSAGES_SINCE_LIMIT
+    new_messages = new_messages[:MESSAGES_SINCE_LIMIT]
+    new_comments = new_comments[:MESSAGES_SINCE_LIMIT]
+
+    response = JsonResponse({
+        'ticket_id': ticket_id,
+        'messages': [message_payload(message) for message in new_messages],
+        'internal_comments': [internal_comment_payload(comment) for comment in new_comments],
+        'last_message_id': new_messages[-1].pk if new_messages else after,
+        'last_comment_id': new_comments[-1].pk if new_comments else after_comment,
+        'has_more': has_more,
+    })
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
 # --- Agent Views ---
 @login_required
 def agent_dashboard(request):
@@ -299,62 +454,95 @@ def agent_dashboard(request):
             return redirect('tickets:customer_dashboard')
         return redirect('tickets:login')
 
-    # Initialize queries with status filtering for unresolved tickets
-    unassigned_tickets = Ticket.objects.filter(agent__isnull=True).exclude(status='RESOLVED')
-    assigned_tickets = Ticket.objects.filter(agent__isnull=False).exclude(status='RESOLVED')
+    is_admin = request.user.is_superuser or is_in_group(request.user, 'Admins')
+
+    # Initialize queries with status filtering for unresolved tickets.
+    # Customer/agent are joined in so the ticket cards don't query per row.
+    dashboard_tickets = Ticket.objects.select_related('customer', 'agent', 'last_message_by')
+    open_tickets = apply_ticket_filters(Ticket.objects.exclude(status='RESOLVED'), request)
     
     # Filter based on assignment status
     assignment_filter = request.GET.get('assigned', '')
     if assignment_filter == 'unassigned':
-        assigned_tickets = Ticket.objects.none()
-    elif assignment_filter == 'assigned_to_me':
-        assigned_tickets = assigned_tickets.filter(agent=request.user)
-    elif assignment_filter == 'all_assigned' and (request.user.is_superuser or is_in_group(request.user, 'Admins')):
-        pass  # Keep all assigned tickets for admins
+        assigned_query = None
+    elif assignment_filter == 'all_assigned' and is_admin:
+        assigned_query = Q(agent__isnull=False)  # Keep all assigned tickets for admins
+    else:
+        # Default (and 'assigned_to_me'): tickets assigned to current agent
+        assigned_query = Q(agent=request.user)
+
+    # Apply common filters to both lists and page them by keyset:
+    # unassigned by creation time, assigned by last update.
+    unassigned_page = keyset_paginate(
+        apply_ticket_filters(dashboard_tickets.filter(agent__isnull=True).exclude(status='RESOLVED'), request),
+        'created_at', request.GET.get('unassigned_cursor'),
+    )
+    if assigned_query is not None:
+        assigned_page = keyset_paginate(
+            apply_ticket_filters(dashboard_tickets.filter(assigned_query).exclude(status='RESOLVED'), request),
+            'updated_at', request.GET.get('assigned_cursor'),
+        )
     else:
-        # Default: Show unassigned and tickets assigned to current agent
-        assigned_tickets = assigned_tickets.filter(agent=request.user)
+        assigned_page = keyset_paginate(Ticket.objects.none(), 'updated_at')
 
-    # Apply common filters to both querysets
-    unassigned_tickets = apply_ticket_filters(unassigned_tickets, request)
-    assigned_tickets = apply_ticket_filters(assigned_tickets, request)
+    # Header counts for both lists in a single aggregate query
+    count_aggregates = {'unassigned_count': Count('pk', filter=Q(agent__isnull=True))}
+    if assigned_query is not None:
+        count_aggregates['assigned_count'] = Count('pk', filter=assigned_query)
+    counts = open_tickets.aggregate(**count_aggregates)
 
     # Get resolved tickets (limited to 10)
     resolved_tickets_query = Q(status='RESOLVED')
-    if not (request.user.is_superuser or is_in_group(request.user, 'Admins')):
+    if not is_admin:
         resolved_tickets_query &= Q(agent=request.user)
-    resolved_tickets = Ticket.objects.filter(resolved_tickets_query).order_by('-updated_at')[:10]
+    resolved_tickets = dashboard_tickets.filter(resolved_tickets_query).order_by('-updated_at')[:10]
 
     context = {
-        'unassigned_tickets': unassigned_tickets.exclude(status='RESOLVED'),
-        'assigned_tickets': assigned_tickets.exclude(status='RESOLVED'),
+        'unassigned_tickets': unassigned_page.object_list,
+        'assigned_tickets': assigned_page.object_list,
+        'unassigned_next_cursor': unassigned_page.next_cursor,
+        'assigned_next_cursor': assigned_page.next_cursor,
+        'unassigned_count': counts['unassigned_count'],
+        'assigned_count': counts.get('assigned_count', 0),
         'resolved_tickets': resolved_tickets,
-        'is_admin': request.user.is_superuser or is_in_group(request.user, 'Admins'),
+        'is_admin': is_admin,
         'is_agent': is_in_group(request.user, 'Agents'),
+        'ticket_stats': get_ticket_stats(),
+        'bulk_actions': bulk.BULK_ACTIONS,
+        'status_choices': Ticket.STATUS_CHOICES,
+        'priority_choices': Ticket.PRIORITY_CHOICES,
+        # Same choices as TicketUpdateForm; only queried when rendered
+        'bulk_agents': get_user_model().objects.filter(groups__name='Agents').order_by('username'),
     }
     return render(request, 'tickets/agent_dashboard.html', context)
 
+
+@login_required
+def ticket_stats(request):
+    """Cached ticket statistics as JSON (agents and admins only)."""
+    if not is_staff_member(request.user):
+        return JsonResponse({'error': 'Access denied.'}, status=403)
+    return JsonResponse(get_ticket_stats())
+
 @login_required
 def assign_ticket_to_self(request, ticket_id):
     if not (is_in_group(request.user, 'Agents') or is_in_group(request.user, 'Admins') or request.user.is_superuser):
         django_messages.error(request, "Access Denied. Only agents can assign tickets.")
         return redirect('tickets:agent_dashboard')
 
-    ticket = get_object_or_404(Ticket, id=ticket_id)
-    
-    # Check if the ticket is already assigned
-    if ticket.agent is not None:
-        if ticket.agent == request.user:
-            django_messages.warning(request, f'Ticket #{ticket.id} is already assigned to you.')
-        else:
-            django_messages.warning(request, f'Ticket #{ticket.id} is already assigned to {ticket.agent.username}.')
-        return redirect('tickets:ticket_detail', ticket_id=ticket.id)
-    
-    # Assign the ticket
-    ticket.agent = request.user
-    ticket.status = 'IN_PROGRESS'
-    ticket.save()
-    django_messages.success(request, f'Ticket #{ticket.id} has been assigned to you.')
+    # One conditional UPDATE: under contention exactly one agent wins
+    if claim_ticket(ticket_id, request.user):
+        django_messages.success(request, f'Ticket #{ticket_id} has been assigned to you.')
+        return redirect('tickets:ticket_detail', ticket_id=ticket_id)
+
+    ticket = get_object_or_404(Ticket.objects.select_related('agent'), id=ticket_id)
+    if ticket.agent is None:
+        # Unassigned again in the meantime
+        django_messages.warning(request, f'Ticket #{ticket.id} could not be assigned. Please try again.')
+    elif ticket.agent == request.user:
+        django_messages.warning(request, f'Ticket #{ticket.id} is already assigned to you.')
+    else:
+        django_messages.warning(request, f'Ticket #{ticket.id} is already assigned to {ticket.agent.username}.')
     return redirect('tickets:ticket_detail', ticket_id=ticket.id)
 
 
@@ -381,6 +569,159 @@ def update_ticket_by_agent(request, ticket_id):
     return redirect('tickets:ticket_detail', ticket_id=ticket.id)
 
 
+@login_required
+def bulk_update_tickets(request):
+    """
+    Apply one action to many tickets (POST ``ticket_ids``, ``action`` and
+    ``value``; see tickets/bulk.py). XHR requests get the per-ticket results
+    as JSON, form posts a summary message and a redirect.
+    """
+    is_xhr = request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+    if request.method != 'POST':
+        return redirect('tickets:agent_dashboard')
+
+    ticket_ids = [pk for pk in request.POST.getlist('ticket_ids') if pk.isdigit()]
+    action = request.POST.get('action', '')
+    try:
+        results = bulk.apply_bulk_action(request.user, ticket_ids, action, request.POST.get('value'))
+    except bulk.BulkActionError as e:
+        if is_xhr:
+            return JsonResponse({'error': str(e)}, status=400)
+        django_messages.error(request, str(e))
+        return redirect('tickets:agent_dashboard')
+
+    summary = Counter(results.values())
+    if is_xhr:
+        return JsonResponse({
+            'action': action,
+            'results': {str(pk): result for pk, result in sorted(results.items())},
+            'summary': dict(summary),
+        })
+
+    django_messages.success(request, f"{summary[bulk.UPDATED]} ticket{pluralize(summary[bulk.UPDATED])} updated.")
+    skipped = len(results) - summary[bulk.UPDATED]
+    if skipped:
+        django_messages.warning(request, f"{skipped} ticket{pluralize(skipped)} skipped (already up to date, already assigned or not yours).")
+    return redirect('tickets:agent_dashboard')
+
+
+@login_required
+def export_tickets(request):
+    """
+    Stream the tickets the user can see, filtered like the dashboard, as
+    CSV or JSON Lines (``format``; ``messages=1`` adds the conversations to
+    JSON Lines). Memory use does not grow with the number of tickets.
+    """
+    if not is_staff_member(request.user):
+        return HttpResponse('Access denied.', status=403)
+    export_format = request.GET.get('format', exports.FORMAT_CSV)
+    if export_format not in exports.EXPORT_FORMATS:
+        return HttpResponse('Unknown export format.', status=400)
+
+    tickets = apply_ticket_filters(viewable_tickets(request.user), request)
+    # Each server needs its own kind of iterator to stream without buffering
+    stream = exports.astream_tickets if isinstance(request, ASGIRequest) else exports.stream_tickets
+    response = StreamingHttpResponse(
+        stream(tickets, export_format, include_messages=request.GET.get('messages') == '1'),
+        content_type=exports.EXPORT_FORMATS[export_format],
+    )
+    filename = f"tickets-{timezone.localtime():%Y%m%d-%H%M}.{export_format}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    # Don't let a buffering proxy hold the whole export
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+# --- Reports ---
+# Default report range, in days up to today
+REPORT_DEFAULT_DAYS = 30
+
+
+def _report_params(request):
+    """(first day, last day, grouping) from the query string, defaulting to the last 30 days by agent."""
+    end_day = parse_date(request.GET.get('end', '')) or timezone.localdate()
+    start_day = parse_date(request.GET.get('start', '')) or end_day - timedelta(days=REPORT_DEFAULT_DAYS - 1)
+    if start_day > end_day:
+        start_day, end_day = end_day, start_day
+    group_by = request.GET.get('group_by', '')
+    if group_by not in dict(reports.GROUP_BY_CHOICES):
+        group_by = reports.GROUP_BY_AGENT
+    return start_day, end_day, group_by
+
+
+def _report_table(columns, rows):
+    """(label, cells) per row, in column order."""
+    return [(row['label'], [row[key] for key, _ in columns]) for row in rows]
+
+
+def _can_view_reports(user):
+    return user.is_superuser or is_in_group(user, 'Admins')
+
+
+@login_required
+def ticket_reports(request):
+    """Response times, throughput and time in status from the daily rollups (admins only)."""
+    if not _can_view_reports(request.user):
+        django_messages.error(request, "Access Denied. Reports are for administrators.")
+        return redirect('tickets:agent_dashboard' if is_staff_member(request.user) else 'home')
+
+    start_day, end_day, group_by = _report_params(request)
+    context = {
+        'start_day': start_day,
+        'end_day': end_day,
+        'group_by': group_by,
+        'group_by_choices': reports.GROUP_BY_CHOICES,
+        'columns': reports.REPORT_COLUMNS,
+        'rows': _report_table(reports.REPORT_COLUMNS, reports.ticket_report(start_day, end_day, group_by)),
+        'status_columns': reports.STATUS_REPORT_COLUMNS,
+        'status_rows': _report_table(reports.STATUS_REPORT_COLUMNS, reports.status_report(start_day, end_day)),
+    }
+    return render(request, 'tickets/reports.html', context)
+
+
+@login_required
+def export_ticket_report(request):
+    """The ticket report (or with ``report=status`` the time in status report) as CSV."""
+    if not _can_view_reports(request.user):
+        return HttpResponse('Access denied.', status=403)
+
+    start_day, end_day, group_by = _report_params(request)
+    if request.GET.get('report') == 'status':
+        name, heading, columns, rows = 'status', 'Status', reports.STATUS_REPORT_COLUMNS, reports.status_report(start_day, end_day)
+    else:
+        name, heading, columns, rows = group_by, dict(reports.GROUP_BY_CHOICES)[group_by], reports.REPORT_COLUMNS, reports.ticket_report(start_day, end_day, group_by)
+
+    response = HttpResponse(content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="ticket-report-{name}-{start_day}-{end_day}.csv"'
+    writer = csv.writer(response)
+    writer.writerow([heading] + [title for _, title in columns])
+    for label, cells in _report_table(columns, rows):
+        writer.writerow([label] + ['' if cell is None else cell for cell in cells])
+    return response
+
+
+@login_required
+def conversation_search(request):
+    """JSON search over message bodies (and internal comments for agents)."""
+    query = request.GET.get('q', '').strip()
+    include_internal = is_staff_member(request.user)
+    hits = search_conversations(query, viewable_tickets(request.user), include_internal=include_internal)
+    return JsonResponse({
+        'query': query,
+        'results': [
+            {
+                'ticket_id': hit['ticket_id'],
+                'ticket_title': hit['ticket_title'],
+                'url': reverse('tickets:ticket_detail', args=[hit['ticket_id']]),
+                'source': hit['source'],
+                'created_at': hit['created_at'].isoformat(),
+                'snippet': hit['snippet'],
+            }
+            for hit in hits
+        ],
+    })
+
+
 # --- Basic Home Page ---
 def home(request):
     if request.user.is_authenticated:
@@ -0,0 +1,116 @@
+# tickets/websocket.py
+"""
+WebSocket endpoint pushing new conversation entries to open ticket pages.
+
+    ws[s]://<host>/ws/tickets/<ticket_id>/
+
+The connection is authenticated with the regular session cookie and
+authorized with the same rules as ticket_detail (tickets.permissions);
+staff members additionally receive internal comments. Events come from
+the broker in tickets.realtime. The endpoint is served by the ASGI
+application in it_ticketing_system/asgi.py, so it needs an ASGI server
+(e.g. uvicorn); under WSGI the page keeps working without live updates.
+"""
+import asyncio
+import json
+import re
+from importlib import import_module
+from urllib.parse import urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import aget_user
+from django.http import HttpRequest
+from django.http.cookie import parse_cookie
+
+from .permissions import is_staff_member, viewable_tickets
+from .realtime import get_broker, ticket_channel
+
+TICKET_SOCKET_PATH = re.compile(r'^/ws/tickets/(?P<ticket_id>\d+)/$')
+
+# Close codes (4000-4999 are reserved for applications)
+CLOSE_NOT_FOUND = 4404
+CLOSE_FORBIDDEN = 4403
+
+
+def _headers(scope):
+    return {name.decode('latin1'): value.decode('latin1') for name, value in scope.get('headers', [])}
+
+
+def _origin_allowed(headers):
+    # Browsers always send Origin on WebSocket handshakes; refuse pages
+    # on other sites riding on the user's session cookie.
+    origin = headers.get('origin')
+    if origin is None:
+        return True
+    if origin in getattr(settings, 'CSRF_TRUSTED_ORIGINS', []):
+        return True
+    return urlsplit(origin).netloc == headers.get('host')
+
+
+async def _get_user(headers):
+    cookies = parse_cookie(headers.get('cookie', ''))
+    engine = import_module(settings.SESSION_ENGINE)
+    request = HttpRequest()
+    request.session = engine.SessionStore(cookies.get(settings.SESSION_COOKIE_NAME))
+    return await aget_user(request)
+
+
+@sync_to_async
+def _ticket_access(user, ticket_id):
+    """Channels ``user`` may listen to for the ticket, empty if none."""
+    if not user.is_authenticated or not viewable_tickets(user).filter(pk=ticket_id).exists():
+        return []
+    channels = [ticket_channel(ticket_id)]
+    if is_staff_member(user):
+        channels.append(ticket_channel(ticket_id, internal=True))
+    return channels
+
+
+async def _close(send, code):
+    await send({'type': 'websocket.close', 'code': code})
+
+
+async def _wait_for_disconnect(receive):
+    while True:
+        event = await receive()
+        if event['type'] == 'websocket.disconnect':
+            return
+
+
+async def ticket_updates(scope, receive, send):
+    """ASGI application for the ticket WebSocket endpoint."""
+    event = await receive()
+    if event['type'] != 'websocket.connect':
+        return
+
+    match = TICKET_SOCKET_PATH.match(scope['path'])
+    if match is None:
+        await _close(send, CLOSE_NOT_FOUND)
+        return
+
+    headers = _headers(scope)
+    if not _origin_allowed(headers):
+        await _close(send, CLOSE_FORBIDDEN)
+        return
+
+    user = await _get_user(headers)
+    channels = await _ticket_access(user, int(match['ticket_id']))
+    if not channels:
+        await _close(send, CLOSE_FORBIDDEN)
+        return
+
+    # Subscribe before accepting so nothing posted in between is missed
+    async with get_broker().subscribe(*channels) as queue:
+        await send({'type': 'websocket.accept'})
+        disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+        try:
+            while True:
+                next_event = asyncio.ensure_future(queue.get())
+                done, _ = await asyncio.wait({next_event, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+                if next_event not in done:
+                    next_event.cancel()
+                    break
+                await send({'type': 'websocket.send', 'text': json.dumps(next_event.result())})
+        finally:
+            disconnected.cancel()
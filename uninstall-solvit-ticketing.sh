@@ -82,7 +82,7 @@ echo "The following will be PERMANENTLY DELETED:"
 echo "• Application files in $PROJECT_DIR"
 echo "• PostgreSQL database: $DB_NAME"
 echo "• Database user: $DB_USER"
-echo "• Systemd service: $SERVICE_NAME"
+echo "• Systemd services: $SERVICE_NAME, $SERVICE_NAME-sla"
 echo "• Nginx configuration (if exists)"
 echo "• All static files and media uploads"
 echo ""
@@ -95,31 +95,35 @@ fi
 echo ""
 log "Starting SolvIT Ticketing System uninstallation..."
 
-# 1. Stop and disable the systemd service
-log "Stopping and disabling systemd service..."
-if systemctl is-active --quiet "$SERVICE_NAME"; then
-    sudo systemctl stop "$SERVICE_NAME"
-    success "Service $SERVICE_NAME stopped"
-else
-    warning "Service $SERVICE_NAME was not running"
-fi
+# 1. Stop and disable the systemd services (the app and the SLA sweeper)
+log "Stopping and disabling systemd services..."
+for UNIT in "$SERVICE_NAME" "$SERVICE_NAME-sla"; do
+    if systemctl is-active --quiet "$UNIT"; then
+        sudo systemctl stop "$UNIT"
+        success "Service $UNIT stopped"
+    else
+        warning "Service $UNIT was not running"
+    fi
 
-if systemctl is-enabled --quiet "$SERVICE_NAME" 2>/dev/null; then
-    sudo systemctl disable "$SERVICE_NAME"
-    success "Service $SERVICE_NAME disabled"
-else
-    warning "Service $SERVICE_NAME was not enabled"
-fi
+    if systemctl is-enabled --quiet "$UNIT" 2>/dev/null; then
+        sudo systemctl disable "$UNIT"
+        success "Service $UNIT disabled"
+    else
+        warning "Service $UNIT was not enabled"
+    fi
+done
 
-# 2. Remove systemd service file
-log "Removing systemd service file..."
-if [ -f "/etc/systemd/system/$SERVICE_NAME.service" ]; then
-    sudo rm -f "/etc/systemd/system/$SERVICE_NAME.service"
-    sudo systemctl daemon-reload
-    success "Service file removed"
-else
-    warning "Service file not found"
-fi
+# 2. Remove systemd service files
+log "Removing systemd service files..."
+for UNIT in "$SERVICE_NAME" "$SERVICE_NAME-sla"; do
+    if [ -f "/etc/systemd/system/$UNIT.service" ]; then
+        sudo rm -f "/etc/systemd/system/$UNIT.service"
+        success "Service file $UNIT.service removed"
+    else
+        warning "Service file $UNIT.service not found"
+    fi
+done
+sudo systemctl daemon-reload
 
 # 3. Remove Nginx configuration (if exists)
 log "Checking for Nginx configuration..."
@@ -255,7 +259,7 @@ echo ""
 success "SolvIT Ticketing System has been successfully uninstalled!"
 echo ""
 echo "Summary of actions taken:"
-echo "✅ Systemd service stopped and removed"
+echo "✅ Systemd services stopped and removed"
 echo "✅ Application files removed (if confirmed)"
 echo "✅ Database and user removed (if confirmed)"
 echo "✅ Nginx configuration removed (if found and confirmed)"